@@ -1,39 +1,42 @@
 import requests
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError
+import httpx
+import asyncio
+import random
 import json
 import re
+from urllib.parse import urlsplit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from claim_filter import NO_CLAIM_VERDICT
+from metrics import REGISTRY, timed
 
-class FactChecker:
-    def __init__(self, serpapi_key, openai_api_key):
-        self.serpapi_key = serpapi_key
-        self.openai_api_key = openai_api_key
-        self.client = OpenAI(api_key=openai_api_key)
+SERPAPI_URL = "https://serpapi.com/search"
+OPENAI_MODEL = "gpt-4o-mini-2024-07-18"
 
-    def fetch_current_data(self, query):
-        """Fetch live search results using SerpAPI."""
-        serpapi_url = "https://serpapi.com/search"
-        params = {
-            "q": query,
-            "hl": "en",  # Language
-            "gl": "in",  # Geolocation
-            "api_key": self.serpapi_key,
-        }
-        response = requests.get(serpapi_url, params=params)
-        if response.status_code == 200:
-            results = response.json()
-            if "organic_results" in results and results["organic_results"]:
-                # Extract the top snippet or result
-                top_result = results["organic_results"][0]
-                return top_result.get("snippet", "No snippet available.")
-        return "No results found."
+# fetch_current_data: the search worked but found nothing, or the search itself failed
+NO_RESULTS = "No results found."
+SEARCH_FAILED = "Search failed."
+# fact_check_with_openai without a completion: nothing to check against, or no search to check with
+NO_DATA_RESPONSE = "No current data found for this claim."
+FETCH_FAILED_RESPONSE = "Unable to fetch current data for fact-checking."
+# (sentiment, claim_verification) of a claim the search found nothing for; a result, unlike "Error"
+NO_DATA_VERDICT = ("Neutral", "No data")
 
-    def fact_check_with_openai(self, query):
-        """Perform fact-checking using OpenAI and live data."""
-        current_info = self.fetch_current_data(query)
-        if current_info == "No results found.":
-            return "Unable to fetch current data for fact-checking."
 
-        prompt = '''
+class SearchRateLimited(Exception):
+    """SerpAPI answered 429; `retry_after` is its Retry-After in seconds, if it gave one."""
+
+    def __init__(self, retry_after=None):
+        super().__init__("SerpAPI rate limit")
+        self.retry_after = retry_after
+
+
+def step_seconds(step, client):
+    return REGISTRY.histogram("zero_trust_fact_check_seconds", "Time per fact-check step, cache hits included",
+                              step=step, client=client)
+
+FACT_CHECK_PROMPT = '''
         You are an advanced AI assistant specializing in text classification. Perform the following tasks on the given text:
 
         1. **Sentiment Analysis**: Analyze the sentiment of the text and classify it into one of the following categories:
@@ -60,10 +63,175 @@ class FactChecker:
         }}
         '''
 
-        prompt = prompt.format(query=query, current_info=current_info)
 
+def search_params(query, api_key):
+    return {
+        "q": query,
+        "hl": "en",  # Language
+        "gl": "in",  # Geolocation
+        "api_key": api_key,
+    }
+
+
+def top_snippet(results):
+    """Return the snippet of the top organic result, or None if there is none."""
+    if "organic_results" in results and results["organic_results"]:
+        # Extract the top snippet or result
+        top_result = results["organic_results"][0]
+        return top_result.get("snippet", "No snippet available.")
+    return None
+
+
+BATCH_FACT_CHECK_PROMPT = '''
+        You are an advanced AI assistant specializing in text classification. Perform the following tasks on each numbered claim below:
+
+        1. **Sentiment Analysis**: Analyze the sentiment of the claim and classify it into one of the following categories:
+           - Ultra Negative
+           - Negative
+           - Neutral
+           - Positive
+           - Ultra Positive
+
+        2. **Fact Check**: Determine if the claim can be evaluated as:
+           - True
+           - False
+           - Neutral (if no claim is made or it is not verifiable based on available information).
+
+        Use the SERP API search result given with each claim for factual verification and make a decision based only on that evidence.
+
+        {claims}
+
+        Respond with a JSON array containing exactly one object per claim, in the same order:
+        [
+          {{"id": <claim number>, "sentiment": "<one of: Ultra Negative, Negative, Neutral, Positive, Ultra Positive>", "claim_verification": "<one of: True, False, Neutral>"}}
+        ]
+        '''
+
+# rough prompt sizing without a tokenizer dependency: ~4 characters per token
+CHARS_PER_TOKEN = 4
+RESULT_TOKENS = 30  # expected output tokens per claim in a batch response
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def plan_batches(items, max_batch_size, token_budget):
+    """
+    Greedily group (query, current_info) pairs into batches that stay under
+    `token_budget` prompt+response tokens and `max_batch_size` claims.
+    Returns lists of indices into `items`.
+    """
+    overhead = estimate_tokens(BATCH_FACT_CHECK_PROMPT)
+    batches, current, used = [], [], overhead
+    for i, (query, current_info) in enumerate(items):
+        cost = estimate_tokens(query) + estimate_tokens(current_info) + RESULT_TOKENS + 8
+        if current and (len(current) >= max_batch_size or used + cost > token_budget):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(items):
+    claims = "\n\n        ".join(
+        f"Claim {i}: {query}\n        Current Info {i}: {current_info}"
+        for i, (query, current_info) in enumerate(items, start=1)
+    )
+    return BATCH_FACT_CHECK_PROMPT.format(claims=claims)
+
+
+def parse_batch_response(response, n_claims):
+    """
+    Parse a batch response into a list of (sentiment, claim_verification)
+    pairs in claim order. Returns None if the response cannot be matched
+    to exactly `n_claims` results.
+    """
+    match = re.search(r'\[.*\]', response, re.DOTALL)
+    if not match:
+        return None
+    try:
+        results = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(results, list) or len(results) != n_claims:
+        return None
+
+    ordered = [None] * n_claims
+    for position, result in enumerate(results):
+        if not isinstance(result, dict):
+            return None
+        index = result.get("id", position + 1)
+        if not isinstance(index, int) or not 1 <= index <= n_claims or ordered[index - 1] is not None:
+            return None
+        ordered[index - 1] = (
+            result.get("sentiment", "Sentiment not available."),
+            result.get("claim_verification", "Claim verification not available.")
+        )
+    return ordered
+
+
+class FactChecker:
+    def __init__(self, serpapi_key, openai_api_key, cache=None, serpapi_url=SERPAPI_URL, openai_base_url=None,
+                 max_batch_size=20, token_budget=6000, search_workers=8, claim_filter=None, timeout=10.0):
+        self.serpapi_key = serpapi_key
+        self.openai_api_key = openai_api_key
+        self.serpapi_url = serpapi_url
+        self.client = OpenAI(api_key=openai_api_key, base_url=openai_base_url)
+        # keep-alive connection pool for SerpAPI requests, each bounded by `timeout` seconds
+        self.session = requests.Session()
+        self.timeout = timeout
+        # optional FactCache shared by search snippets and parsed verdicts
+        self.cache = cache
+        # batch sizing for fact_check_batch; a call shrinks its own batches after unparseable responses
+        self.max_batch_size = max_batch_size
+        self.token_budget = token_budget
+        self.search_workers = search_workers
+        # optional ClaimFilter: text without a checkable claim gets NO_CLAIM_VERDICT and no remote calls
+        self.claim_filter = claim_filter
+
+    @timed(step_seconds("search", "sync"))
+    def fetch_current_data(self, query):
+        """
+        Fetch live search results using SerpAPI. Raises SearchRateLimited on a
+        429, so callers can back off and retry instead of recording a failure.
+        """
+        if self.cache is not None:
+            cached = self.cache.get("search", query)
+            if cached is not None:
+                return cached
+
+        response = self.session.get(self.serpapi_url, params=search_params(query, self.serpapi_key),
+                                    timeout=self.timeout)
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            raise SearchRateLimited(float(retry_after) if retry_after and retry_after.isdigit() else None)
+        if response.status_code != 200:
+            return SEARCH_FAILED
+        snippet = top_snippet(response.json())
+        if snippet is None:
+            return NO_RESULTS
+        if self.cache is not None:
+            self.cache.set("search", query, snippet)
+        return snippet
+
+    def fact_check_with_openai(self, query):
+        """Perform fact-checking using OpenAI and live data."""
+        current_info = self.fetch_current_data(query)
+        if current_info == NO_RESULTS:
+            return NO_DATA_RESPONSE
+        if current_info == SEARCH_FAILED:
+            return FETCH_FAILED_RESPONSE
+
+        return self._complete(FACT_CHECK_PROMPT.format(query=query, current_info=current_info))
+
+    @timed(step_seconds("completion", "sync"))
+    def _complete(self, prompt):
         completion = self.client.chat.completions.create(
-            model="gpt-4o-mini-2024-07-18",
+            model=OPENAI_MODEL,
             store=True,
             messages=[
                 {"role": "user", "content": prompt}
@@ -71,6 +239,101 @@ class FactChecker:
         )
         return completion.choices[0].message.content
 
+    def fact_check(self, query):
+        """Fact-check a query and return the parsed (sentiment, claim_verification) pair."""
+        if self.claim_filter is not None and not self.claim_filter.worth_checking(query):
+            return NO_CLAIM_VERDICT
+        if self.cache is not None:
+            cached = self.cache.get("verdict", query)
+            if cached is not None:
+                return tuple(cached)
+
+        sentiment, claim_verification = self.parse_verdict(self.fact_check_with_openai(query))
+        # only successful verdicts are worth reusing
+        if self.cache is not None and claim_verification != "Error":
+            self.cache.set("verdict", query, [sentiment, claim_verification])
+        return sentiment, claim_verification
+
+    def fact_check_batch(self, claims):
+        """
+        Fact-check many claims with as few completions as possible.
+
+        Search snippets are fetched concurrently, then the claims are grouped
+        into prompts that fit `token_budget` and `max_batch_size`. If a batch
+        response cannot be parsed, that batch is re-run one claim at a time and
+        the rest of this call's claims are re-planned into batches half the
+        size; the next call starts at `max_batch_size` again. Returns (sentiment, claim_verification)
+        pairs in the order of `claims`. Claims the claim filter rejects (all
+        scored in one batch) get NO_CLAIM_VERDICT.
+        """
+        results = [None] * len(claims)
+        pending = []
+        if self.claim_filter is not None:
+            worth_checking = self.claim_filter.worth_checking_batch(claims)
+        else:
+            worth_checking = [True] * len(claims)
+        for i, query in enumerate(claims):
+            if not worth_checking[i]:
+                results[i] = NO_CLAIM_VERDICT
+                continue
+            cached = self.cache.get("verdict", query) if self.cache is not None else None
+            if cached is not None:
+                results[i] = tuple(cached)
+            else:
+                pending.append(i)
+
+        def search(query):
+            try:
+                return self.fetch_current_data(query)
+            except SearchRateLimited:
+                return SEARCH_FAILED
+
+        with ThreadPoolExecutor(max_workers=self.search_workers) as pool:
+            infos = list(pool.map(lambda i: search(claims[i]), pending))
+
+        items = []
+        for i, current_info in zip(pending, infos):
+            if current_info == NO_RESULTS:
+                results[i] = NO_DATA_VERDICT
+                if self.cache is not None:
+                    self.cache.set("verdict", claims[i], list(NO_DATA_VERDICT))
+            elif current_info == SEARCH_FAILED:
+                results[i] = self.extract_json(FETCH_FAILED_RESPONSE)
+            else:
+                items.append((i, claims[i], current_info))
+
+        pairs = [(query, info) for _, query, info in items]
+        batch_size = self.max_batch_size
+        batches = deque(plan_batches(pairs, batch_size, self.token_budget))
+        while batches:
+            batch_items = [items[j] for j in batches.popleft()]
+            parsed = None
+            if len(batch_items) > 1:
+                response = self._complete(build_batch_prompt([(query, info) for _, query, info in batch_items]))
+                parsed = parse_batch_response(response, len(batch_items))
+                if parsed is None:
+                    batch_size = max(1, batch_size // 2)
+                    rest = [j for batch in batches for j in batch]
+                    batches = deque([rest[k] for k in batch]
+                                    for batch in plan_batches([pairs[j] for j in rest], batch_size, self.token_budget))
+            if parsed is None:
+                parsed = [
+                    self.extract_json(self._complete(FACT_CHECK_PROMPT.format(query=query, current_info=info)))
+                    for _, query, info in batch_items
+                ]
+            for (i, query, _), (sentiment, claim_verification) in zip(batch_items, parsed):
+                results[i] = (sentiment, claim_verification)
+                if self.cache is not None and claim_verification != "Error":
+                    self.cache.set("verdict", query, [sentiment, claim_verification])
+        return results
+
+    @classmethod
+    def parse_verdict(cls, response):
+        """extract_json, except that NO_DATA_RESPONSE is NO_DATA_VERDICT rather than an error."""
+        if response == NO_DATA_RESPONSE:
+            return NO_DATA_VERDICT
+        return cls.extract_json(response)
+
     @staticmethod
     def extract_json(response):
         """Extract sentiment and claim verification from the OpenAI response."""
@@ -93,19 +356,168 @@ class FactChecker:
             return f"Unexpected error: {str(e)}", "Error"
 
 
+class AsyncFactChecker:
+    """
+    Asyncio counterpart of FactChecker for use directly inside the event loop.
+
+    SerpAPI requests go through one pooled httpx.AsyncClient and completions
+    through AsyncOpenAI. Every request is bounded by `timeout`, limited to
+    `per_host_limit` concurrent calls per host, and retried up to
+    `max_retries` times with exponential backoff on connection errors,
+    timeouts, 429 and 5xx responses. A `claim_filter` is consulted first,
+    as in FactChecker. The claim filter and the cache (SQLite, shared-store
+    round trips) block, so they run in `executor`, the loop's default
+    executor if None.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, serpapi_key, openai_api_key, cache=None, serpapi_url=SERPAPI_URL,
+                 openai_base_url=None, timeout=10.0, per_host_limit=16, max_connections=100,
+                 max_retries=3, backoff=0.25, claim_filter=None, executor=None):
+        self.serpapi_key = serpapi_key
+        self.serpapi_url = serpapi_url
+        self.cache = cache
+        self.executor = executor
+        self.claim_filter = claim_filter
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._host_limits = {}
+
+        self.http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        # retries are handled here so that they share the per-host limits and backoff
+        self.client = AsyncOpenAI(
+            api_key=openai_api_key,
+            base_url=openai_base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        )
+        self._openai_host = urlsplit(str(self.client.base_url)).netloc
+        self.completion_seconds = step_seconds("completion", "async")
+
+    extract_json = staticmethod(FactChecker.extract_json)
+    parse_verdict = staticmethod(FactChecker.parse_verdict)
+
+    def _blocking(self, function, *args):
+        return asyncio.get_event_loop().run_in_executor(self.executor, function, *args)
+
+    def _host_limit(self, host):
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    def _is_retryable(self, error):
+        # APITimeoutError is a subclass of APIConnectionError
+        if isinstance(error, (httpx.TransportError, APIConnectionError)):
+            return True
+        if isinstance(error, APIStatusError):
+            return error.status_code in self.RETRY_STATUS
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in self.RETRY_STATUS
+        return False
+
+    async def _call(self, host, make_request):
+        """Run `make_request()` under the host's concurrency limit, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._host_limit(host):
+                    return await make_request()
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_retryable(e):
+                    raise
+            # exponential backoff with jitter, outside the semaphore
+            await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    @timed(step_seconds("search", "async"))
+    async def fetch_current_data(self, query):
+        """Fetch live search results using SerpAPI."""
+        if self.cache is not None:
+            cached = await self._blocking(self.cache.get, "search", query)
+            if cached is not None:
+                return cached
+
+        async def request():
+            response = await self.http.get(self.serpapi_url, params=search_params(query, self.serpapi_key))
+            if response.status_code in self.RETRY_STATUS:
+                response.raise_for_status()
+            return response
+
+        try:
+            response = await self._call(urlsplit(self.serpapi_url).netloc, request)
+        except httpx.HTTPError:
+            return SEARCH_FAILED
+
+        if response.status_code != 200:
+            return SEARCH_FAILED
+        snippet = top_snippet(response.json())
+        if snippet is None:
+            return NO_RESULTS
+        if self.cache is not None:
+            await self._blocking(self.cache.set, "search", query, snippet)
+        return snippet
+
+    async def fact_check_with_openai(self, query):
+        """Perform fact-checking using OpenAI and live data."""
+        current_info = await self.fetch_current_data(query)
+        if current_info == NO_RESULTS:
+            return NO_DATA_RESPONSE
+        if current_info == SEARCH_FAILED:
+            return FETCH_FAILED_RESPONSE
+
+        prompt = FACT_CHECK_PROMPT.format(query=query, current_info=current_info)
+        with self.completion_seconds.time():
+            completion = await self._call(self._openai_host, lambda: self.client.chat.completions.create(
+                model=OPENAI_MODEL,
+                store=True,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            ))
+        return completion.choices[0].message.content
+
+    async def fact_check(self, query):
+        """Fact-check a query and return the parsed (sentiment, claim_verification) pair."""
+        if self.claim_filter is not None:
+            if not await self._blocking(self.claim_filter.worth_checking, query):
+                return NO_CLAIM_VERDICT
+        if self.cache is not None:
+            cached = await self._blocking(self.cache.get, "verdict", query)
+            if cached is not None:
+                return tuple(cached)
+
+        sentiment, claim_verification = self.parse_verdict(await self.fact_check_with_openai(query))
+        if self.cache is not None and claim_verification != "Error":
+            await self._blocking(self.cache.set, "verdict", query, [sentiment, claim_verification])
+        return sentiment, claim_verification
+
+    async def fact_check_many(self, queries):
+        """Fact-check several queries concurrently, returning results in input order."""
+        return await asyncio.gather(*(self.fact_check(query) for query in queries))
+
+    async def aclose(self):
+        await self.http.aclose()
+        await self.client.close()
+
+
 # Example Usage
 if __name__ == "__main__":
     SERPAPI_KEY = ""
     OPENAI_API_KEY = ""
-    
+
     fact_checker = FactChecker(SERPAPI_KEY, OPENAI_API_KEY)
-    
+
     query = "I will make a machine that if input we feed in potato it will give us gold"
     response = fact_checker.fact_check_with_openai(query)
     print("Raw Response:", response)
-    
-    sentiment, claim_verification = FactChecker.extract_json(response)
+
+    sentiment, claim_verification = FactChecker.parse_verdict(response)
     print("Sentiment:", sentiment)
     print("Claim Verification:", claim_verification)
-
-
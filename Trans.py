@@ -1,6 +1,10 @@
 from youtube_transcript_api import YouTubeTranscriptApi
 from SearchVerification import FactChecker
+from fact_cache import FactCache
 from api import serpapi, api
+from claim_filter import create_claim_filter
+import settings
+from transcript_segments import SegmentStore, TranscriptSegmenter
 
 class YouTubeTranscriptProcessor:
     def __init__(self, url, text_size=20):
@@ -10,7 +14,7 @@ class YouTubeTranscriptProcessor:
         self.video_id = self.extract_video_id(url)
         self.text_size = text_size
         self.transcript = []
-        self.processed_transcript = []
+        self.processed_transcript = SegmentStore()
 
     @staticmethod
     def extract_video_id(url):
@@ -30,39 +34,26 @@ class YouTubeTranscriptProcessor:
         except Exception as e:
             raise RuntimeError(f"Error fetching transcript: {e}")
 
-    def process_transcript(self):
+    def iter_segments(self, entries=None, overlap=0, sentence_boundaries=False):
         """
-        Process the transcript into manageable lines with specified text size.
+        Yield segments of about `text_size` words as `entries` (default: the
+        fetched transcript) are consumed; see TranscriptSegmenter.
         """
-        if not self.transcript:
-            raise ValueError("Transcript is empty. Fetch it before processing.")
-
-        current_line = []
-        current_duration = 0
-        current_start_time = self.transcript[0]['start']
+        if entries is None:
+            if not self.transcript:
+                raise ValueError("Transcript is empty. Fetch it before processing.")
+            entries = self.transcript
+        segmenter = TranscriptSegmenter(self.text_size, overlap=overlap, sentence_boundaries=sentence_boundaries)
+        return segmenter.segments(entries)
 
-        for entry in self.transcript:
-            words = entry['text'].split()
-            for word in words:
-                current_line.append(word)
-                current_duration += entry['duration'] / len(words)
-                if len(current_line) >= self.text_size:
-                    self.processed_transcript.append({
-                        'text': ' '.join(current_line),
-                        'start': current_start_time,
-                        'duration': current_duration
-                    })
-                    current_line = []
-                    current_duration = 0
-                    current_start_time = entry['start'] + entry['duration']
-
-        # Add the last line if there are remaining words
-        if current_line:
-            self.processed_transcript.append({
-                'text': ' '.join(current_line),
-                'start': current_start_time,
-                'duration': current_duration
-            })
+    def process_transcript(self, overlap=0, sentence_boundaries=False):
+        """
+        Process the transcript into manageable lines with specified text size.
+        Lines are kept in a columnar SegmentStore and read back as dicts.
+        """
+        self.processed_transcript = SegmentStore()
+        for segment in self.iter_segments(overlap=overlap, sentence_boundaries=sentence_boundaries):
+            self.processed_transcript.append(segment)
 
     def get_processed_transcript(self):
         """
@@ -82,22 +73,18 @@ if __name__ == "__main__":
 
     # Print the processed transcript
     processed = processor.get_processed_transcript()
-    fact = FactChecker(serpapi, api)
-    counter = 0
-    for entry in processed:
+    fact = FactChecker(serpapi, api, cache=FactCache(), claim_filter=create_claim_filter(settings.CLAIM_FILTER, settings.CLAIM_THRESHOLD))
 
+    # one completion covers many segments instead of one request per segment
+    verdicts = fact.fact_check_batch([entry['text'] for entry in processed])
+    for entry, (sentiment, claim_verification) in zip(processed, verdicts):
         print(entry['text'])
-        query = entry['text']
-        response = fact.fact_check_with_openai(query)
-        #print(response)
-        sentiment, claim_verification = fact.extract_json(response)
         print("Sentiment:", sentiment)
         print("Claim Verification:", claim_verification)
 
         print(f"Start Time: {entry['start']}")
         print(f"Duration: {entry['duration']}\n")
-        
-        if counter == 5:
-            break
-        counter += 1
+
     print(f"Total Lines: {len(processed)}")
+    if fact.claim_filter is not None:
+        print(f"Skipped without a checkable claim: {fact.claim_filter.skipped}")
@@ -1,25 +1,65 @@
+import asyncio
+import logging
 from fastapi import FastAPI, WebSocket
-from fastapi.responses import HTMLResponse
-import base64
-import io
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from openai import OpenAI
 from fastapi.middleware.cors import CORSMiddleware
 from api import api, serpapi
-import wave
-from SearchVerification import FactChecker
-from concurrent.futures import ThreadPoolExecutor
-import asyncio
-from audio_processor import AudioProcessor
+from SearchVerification import AsyncFactChecker
+from fact_cache import FactCache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from ws_pipeline import SessionPipeline, latency_snapshot
+from audio_protocol import negotiate_protocol
 from yt_live_fetch import LiveExtraction
+from transcriber import create_transcriber
+from live_hub import LiveStreamHub
+from state_store import InProcessStore, create_store
+from model_registry import default_registry
+from cpu_inference import parse_backends
+from claim_filter import create_claim_filter
+from metrics import REGISTRY, watch_executor
+from profiler import SamplingProfiler
+from structured_logging import configure_logging
+import settings
+
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+logger = logging.getLogger("app")
+logger.info("starting server")
+
+# Executors per stage, sized from settings: transcription, blocking I/O and,
+# optionally, a process pool for local inference
+executor = ThreadPoolExecutor(max_workers=settings.TRANSCRIBE_THREADS)
+io_executor = ThreadPoolExecutor(max_workers=settings.IO_THREADS)
+inference_executor = None
+if settings.INFERENCE_PROCESSES > 0 and settings.TRANSCRIBER_BACKEND == "local":
+    inference_executor = ProcessPoolExecutor(settings.INFERENCE_PROCESSES)
+watch_executor("transcribe", executor)
+watch_executor("io", io_executor)
+if inference_executor is not None:
+    watch_executor("inference", inference_executor)
+app = FastAPI()
 
-print("Starting server...")
+# State shared between worker processes (fact-check cache, live streams)
+store = create_store(settings.STATE_STORE)
 
-# Create a thread pool executor with 4 threads
-executor = ThreadPoolExecutor(max_workers=4)
-app = FastAPI()
+# keys set in the environment take precedence over api.py
+openai_key = settings.OPENAI_API_KEY or api
+serpapi_key = settings.SERPAPI_KEY or serpapi
 
-# Initialize the FactChecker class with the API keys
-fact_checker = FactChecker(api, serpapi)
+# Initialize the FactChecker class with the API keys and a result cache
+# (set FACT_CACHE_DB to also keep cached results on disk across restarts)
+fact_cache = FactCache(
+    db_path=settings.FACT_CACHE_DB,
+    # the in-memory tier already covers a single process
+    store=None if isinstance(store, InProcessStore) else store
+)
+# with CLAIM_FILTER set, text without a checkable claim is answered locally
+fact_checker = AsyncFactChecker(
+    serpapi_key=serpapi_key, openai_api_key=openai_key, cache=fact_cache,
+    serpapi_url=settings.SERPAPI_URL, openai_base_url=settings.OPENAI_BASE_URL,
+    claim_filter=create_claim_filter(settings.CLAIM_FILTER, settings.CLAIM_THRESHOLD),
+    executor=io_executor
+)
 
 # for live youtube stream
 live_extraction = LiveExtraction()
@@ -34,16 +74,71 @@ app.add_middleware(
 )
 
 # Initialize the OpenAI client
-client = OpenAI(api_key=api)
+client = OpenAI(api_key=openai_key, base_url=settings.OPENAI_BASE_URL)
+
+# Transcription backend: "openai" (remote Whisper API), "local" (in-process CPU model)
+# or "stub" (deterministic, for offline benchmarks)
+if inference_executor is not None:
+    transcriber = create_transcriber(
+        settings.TRANSCRIBER_BACKEND,
+        client=client,
+        executor=inference_executor,
+        max_concurrent_batches=settings.INFERENCE_PROCESSES
+    )
+else:
+    transcriber = create_transcriber(settings.TRANSCRIBER_BACKEND, client=client, executor=executor)
+
+# one ingestion pipeline per live stream, shared by every client watching it
+# (and by every worker process, through the store)
+live_hub = LiveStreamHub(
+    live_extraction, transcriber, fact_checker,
+    io_executor=io_executor,
+    store=None if isinstance(store, InProcessStore) else store,
+    audio_options=settings.AUDIO_OPTIONS
+)
 
-def get_transcription(audio_data):
-    with io.BytesIO(audio_data) as wav_buffer:
-        wav_buffer.name = "audio.wav"  
-        response = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=wav_buffer  
-        )
-    return response
+# comment classifiers load on first use; WARM_MODELS loads some ahead of time
+model_registry = default_registry(
+    memory_budget_mb=settings.MODEL_MEMORY_MB,
+    idle_seconds=settings.MODEL_IDLE_SECONDS,
+    backends=parse_backends(settings.MODEL_BACKENDS),
+    onnx_cache_dir=settings.ONNX_CACHE_DIR
+)
+
+background_tasks = []
+
+
+async def evict_idle_models(interval):
+    """Drop comment classifiers unused for MODEL_IDLE_SECONDS, even while nothing new is loaded."""
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await loop.run_in_executor(io_executor, model_registry.evict_idle)
+        except Exception as e:
+            logger.warning("model eviction failed: %s", e)
+
+@app.on_event("startup")
+async def startup():
+    if settings.WARM_MODELS:
+        model_registry.warm(settings.WARM_MODELS)
+    if settings.MODEL_IDLE_SECONDS:
+        # a model is dropped at most half its idle time late
+        interval = min(settings.MODEL_IDLE_SECONDS / 2, 60)
+        background_tasks.append(asyncio.ensure_future(evict_idle_models(interval)))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await live_hub.close()
+    await fact_checker.aclose()
+    await transcriber.close()
+    store.close()
+    executor.shutdown(wait=False)
+    io_executor.shutdown(wait=False)
+    if inference_executor is not None:
+        inference_executor.shutdown(wait=False)
 
 @app.get("/")
 async def get():
@@ -53,90 +148,90 @@ async def get():
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    processor = AudioProcessor()
-    text_buffer = [] # buffer to store text data for one session of fact checking
-    
-    async def process_chunk(chunk):
-        with io.BytesIO() as wav_buffer:
-            with wave.open(wav_buffer, 'wb') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(16000)
-                wav_file.writeframes(chunk)
-            
-            wav_buffer.seek(0)
-            try:
-                transcription = await asyncio.get_event_loop().run_in_executor(
-                    executor, 
-                    lambda: get_transcription(wav_buffer.read())
-                )
-                return transcription.text
-            except Exception as e:
-                print(f"Transcription error: {e}")
-                return None
-
-    async def handle_fact_check(text):
-        response = await asyncio.get_event_loop().run_in_executor(
-            executor,
-            lambda: fact_checker.fact_check_with_openai(text)
-        )
-        sentiment, verification = FactChecker.extract_json(response)
-        return sentiment, verification
-
-    try:
-        while True:
-            data = await websocket.receive_text() # receive audio data in base64 format
-            pcm_data = base64.b64decode(data) # decode the base64 data
-            processor.add_audio(pcm_data) # add the audio data to the processor
-            
-            for chunk in processor.get_speech_chunks():
-                text = await process_chunk(chunk) # process the chunk of audio data
-                if text:
-                    print("Transcription:", text)
-                    await websocket.send_text(text)
-                    text_buffer.append(text)
-                    
-                    if len(' '.join(text_buffer).split()) >= 20:
-                        '''
-                        after 90 words, we will send the text to the fact checker and complete the session
-                        '''
-                        current_text = ' '.join(text_buffer)
-                        text_buffer.clear()
-                        #sentiment, verification = await handle_fact_check(current_text)
-                        await websocket.send_text(f"Sentiment: {current_text}")
-                        #await websocket.send_text(f"Verification: {verification}")
-                    
-    except Exception as e:
-        print(f"Error: {e}")
-    finally:
-        # Process remaining audio if it meets minimum length
-        if len(processor.speech_buffer) >= int(0.1 * processor.sample_rate * 2):
-            text = await process_chunk(bytes(processor.speech_buffer))
-            if text:
-                await websocket.send_text(text)
-            
+    # binary PCM frames if the client offers them, base64 text otherwise
+    protocol = negotiate_protocol(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=protocol)
+    # receive, VAD, transcription and fact checking run as overlapping stages
+    await SessionPipeline(websocket, transcriber, fact_checker, protocol=protocol,
+                          audio_options=settings.AUDIO_OPTIONS).run()
+
+
+@app.get("/latency")
+async def latency():
+    """Per-stage latency percentiles (seconds) across /ws sessions."""
+    return latency_snapshot()
+
+
+@app.get("/metrics")
+async def metrics():
+    """This worker's metrics in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+if settings.PROFILER == "on":
+    profiler = SamplingProfiler()
+
+    @app.post("/profiler/start")
+    async def profiler_start(interval_ms: float = 5):
+        profiler.reset()
+        profiler.start(interval_ms / 1000)
+        return {"running": True, "interval_ms": interval_ms}
+
+    @app.post("/profiler/stop")
+    async def profiler_stop():
+        """Stop sampling; the stacks collected, in collapsed format for flamegraph.pl or speedscope."""
+        profiler.stop()
+        return PlainTextResponse(profiler.collapsed())
+
+    @app.get("/profiler")
+    async def profiler_status():
+        return {"running": profiler.running, "samples": profiler.samples, "top": profiler.top()}
+
+async def wait_for_disconnect(websocket):
+    """Return once the client disconnects; anything else it sends is ignored."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
 
 @app.websocket("/live")
 async def live_endpoint(websocket: WebSocket):
     await websocket.accept()
     link = await websocket.receive_text()
-    print("link ",link)
+    logger.info("live subscribe", extra={"link": link})
     if "https://www.youtube.com" in link:
-        stream_url = live_extraction.get_live_stream_url(link)
-        while True:
-            waveform = live_extraction.extract_audio_clip_as_waveform(stream_url, duration=10)
-            print("shape of waveform ",waveform.shape)
-            await websocket.send_text(str(waveform.shape))
+        subscriber = live_hub.subscribe(link)
+        # noticed even while the stream is silent and nothing is being sent
+        disconnected = asyncio.ensure_future(wait_for_disconnect(websocket))
+        try:
+            while True:
+                message = asyncio.ensure_future(subscriber.get())
+                await asyncio.wait({message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not message.done():
+                    message.cancel()
+                    logger.info("live client gone", extra={"link": link})
+                    break
+                if message.result() is None:
+                    break
+                await websocket.send_text(message.result())
+        except Exception as e:
+            logger.info("live client gone: %s", e, extra={"link": link})
+        finally:
+            disconnected.cancel()
+            live_hub.unsubscribe(subscriber)
 
 #to run /live in curl use the following command
 #curl -X GET "http://0.0.0.0:8000/live" -H  "accept: application/json" -d "https://www.youtube.com/watch?v=YDvsBbKfLPA"
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # each worker is a separate process with its own event loop, VAD and executors
+    uvicorn.run("app:app", host=settings.HOST, port=settings.PORT, workers=settings.WORKERS)
 
 #run the server with the following command
 #uvicorn app:app --reload
+#or, with several worker processes sharing one state store:
+#python state_store.py /tmp/zero_trust.sock &
+#STATE_STORE=unix:/tmp/zero_trust.sock WORKERS=4 python app.py
 
     
\ No newline at end of file
@@ -1,8 +1,123 @@
 
+import logging
+from collections import deque
+
 import webrtcvad
 
+from metrics import FAST_BUCKETS, REGISTRY, timed
+
+logger = logging.getLogger(__name__)
+
+VAD_SECONDS = REGISTRY.histogram("zero_trust_vad_seconds", "Time in AudioProcessor.get_speech_chunks per call",
+                                 buckets=FAST_BUCKETS)
+SPEECH_CHUNKS = REGISTRY.counter("zero_trust_speech_chunks_total", "Speech chunks handed out by AudioProcessor")
+CHUNK_SECONDS = REGISTRY.histogram("zero_trust_speech_chunk_seconds", "Audio in each speech chunk handed out",
+                                   buckets=(0.5, 1, 2, 3, 5, 8, 12, 20))
+DROPPED_AUDIO = REGISTRY.counter("zero_trust_dropped_audio_bytes_total",
+                                 "Audio dropped because the backlog went over max_backlog_seconds")
+
+
+class RingBuffer:
+    """
+    Fixed-capacity byte ring buffer.
+
+    Reads hand out memoryviews into the underlying storage instead of copies.
+    Writes that would exceed the capacity drop the oldest data, buffered or
+    just written, in whole multiples of `align` bytes so that readers stay
+    frame aligned.
+    """
+
+    def __init__(self, capacity, align=1):
+        if capacity <= 0 or capacity % align:
+            raise ValueError("capacity must be a positive multiple of align")
+        self.capacity = capacity
+        self.align = align
+        self._data = bytearray(capacity)
+        self._view = memoryview(self._data)
+        self._start = 0
+        self._size = 0
+        self.dropped_bytes = 0
+
+    def __len__(self):
+        return self._size
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        n = len(data)
+        overflow = self._size + n - self.capacity
+        if overflow > 0:
+            # whole frames off the front of the buffered data followed by `data`;
+            # the buffer starts on a frame, so what is left still does
+            overflow += -overflow % self.align
+            buffered = min(overflow, self._size)
+            self.consume(buffered)
+            data = data[overflow - buffered:]
+            n = len(data)
+            self.dropped_bytes += overflow
+
+        end = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - end)
+        self._view[end:end + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        self._size += n
+
+    def peek(self, n):
+        """Return a view of the next `n` bytes without consuming them."""
+        if n > self._size:
+            raise ValueError("not enough data in buffer")
+        end = self._start + n
+        if end <= self.capacity:
+            return self._view[self._start:end]
+        # wrapped read: only happens when reads are not aligned to the capacity
+        return memoryview(bytes(self._view[self._start:]) + bytes(self._view[:end - self.capacity]))
+
+    def frames(self, size):
+        """
+        Yield consecutive `size`-byte views and consume each one once the caller
+        moves on to the next. A trailing partial frame is left in the buffer.
+        """
+        for _ in range(self._size // size):
+            yield self.peek(size)
+            self.consume(size)
+
+    def consume(self, n):
+        n = min(n, self._size)
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        if self._size == 0:
+            self._start = 0
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+
 class AudioProcessor:
-    def __init__(self):
+    """
+    Splits a PCM stream into chunks of speech for transcription.
+
+    chunking="fixed" cuts the speech into 2-second chunks wherever they end,
+    and drops a chunk with 20 or fewer speech frames.
+
+    chunking="adaptive" cuts at the end of each utterance instead:
+    - a chunk closes after `hangover_ms` of non-speech
+    - it is cut early once it reaches `max_utterance_ms`
+    - a chunk with less than `min_speech_ms` of speech (a click, a cough)
+      is dropped
+    - the chunk starts with up to `pre_roll_ms` of the audio before the first
+      speech frame, so the onset of the first word is not clipped
+    With `partial_ms`, every `partial_ms` of an open utterance (up to
+    `max_partials` times) also makes the utterance so far available from
+    take_partial(), for interim transcripts; the final chunk still covers
+    the whole utterance. Each partial is one more transcription request.
+    """
+
+    def __init__(self, max_backlog_seconds=60, chunking="fixed", hangover_ms=300, min_speech_ms=250,
+                 max_utterance_ms=10000, pre_roll_ms=150, partial_ms=None,
+                 max_partials=1):
+        if chunking not in ("fixed", "adaptive"):
+            raise ValueError(f"Unknown chunking mode: {chunking}")
         self.vad = webrtcvad.Vad(3)
 
         #sample rate is 16000 Hz as openai only supports 16kHz
@@ -10,51 +125,162 @@ class AudioProcessor:
 
         self.frame_duration = 30  # one frame will consist of 30ms of audio
         self.frame_size = int(self.sample_rate * self.frame_duration / 1000) * 2  # bytes in a frame
-        
-        
-        self.chunk_duration = 1  # seconds of audio in a chunk (1 second)
-        self.chunk_size = int(self.sample_rate * 2 * 2)  # 2 seconds of audio (16000Hz * 2s * 2bytes)
-
-        #create a buffer to store audio data and a buffer to store speech data
-        self.buffer = bytearray()
-        self.speech_buffer = bytearray()
+
+        self.chunking = chunking
+        if chunking == "fixed":
+            self.chunk_duration = 1  # seconds of audio in a chunk (1 second)
+            self.chunk_size = int(self.sample_rate * 2 * 2)  # 2 seconds of audio (16000Hz * 2s * 2bytes)
+        else:
+            # the longest utterance, in whole frames
+            self.chunk_size = max(1, max_utterance_ms // self.frame_duration) * self.frame_size
+        self.hangover_frames = max(1, hangover_ms // self.frame_duration)
+        self.min_speech_frames = min_speech_ms // self.frame_duration
+        self.pre_roll = deque(maxlen=pre_roll_ms // self.frame_duration)
+        self.partial_frames = partial_ms // self.frame_duration if partial_ms else 0
+        self.max_partials = max_partials
+        self.partials = 0
+        self.silent_frames = 0
+        self._partial = None
+        self._partial_length = 0
+
+        # incoming audio lives in a ring buffer sized to a whole number of frames,
+        # so every frame is a contiguous slice and can be handed to the VAD as a view
+        frames = max(1, int(max_backlog_seconds * 1000 / self.frame_duration))
+        self.buffer = RingBuffer(frames * self.frame_size, align=self.frame_size)
+        # warn once per run of overflowing writes, not on every write
+        self._dropping = False
+
+        # speech is written into a preallocated chunk; a new one is only allocated
+        # when a finished chunk is handed out
+        self.speech_buffer = bytearray(self.chunk_size)
+        self.speech_length = 0
         self.speech_frames = 0
         self.total_frames = 0
 
     def add_audio(self, pcm_data):
         # Add the new audio data to the buffer
-        self.buffer.extend(pcm_data)
+        dropped = self.buffer.dropped_bytes
+        self.buffer.write(pcm_data)
+        dropped = self.buffer.dropped_bytes - dropped
+        if dropped:
+            DROPPED_AUDIO.inc(dropped)
+            if not self._dropping:
+                logger.warning("audio backlog over %d bytes, dropping the oldest audio", self.buffer.capacity,
+                               extra={"dropped_bytes": self.buffer.dropped_bytes})
+        self._dropping = bool(dropped)
+
+    def pending_speech(self):
+        """Return a view of the speech collected so far that has not filled a chunk yet."""
+        return memoryview(self.speech_buffer)[:self.speech_length]
+
+    def take_partial(self):
+        """The open utterance up to the latest partial point (adaptive mode with `partial_ms`), or None."""
+        partial, self._partial = self._partial, None
+        return partial
+
+    def _append_speech(self, frame, chunks):
+        """Copy a frame into the current chunk, emitting the chunk once it is full."""
+        taken = min(len(frame), self.chunk_size - self.speech_length)
+        self.speech_buffer[self.speech_length:self.speech_length + taken] = frame[:taken]
+        self.speech_length += taken
+
+        # Check if we've accumulated 2 seconds of audio
+        if self.speech_length == self.chunk_size:
+            chunk = memoryview(self.speech_buffer)
+            self.speech_buffer = bytearray(self.chunk_size)
+            remaining = len(frame) - taken
+            self.speech_buffer[:remaining] = frame[taken:]
+            self.speech_length = remaining
+
+            logger.debug("chunk filled", extra={"speech_frames": self.speech_frames, "frames": self.total_frames})
+            if self.speech_frames > 20:
+                chunks.append(chunk)
+                SPEECH_CHUNKS.inc()
+                CHUNK_SECONDS.observe(len(chunk) / (2 * self.sample_rate))
+            self.speech_frames = 0
+            self.total_frames = 0
+
+    def _close_utterance(self, chunks):
+        # keep no more trailing non-speech than the pre-roll at the start
+        length = self.speech_length - max(0, self.silent_frames - self.pre_roll.maxlen) * self.frame_size
+        logger.debug("utterance closed", extra={"speech_frames": self.speech_frames, "frames": self.total_frames})
+        if self.speech_frames >= self.min_speech_frames:
+            chunks.append(memoryview(self.speech_buffer)[:length])
+            SPEECH_CHUNKS.inc()
+            CHUNK_SECONDS.observe(length / (2 * self.sample_rate))
+        # a fresh buffer even for a dropped utterance: a partial may still be reading this one
+        self.speech_buffer = bytearray(self.chunk_size)
+        self.speech_length = 0
+        self.speech_frames = 0
+        self.total_frames = 0
+        self.silent_frames = 0
+        self._partial = None
+        self._partial_length = 0
+        self.partials = 0
 
+    def _adaptive_chunks(self):
+        chunks = []
+        frame_size = self.frame_size
+        is_speech = self.vad.is_speech
+        for frame in self.buffer.frames(frame_size):
+            speech = is_speech(frame, self.sample_rate)
+            if self.speech_length == 0:
+                if not speech:
+                    if self.pre_roll.maxlen:
+                        # the ring buffer reuses this memory, so the pre-roll keeps a copy
+                        self.pre_roll.append(bytes(frame))
+                    continue
+                for previous in self.pre_roll:
+                    self.speech_buffer[self.speech_length:self.speech_length + frame_size] = previous
+                    self.speech_length += frame_size
+                self.total_frames = len(self.pre_roll)
+                self.pre_roll.clear()
+
+            end = self.speech_length + frame_size
+            self.speech_buffer[self.speech_length:end] = frame
+            self.speech_length = end
+            self.total_frames += 1
+            if speech:
+                self.speech_frames += 1
+                self.silent_frames = 0
+            else:
+                self.silent_frames += 1
+
+            if self.silent_frames >= self.hangover_frames or end + frame_size > self.chunk_size:
+                self._close_utterance(chunks)
+            elif (self.partial_frames and speech and self.partials < self.max_partials
+                  and end - self._partial_length >= self.partial_frames * frame_size):
+                self._partial = memoryview(self.speech_buffer)[:end]
+                self._partial_length = end
+                self.partials += 1
+        return chunks
+
+    @timed(VAD_SECONDS)
     def get_speech_chunks(self):
         '''
         This function will return a list of chunks of audio data that contain speech.
+        Chunks are memoryviews over buffers that the processor no longer writes to.
         '''
+        if self.chunking == "adaptive":
+            return self._adaptive_chunks()
         chunks = []
-        while len(self.buffer) >= self.frame_size:
-            frame = self.buffer[:self.frame_size]
-            del self.buffer[:self.frame_size]
+        frame_size = self.frame_size
+        is_speech = self.vad.is_speech
+        for frame in self.buffer.frames(frame_size):
             self.total_frames += 1
-            
+
             # Check if the frame contains speech or not
-            if self.vad.is_speech(frame, self.sample_rate):
+            if is_speech(frame, self.sample_rate):
                 self.speech_frames += 1
-                self.speech_buffer.extend(frame)
-                
+            elif self.speech_length == 0:
+                continue
+
+            end = self.speech_length + frame_size
+            if end < self.chunk_size:
+                # fast path: the frame fits in the current chunk
+                self.speech_buffer[self.speech_length:end] = frame
+                self.speech_length = end
             else:
-                if len(self.speech_buffer) > 0:
-                    self.speech_buffer.extend(frame)
-                    
-
-            # Check if we've accumulated 2 seconds of audio
-            if len(self.speech_buffer) >= self.chunk_size:
-                chunk = bytes(self.speech_buffer[:self.chunk_size])
-                remaining = self.speech_buffer[self.chunk_size:]
-                self.speech_buffer = bytearray(remaining)
-
-                print(f"Speech frames : {self.speech_frames}"," out of ",self.total_frames)
-                if self.speech_frames > 20:
-                    chunks.append(chunk)
-                self.speech_frames = 0
-                self.total_frames = 0
-                
-        return chunks
\ No newline at end of file
+                self._append_speech(frame, chunks)
+
+        return chunks
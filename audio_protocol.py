@@ -0,0 +1,58 @@
+import struct
+from collections import namedtuple
+
+# WebSocket subprotocols offered by clients, in order of preference
+BINARY_PROTOCOL = "pcm-binary.v1"
+TEXT_PROTOCOL = "pcm-base64"
+
+FORMAT_S16LE = 1
+
+# little-endian: sequence number, sample rate, sample format, channels, reserved
+HEADER = struct.Struct("<IIBBH")
+HEADER_SIZE = HEADER.size
+
+FrameHeader = namedtuple("FrameHeader", ["seq", "sample_rate", "format", "channels"])
+
+
+class ProtocolError(ValueError):
+    """A binary audio frame the server cannot use; `close_code` is the WebSocket close code to answer with."""
+
+    def __init__(self, message, close_code=1007):
+        super().__init__(message)
+        self.close_code = close_code
+
+
+def negotiate_protocol(offered):
+    """
+    Pick the subprotocol to accept from those the client offered.
+    Returns None for clients that offered none; they get the base64 text protocol.
+    """
+    for protocol in (BINARY_PROTOCOL, TEXT_PROTOCOL):
+        if protocol in offered:
+            return protocol
+    return None
+
+
+def encode_frame(seq, pcm, sample_rate=16000, fmt=FORMAT_S16LE, channels=1):
+    return HEADER.pack(seq & 0xFFFFFFFF, sample_rate, fmt, channels, 0) + bytes(pcm)
+
+
+def decode_frame(message):
+    """
+    Split a binary audio message into its header and a memoryview of the PCM
+    payload; the payload is not copied.
+    """
+    if len(message) < HEADER_SIZE:
+        raise ProtocolError("audio frame shorter than its header")
+    seq, sample_rate, fmt, channels, _ = HEADER.unpack_from(message)
+    return FrameHeader(seq, sample_rate, fmt, channels), memoryview(message)[HEADER_SIZE:]
+
+
+def check_format(header, sample_rate=16000):
+    """Reject audio that AudioProcessor cannot take as-is."""
+    if header.format != FORMAT_S16LE or header.channels != 1 or header.sample_rate != sample_rate:
+        raise ProtocolError(
+            f"unsupported audio: format={header.format} channels={header.channels} "
+            f"sample_rate={header.sample_rate}, expected 16-bit mono at {sample_rate} Hz",
+            close_code=1003
+        )
@@ -0,0 +1,109 @@
+import hashlib
+import inspect
+import time
+
+import numpy as np
+import torch
+
+from metrics import REGISTRY
+
+
+def tokenizer_key(tokenizer):
+    """Identify tokenizers that produce the same ids, so models sharing one are tokenized once."""
+    vocab = sorted(tokenizer.get_vocab().items())
+    digest = hashlib.sha1(repr(vocab).encode("utf-8")).hexdigest()
+    lowercase = getattr(tokenizer, "do_lower_case", None)
+    return (type(tokenizer).__name__, digest, lowercase, tuple(tokenizer.model_input_names))
+
+
+class ClassifierOutput:
+    """Top label and score for every input text of one model."""
+
+    def __init__(self, labels, scores):
+        self.labels = labels
+        self.scores = scores
+
+
+class BatchInferenceEngine:
+    """
+    Runs several Hugging Face text-classification pipelines over the same texts.
+
+    Texts are tokenized once per tokenizer family, sorted by length and
+    split into padded batches of `batch_size`. Every model of the family
+    runs on each batch before moving on, and outputs are scattered back to
+    the input order. Scores follow the pipeline defaults: softmax for
+    single-label heads, sigmoid for one-logit or multi-label heads.
+    """
+
+    def __init__(self, pipelines, batch_size=32, max_length=512):
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.families = {}
+        for name, classifier in pipelines.items():
+            key = tokenizer_key(classifier.tokenizer)
+            if key not in self.families:
+                self.families[key] = (classifier.tokenizer, [])
+            self.families[key][1].append((name, classifier.model))
+        # cumulative inference seconds and texts seen per model, for benchmarks
+        self.timings = {name: 0.0 for name in pipelines}
+        self.texts_seen = {name: 0 for name in pipelines}
+
+    @staticmethod
+    def _accepted_inputs(model):
+        return set(inspect.signature(model.forward).parameters)
+
+    @staticmethod
+    def _scores(model, logits):
+        config = model.config
+        if config.num_labels == 1 or config.problem_type == "multi_label_classification":
+            return torch.sigmoid(logits)
+        return torch.softmax(logits, dim=-1)
+
+    def run(self, texts):
+        """Return {model name: ClassifierOutput} for `texts`, in input order."""
+        texts = [str(text) for text in texts]
+        n = len(texts)
+        outputs = {}
+        for tokenizer, models in self.families.values():
+            if not n:
+                # tokenizers reject an empty batch
+                outputs.update((name, ClassifierOutput([], np.zeros(0, dtype=np.float32))) for name, _ in models)
+                continue
+            encoded = tokenizer(texts, truncation=True, max_length=self.max_length)
+            lengths = np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=n)
+            order = np.argsort(lengths, kind="stable")
+
+            label_ids = {name: np.zeros(n, dtype=np.int64) for name, _ in models}
+            scores = {name: np.zeros(n, dtype=np.float32) for name, _ in models}
+            accepted = {name: self._accepted_inputs(model) for name, model in models}
+
+            for start in range(0, n, self.batch_size):
+                index = order[start:start + self.batch_size]
+                features = [{key: encoded[key][i] for key in encoded.keys()} for i in index]
+                batch = tokenizer.pad(features, return_tensors="pt")
+                for name, model in models:
+                    began = time.perf_counter()
+                    inputs = {key: value.to(model.device) for key, value in batch.items() if key in accepted[name]}
+                    with torch.inference_mode():
+                        probs = self._scores(model, model(**inputs).logits)
+                    best, best_ids = probs.max(dim=-1)
+                    scores[name][index] = best.cpu().numpy()
+                    label_ids[name][index] = best_ids.cpu().numpy()
+                    elapsed = time.perf_counter() - began
+                    self.timings[name] += elapsed
+                    REGISTRY.histogram("zero_trust_model_batch_seconds", "Time per classifier batch",
+                                       model=name).observe(elapsed)
+
+            for name, model in models:
+                id2label = model.config.id2label
+                outputs[name] = ClassifierOutput([id2label[i] for i in label_ids[name].tolist()], scores[name])
+                self.texts_seen[name] += n
+                REGISTRY.counter("zero_trust_model_texts_total", "Texts classified", model=name).inc(n)
+        return outputs
+
+    def throughput(self):
+        """Texts per second of inference time for each model so far."""
+        return {
+            name: self.texts_seen[name] / seconds if seconds else 0.0
+            for name, seconds in self.timings.items()
+        }
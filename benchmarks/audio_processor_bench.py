@@ -0,0 +1,103 @@
+"""
+Microbenchmark for AudioProcessor.get_speech_chunks.
+
+Feeds backlogs of increasing length into the processor in one go and reports
+the cost per 30ms frame and the peak memory traced while doing so, for the
+ring buffer and for the previous bytearray slicing.
+
+The per-frame cost is dominated by the VAD and stays flat for both: CPython's
+`del bytearray[:n]` is amortised O(1), so the old slicing does not grow with
+the backlog, and the ring buffer is no faster per frame (a little slower, in
+fact). What the ring buffer changes is memory. It preallocates
+max_backlog_seconds of audio (60 s by default), so below that it holds more
+than the old buffer, and past it the oldest audio is dropped and memory stays
+flat, where the old buffer grew with whatever the client sent.
+
+Run from the repository root:
+    python -m benchmarks.audio_processor_bench
+"""
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+
+from audio_processor import AudioProcessor
+
+
+class LegacyAudioProcessor(AudioProcessor):
+    """The previous slice-and-delete framing, kept here for comparison."""
+
+    def __init__(self):
+        # a one-frame ring, replaced right away, so it does not count towards the peak
+        super().__init__(max_backlog_seconds=0.03)
+        self.buffer = bytearray()
+        self.speech_buffer = bytearray()
+
+    def add_audio(self, pcm_data):
+        self.buffer.extend(pcm_data)
+
+    def get_speech_chunks(self):
+        chunks = []
+        while len(self.buffer) >= self.frame_size:
+            frame = self.buffer[:self.frame_size]
+            del self.buffer[:self.frame_size]
+            self.total_frames += 1
+            if self.vad.is_speech(frame, self.sample_rate):
+                self.speech_frames += 1
+                self.speech_buffer.extend(frame)
+            elif len(self.speech_buffer) > 0:
+                self.speech_buffer.extend(frame)
+            if len(self.speech_buffer) >= self.chunk_size:
+                chunk = bytes(self.speech_buffer[:self.chunk_size])
+                self.speech_buffer = bytearray(self.speech_buffer[self.chunk_size:])
+                if self.speech_frames > 20:
+                    chunks.append(chunk)
+                self.speech_frames = 0
+                self.total_frames = 0
+        return chunks
+
+
+def make_pcm(seconds, sample_rate=16000):
+    # white noise keeps the VAD busy on both branches
+    return os.urandom(int(seconds * sample_rate) * 2)
+
+
+def per_frame_us(processor_cls, pcm, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        processor = processor_cls()
+        processor.add_audio(pcm)
+        # the frames actually framed: the ring drops what is over its backlog
+        n_frames = (len(pcm) - getattr(processor.buffer, "dropped_bytes", 0)) // processor.frame_size
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            processor.get_speech_chunks()
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed / n_frames)
+    return best * 1e6
+
+
+def peak_mib(processor_cls, pcm):
+    """Peak memory allocated while buffering `pcm` and framing it, the PCM itself excluded."""
+    tracemalloc.start()
+    try:
+        processor = processor_cls()
+        processor.add_audio(pcm)
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor.get_speech_chunks()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    backlogs = [1, 5, 15, 30, 60, 120]
+    print(f"{'backlog (s)':>12} {'ring (us/frame)':>16} {'legacy (us/frame)':>18} "
+          f"{'ring peak (MiB)':>16} {'legacy peak (MiB)':>18}")
+    for seconds in backlogs:
+        pcm = make_pcm(seconds)
+        ring = per_frame_us(AudioProcessor, pcm)
+        legacy = per_frame_us(LegacyAudioProcessor, pcm)
+        print(f"{seconds:>12} {ring:>16.2f} {legacy:>18.2f} "
+              f"{peak_mib(AudioProcessor, pcm):>16.2f} {peak_mib(LegacyAudioProcessor, pcm):>18.2f}")
@@ -0,0 +1,169 @@
+"""
+Replay of recorded speech through AudioProcessor's chunking modes.
+
+Each fixture (--pcm, or synthetic speech by default) is fed in
+browser-sized blocks on the audio clock, as a real-time /ws session would
+send it. Each chunk is "transcribed" by a latency model of the Whisper API:
+`--base-latency-ms` plus `--per-second-ms` per second of audio. Partial
+chunks are skipped while `--max-inflight` requests are still running, as
+SessionPipeline does.
+
+Reported per mode:
+- Whisper requests, and how many of them were partials
+- mean length of the final chunks, and the audio uploaded in total
+- speech kept: the share of speech frames (webrtcvad on the whole fixture)
+  that made it into a final chunk
+- time to first text: from the start of each utterance (speech after at
+  least 300 ms without any) to the first text covering its first frame
+- speech-to-text lag: from the end of each speech frame to the first text
+  covering it
+
+Run from the repository root:
+    python -m benchmarks.chunking_bench
+    python -m benchmarks.chunking_bench --pcm talk.wav --pcm interview.wav --hangover-ms 400
+"""
+import argparse
+
+import numpy as np
+import webrtcvad
+
+from audio_processor import AudioProcessor
+from benchmarks.server_bench import synthetic_speech
+from benchmarks.ws_load import FRAME_SAMPLES, SAMPLE_RATE, load_pcm
+
+BYTES_PER_SECOND = 2 * SAMPLE_RATE
+FRAME_BYTES = 960  # AudioProcessor's 30 ms VAD frame
+
+
+def speech_frames(pcm):
+    """webrtcvad's verdict (mode 3, as AudioProcessor) for every 30 ms frame of `pcm`."""
+    vad = webrtcvad.Vad(3)
+    return np.array([vad.is_speech(pcm[offset:offset + FRAME_BYTES], SAMPLE_RATE)
+                     for offset in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES)])
+
+
+def utterance_onsets(speech, gap_frames=10):
+    """Indices of speech frames preceded by at least `gap_frames` frames without speech."""
+    onsets, silent = [], gap_frames
+    for index, is_speech in enumerate(speech):
+        if is_speech:
+            if silent >= gap_frames:
+                onsets.append(index)
+            silent = 0
+        else:
+            silent += 1
+    return onsets
+
+
+def replay(pcm, options, base_latency, per_second, max_inflight):
+    """
+    Feed `pcm` through an AudioProcessor in real-time blocks. Returns a list
+    of (start byte, end byte, text arrival time, is partial) per request.
+    """
+    processor = AudioProcessor(**options)
+    block_bytes = FRAME_SAMPLES * 2
+    requests, finishes, search_from = [], [], 0
+    for offset in range(0, len(pcm) + block_bytes, block_bytes):
+        now = min(offset + block_bytes, len(pcm)) / BYTES_PER_SECOND
+        if offset < len(pcm):
+            processor.add_audio(pcm[offset:offset + block_bytes])
+            chunks = [(chunk, False) for chunk in processor.get_speech_chunks()]
+        else:
+            # the session ends: what is left is sent if it is at least 0.1 s, as SessionPipeline does
+            remaining = processor.pending_speech()
+            chunks = [(remaining, False)] if len(remaining) >= 0.1 * BYTES_PER_SECOND else []
+        partial = processor.take_partial()
+        if partial is not None and not chunks and sum(finish > now for finish in finishes) < max_inflight:
+            chunks.append((partial, True))
+        for chunk, is_partial in chunks:
+            chunk = bytes(chunk)
+            # every chunk is a contiguous slice of the stream
+            start = pcm.find(chunk, search_from)
+            if not is_partial:
+                search_from = start + len(chunk)
+            finish = now + base_latency + per_second * len(chunk) / BYTES_PER_SECOND
+            finishes.append(finish)
+            requests.append((start, start + len(chunk), finish, is_partial))
+    return requests
+
+
+def first_text(requests, n_frames):
+    """Arrival time of the first text covering each VAD frame (inf if none does)."""
+    arrival = np.full(n_frames, np.inf)
+    final = np.zeros(n_frames, dtype=bool)
+    for start, end, finish, is_partial in requests:
+        first, last = start // FRAME_BYTES, min(n_frames, end // FRAME_BYTES)
+        np.minimum(arrival[first:last], finish, out=arrival[first:last])
+        if not is_partial:
+            final[first:last] = True
+    return arrival, final
+
+
+def evaluate(pcms, options, base_latency, per_second, max_inflight):
+    totals = {"requests": 0, "partials": 0, "final_seconds": [], "uploaded": 0.0, "speech": 0, "kept": 0,
+              "first_text": [], "lag": []}
+    for pcm in pcms:
+        speech = speech_frames(pcm)
+        requests = replay(pcm, options, base_latency, per_second, max_inflight)
+        arrival, final = first_text(requests, len(speech))
+        totals["requests"] += len(requests)
+        totals["partials"] += sum(is_partial for *_, is_partial in requests)
+        totals["final_seconds"] += [(end - start) / BYTES_PER_SECOND for start, end, _, p in requests if not p]
+        totals["uploaded"] += sum(end - start for start, end, *_ in requests) / BYTES_PER_SECOND
+        totals["speech"] += int(speech.sum())
+        totals["kept"] += int((speech & final).sum())
+        frame_starts = np.arange(len(speech)) * FRAME_BYTES / BYTES_PER_SECOND
+        covered = speech & np.isfinite(arrival)
+        totals["lag"] += list(arrival[covered] - (frame_starts[covered] + FRAME_BYTES / BYTES_PER_SECOND))
+        totals["first_text"] += [arrival[i] - frame_starts[i] for i in utterance_onsets(speech)
+                                 if np.isfinite(arrival[i])]
+    return totals
+
+
+def summary(name, totals, audio_seconds):
+    first, lag = np.array(totals["first_text"]), np.array(totals["lag"])
+    print(f"{name}:")
+    print(f"  requests {totals['requests']} ({totals['requests'] / audio_seconds * 60:.1f}/min, "
+          f"{totals['partials']} partial), final chunks {np.mean(totals['final_seconds']):.2f} s on average, "
+          f"{totals['uploaded']:.0f} s of audio uploaded")
+    print(f"  speech kept {totals['kept'] / max(totals['speech'], 1) * 100:.1f}%")
+    print(f"  time to first text: p50 {np.percentile(first, 50):.2f} s, p95 {np.percentile(first, 95):.2f} s "
+          f"({len(first)} utterances)")
+    print(f"  speech-to-text lag: mean {lag.mean():.2f} s, p95 {np.percentile(lag, 95):.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pcm", action="append", default=[],
+                        help="WAV or raw s16le 16 kHz mono recording (repeatable; default: synthetic speech)")
+    parser.add_argument("--seconds", type=float, default=120, help="length of each fixture")
+    parser.add_argument("--base-latency-ms", type=float, default=350, help="Whisper latency per request")
+    parser.add_argument("--per-second-ms", type=float, default=40, help="extra Whisper latency per audio second")
+    parser.add_argument("--max-inflight", type=int, default=4)
+    parser.add_argument("--hangover-ms", type=int, default=300)
+    parser.add_argument("--min-speech-ms", type=int, default=250)
+    parser.add_argument("--max-utterance-ms", type=int, default=10000)
+    parser.add_argument("--pre-roll-ms", type=int, default=150)
+    parser.add_argument("--partial-ms", type=int, default=1000)
+    parser.add_argument("--max-partials", type=int, default=4, help="for the last mode; the one before has one")
+    args = parser.parse_args()
+
+    if args.pcm:
+        pcms = [load_pcm(path, args.seconds) for path in args.pcm]
+    else:
+        pcms = [synthetic_speech(args.seconds, seed) for seed in range(3)]
+    audio_seconds = sum(len(pcm) for pcm in pcms) / BYTES_PER_SECOND
+    adaptive = {"chunking": "adaptive", "hangover_ms": args.hangover_ms, "min_speech_ms": args.min_speech_ms,
+                "max_utterance_ms": args.max_utterance_ms, "pre_roll_ms": args.pre_roll_ms}
+    modes = {
+        "fixed (2 s chunks)": {},
+        "adaptive": adaptive,
+        f"adaptive, one partial after {args.partial_ms} ms": dict(adaptive, partial_ms=args.partial_ms),
+        f"adaptive, up to {args.max_partials} partials every {args.partial_ms} ms":
+            dict(adaptive, partial_ms=args.partial_ms, max_partials=args.max_partials),
+    }
+    print(f"{len(pcms)} fixture(s), {audio_seconds:.0f} s of audio; Whisper latency "
+          f"{args.base_latency_ms:.0f} ms + {args.per_second_ms:.0f} ms per audio second")
+    for name, options in modes.items():
+        summary(name, evaluate(pcms, options, args.base_latency_ms / 1000, args.per_second_ms / 1000,
+                               args.max_inflight), audio_seconds)
@@ -0,0 +1,130 @@
+"""
+Remote-call reduction from the claim filter on a labeled sample.
+
+Each text is labeled 1 (contains a checkable claim) or 0 (greetings,
+filler, opinion). For every threshold the table shows:
+- the share of texts skipped, and the SerpAPI + GPT calls saved (two per
+  skipped text)
+- claim recall: the share of real claims still checked
+- the share of non-claims that were skipped
+
+Scoring throughput is reported too.
+
+The built-in sample is transcript-style windows of about 20 words. The
+heuristic's weights were tuned on it, so its figures there are in-sample.
+Pass --csv FILE with `text` and `label` columns of held-out text to
+validate a scorer and threshold.
+
+Run from the repository root:
+    python -m benchmarks.claim_filter_bench
+    python -m benchmarks.claim_filter_bench --model ./saved_model --tokenizer ./saved_tokenizer
+"""
+import argparse
+import time
+
+from claim_filter import HeuristicClaimScorer, TextClassifierClaimScorer
+
+SAMPLE = [
+    ("hey guys welcome back to the channel today we are going to talk about something really cool so stay tuned", 0),
+    ("before we start please hit that subscribe button and ring the bell so you never miss a video", 0),
+    ("um yeah so I was thinking about this the other day and uh it is kind of funny", 0),
+    ("okay okay let me just share my screen real quick can you all see it now", 0),
+    ("thank you so much for watching guys see you in the next one bye", 0),
+    ("lol that was crazy I did not expect that at all honestly", 0),
+    ("so yeah that is pretty much it for today let me know in the comments what you think", 0),
+    ("I really love this song it makes me feel so happy every single time", 0),
+    ("wow look at that view it is so beautiful up here I could stay forever", 0),
+    ("alright so moving on to the next part of the video let us see what happens", 0),
+    ("hello everyone and good morning hope you are all having a great day so far", 0),
+    ("I think the new design looks nice but maybe the color could be a bit brighter", 0),
+    ("give me one second my camera is acting up again sorry about that guys", 0),
+    ("this is my favorite part of the whole trip honestly I could eat here every day", 0),
+    ("yeah I know right it is kind of weird but that is just how it goes sometimes", 0),
+    ("if you enjoyed this video please like and share it with your friends it really helps", 0),
+    ("so um where was I oh right we were talking about the setup", 0),
+    ("let us take a quick break and grab some coffee and then we will continue", 0),
+    ("the weather is nice today so we decided to go for a walk in the park", 0),
+    ("that is all for now thanks for hanging out with me on this stream", 0),
+    ("I am so excited to show you what we have been working on for the past few weeks", 0),
+    ("ok so now you just mix everything together and let it sit for a bit", 0),
+    ("haha no way you did not just say that that is hilarious", 0),
+    ("make sure to check out the link in the description for more information", 0),
+    ("The unemployment rate fell to 3.5 percent in September according to the Bureau of Labor Statistics", 1),
+    ("India became the most populous country in the world in 2023 overtaking China", 1),
+    ("The COVID vaccine causes infertility in women and the government is hiding the data", 1),
+    ("Mount Everest is 8,849 meters tall making it the highest mountain above sea level", 1),
+    ("Drinking eight glasses of water a day is proven to cure headaches in most people", 1),
+    ("The Great Wall of China is the only man made structure visible from space", 1),
+    ("Inflation in the United States hit 9.1 percent in June 2022 the highest in four decades", 1),
+    ("Scientists confirmed that the Amazon rainforest produces twenty percent of the oxygen on Earth", 1),
+    ("The president signed a law banning TikTok in all government devices last year", 1),
+    ("Tesla sold more electric cars than any other company in 2022", 1),
+    ("Humans only use ten percent of their brains according to a famous study", 1),
+    ("The Earth is about 4.5 billion years old based on radiometric dating of meteorites", 1),
+    ("Einstein failed math in school before becoming the most famous physicist ever", 1),
+    ("Over 70 percent of the planet is covered by water most of it in the oceans", 1),
+    ("The Supreme Court overturned Roe v Wade in June 2022 ending the federal right to abortion", 1),
+    ("Apple was founded in 1976 by Steve Jobs Steve Wozniak and Ronald Wayne", 1),
+    ("5G towers spread the coronavirus and that is why cities had more cases", 1),
+    ("The minimum wage in Germany increased to 12 euros per hour in October 2022", 1),
+    ("Bitcoin was invented by Satoshi Nakamoto and the first block was mined in 2009", 1),
+    ("Eating carrots improves your night vision this was proven by research in World War Two", 1),
+    ("the moon landing was faked and filmed in a studio by Stanley Kubrick", 1),
+    ("vaccines cause autism in children and doctors have known this for years", 1),
+    ("the population of Japan has been declining every year since 2011", 1),
+    ("china produces more than half of the world's steel every year", 1),
+]
+
+
+def evaluate(scores, labels, threshold):
+    keep = [score >= threshold for score in scores]
+    claims = sum(labels)
+    skipped = len(keep) - sum(keep)
+    kept_claims = sum(1 for k, label in zip(keep, labels) if k and label)
+    skipped_non_claims = sum(1 for k, label in zip(keep, labels) if not k and not label)
+    return {
+        "skipped": skipped / len(keep),
+        "calls_saved": 2 * skipped,
+        "claim_recall": kept_claims / claims if claims else 1.0,
+        "non_claims_skipped": skipped_non_claims / (len(keep) - claims) if len(keep) > claims else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", help="labeled sample with text and label (1 = claim) columns")
+    parser.add_argument("--model", help="saved sequence classifier to score with instead of the heuristic")
+    parser.add_argument("--tokenizer", help="tokenizer directory, if saved separately from the model")
+    parser.add_argument("--positive-label", default="Fake")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.1, 0.2, 0.3, 0.4, 0.5])
+    parser.add_argument("--repeat", type=int, default=20, help="scoring passes for the throughput figure")
+    args = parser.parse_args()
+
+    if args.csv:
+        import pandas as pd
+
+        df = pd.read_csv(args.csv)
+        texts, labels = df["text"].astype(str).tolist(), df["label"].astype(int).tolist()
+    else:
+        texts, labels = [text for text, _ in SAMPLE], [label for _, label in SAMPLE]
+
+    if args.model:
+        scorer = TextClassifierClaimScorer(args.model, args.tokenizer, positive_label=args.positive_label)
+    else:
+        scorer = HeuristicClaimScorer()
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        scores = scorer.score_batch(texts)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(texts)} texts ({sum(labels)} claims), {type(scorer).__name__}, "
+          f"{len(texts) * args.repeat / elapsed:.0f} texts/s scored")
+    if not args.csv and not args.model:
+        print("the heuristic was tuned on this sample: these figures are in-sample, not a validation")
+    print(f"without the filter: {2 * len(texts)} remote calls (SerpAPI + GPT per text)")
+    print(f"{'threshold':>9} {'skipped':>8} {'calls saved':>12} {'claim recall':>13} {'non-claims skipped':>19}")
+    for threshold in args.thresholds:
+        result = evaluate(scores, labels, threshold)
+        print(f"{threshold:>9.2f} {result['skipped'] * 100:>7.1f}% {result['calls_saved']:>12} "
+              f"{result['claim_recall'] * 100:>12.1f}% {result['non_claims_skipped'] * 100:>18.1f}%")
@@ -0,0 +1,76 @@
+"""
+Parity check and speed comparison: text_cleaning.clean_texts / word_counts
+against the per-row clean_text and split() word counts they replace.
+
+The corpus mixes synthetic comments with fuzzed markup, character
+references, emoji and unusual whitespace. Any row that differs is printed,
+and the script exits non-zero.
+
+Run from the repository root:
+    python -m benchmarks.clean_text_parity --comments 100000
+"""
+import argparse
+import random
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+from benchmarks.comment_inference_bench import make_comments
+from text_cleaning import clean_texts, word_counts
+from youtube_analyse import clean_text
+
+FRAGMENTS = [
+    "<b>", "</b>", "<br/>", "<a href=x>", "</a>", "<a href=\"x>y\">", "<i class='q'>", "<B>", "</B >",
+    "<!-- note -->", "<!--", "-->", "--!>", "<!DOCTYPE html>", "<?php ?>", "<![CDATA[x]]>", "</>", "</3",
+    "<3", "< ", "<", ">", "<1b>", "<script>x()</script>", "<style>p{}</style>", "<template>t</template>",
+    "<rt>r</rt>", "<textarea>", "&amp;", "&lt;", "&gt;", "&nbsp;", "&nbsp", "&#39;", "&#x27;", "&#150;",
+    "&#0;", "&copy2024", "&notit;", "&unknown;", "&", "&#", "AT&T", "Q&A", "fish & chips", "😀", "İ",
+    "ß", "Ⅻ", "_", "'", "\"", "...", "!!!", "\t", "\n", "\r\n", " ", " ", "　", "\x1c",
+    "​", "\x00", "ＡＢＣ", "naïve", "٣", "x_y", "don't", "#hashtag", "@user", "http://a.b/c?d=e",
+]
+
+
+def fuzz_comments(n, seed=1):
+    rng = random.Random(seed)
+    words = make_comments(200, seed)
+    comments = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 12)):
+            parts.append(rng.choice(FRAGMENTS) if rng.random() < 0.5 else rng.choice(words)[:rng.randint(1, 30)])
+        comments.append(rng.choice(["", " "]).join(parts))
+    return comments
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, default=100000, help="synthetic comments for the timing run")
+    parser.add_argument("--fuzz", type=int, default=20000, help="fuzzed comments for the parity check")
+    args = parser.parse_args()
+    # BeautifulSoup warns about texts that look like URLs or file names
+    warnings.filterwarnings("ignore")
+
+    corpus = pd.Series(fuzz_comments(args.fuzz) + FRAGMENTS + make_comments(args.fuzz))
+    expected = corpus.apply(clean_text)
+    expected_counts = expected.apply(lambda x: len(str(x).split()))
+    cleaned = clean_texts(corpus)
+    counts = word_counts(cleaned)
+
+    mismatches = corpus[(cleaned != expected) | (counts != expected_counts)]
+    for i in mismatches.index[:20]:
+        print(f"MISMATCH {corpus[i]!r}: {expected[i]!r} ({expected_counts[i]}) != {cleaned[i]!r} ({counts[i]})")
+    print(f"parity: {len(corpus) - len(mismatches)}/{len(corpus)} rows identical")
+
+    comments = pd.Series(make_comments(args.comments, seed=2))
+    start = time.perf_counter()
+    baseline = comments.apply(clean_text)
+    baseline.apply(lambda x: len(str(x).split()))
+    old = time.perf_counter() - start
+    start = time.perf_counter()
+    word_counts(clean_texts(comments))
+    new = time.perf_counter() - start
+    print(f"{args.comments} comments: clean_text {old:.2f}s, clean_texts {new:.2f}s ({old / new:.1f}x)")
+
+    sys.exit(1 if len(mismatches) else 0)
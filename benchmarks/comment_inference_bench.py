@@ -0,0 +1,70 @@
+"""
+Throughput benchmark for the comment classifiers in YoutubeAnalysis.
+
+Compares the old one-comment-at-a-time pipeline calls with the batched
+BatchInferenceEngine on a synthetic comment set and reports comments/sec
+per model.
+
+Run from the repository root:
+    python -m benchmarks.comment_inference_bench --comments 10000 --batch-size 32
+"""
+import argparse
+import random
+import time
+
+from youtube_analyse import YoutubeAnalysis
+
+VOCAB = (
+    "this video is great i love the music so much worst thing ever seen "
+    "click here for free money subscribe to my channel lol what a joke "
+    "thank you for sharing amazing work sad to hear that why would anyone"
+).split()
+
+
+def make_comments(n, seed=0):
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(VOCAB) for _ in range(rng.randint(3, 60))) for _ in range(n)]
+
+
+def sequential_throughput(analysis, comments):
+    classifiers = {
+        "sentiment": analysis.sentiment_classifier,
+        "spam": analysis.spam_classifier,
+        "sarcasm": analysis.sarcasm_classifier,
+        "emotion": analysis.emotion_classifier,
+    }
+    rates = {}
+    for name, classifier in classifiers.items():
+        start = time.perf_counter()
+        for text in comments:
+            classifier(text)
+        rates[name] = len(comments) / (time.perf_counter() - start)
+    return rates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--sequential-sample", type=int, default=500,
+                        help="comments used for the (slow) one-at-a-time baseline")
+    args = parser.parse_args()
+
+    analysis = YoutubeAnalysis(batch_size=args.batch_size)
+    comments = make_comments(args.comments)
+
+    # every comment can be filtered out before classification
+    empty = analysis.engine.run([])
+    assert all(len(output.labels) == len(output.scores) == 0 for output in empty.values()), "empty input"
+
+    baseline = sequential_throughput(analysis, comments[:args.sequential_sample])
+
+    start = time.perf_counter()
+    analysis.engine.run(comments)
+    total = time.perf_counter() - start
+    batched = analysis.engine.throughput()
+
+    print(f"{args.comments} comments, batch size {args.batch_size}, end-to-end {args.comments / total:.1f} comments/s")
+    print(f"{'model':>10} {'sequential/s':>13} {'batched/s':>10} {'speedup':>8}")
+    for name in batched:
+        print(f"{name:>10} {baseline[name]:>13.1f} {batched[name]:>10.1f} {batched[name] / baseline[name]:>7.1f}x")
@@ -0,0 +1,119 @@
+"""
+Repeat-analysis latency of YoutubeAnalysis with and without a CommentStore.
+
+A seeded fixture of --comments comments stands in for a video's download
+(the downloader is replaced, so only cleaning, classification and the store
+are timed). The video is then revisited after --new-share more comments
+arrived and the votes of the others changed:
+- without store: every comment is cleaned and classified again, as on every
+  call before
+- store, first analysis: the same, plus writing every row
+- store, repeat: only the new comments are cleaned and go through the
+  models; those the word-count filter dropped before are skipped too
+- store, within refresh_after: the stored rows, without downloading
+
+The repeat's stats are compared with the full re-analysis of the same
+comments.
+
+Run from the repository root:
+    python -m benchmarks.comment_store_bench --comments 20000 --new-share 0.01
+Use --model-dir DIR to load DIR/<name> instead of the Hub models.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.comment_inference_bench import make_comments
+from comment_store import CommentStore
+from model_registry import COMMENT_MODELS, ModelRegistry
+from youtube_analyse import YoutubeAnalysis
+
+URL = "https://www.youtube.com/watch?v=benchmark01"
+
+
+class FixtureAnalysis(YoutubeAnalysis):
+    """YoutubeAnalysis with the download replaced by `self.comments`."""
+
+    comments = None
+    cleaned = 0
+
+    def download_comments(self, url):
+        return self.comments.copy()
+
+    def clean_and_filter_comments(self, df, models=None):
+        self.cleaned += len(df)
+        return super().clean_and_filter_comments(df, models)
+
+
+def make_fixture(texts, seed):
+    rng = random.Random(seed)
+    df = pd.DataFrame({
+        'text': texts,
+        'votes': [str(rng.randint(0, 5000)) for _ in texts],
+        'reply_count': [rng.randint(0, 40) for _ in texts],
+        'heart': [rng.random() < 0.02 for _ in texts],
+    })
+    return df.drop_duplicates(subset='text')
+
+
+def timed(analysis, comments):
+    analysis.comments = comments
+    start = time.perf_counter()
+    result = analysis.analyze_comments(URL)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--new-share", type=float, default=0.01, help="comments added before the revisit")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--model-dir", help="load models from DIR/<name> instead of the Hub")
+    args = parser.parse_args()
+
+    models = dict(COMMENT_MODELS)
+    if args.model_dir:
+        models = {name: os.path.join(args.model_dir, name) for name in models}
+    registry = ModelRegistry(models=models)
+    new = max(1, int(args.comments * args.new_share))
+    texts = make_comments(args.comments + new)
+    first = make_fixture(texts[:args.comments], seed=1)
+    revisit = make_fixture(texts, seed=2)
+
+    workdir = tempfile.mkdtemp(prefix="comment_store_bench_")
+    try:
+        store = CommentStore(os.path.join(workdir, "comments.sqlite"))
+        plain = FixtureAnalysis(args.batch_size, registry)
+        stored = FixtureAnalysis(args.batch_size, registry, store=store)
+        fresh = FixtureAnalysis(args.batch_size, registry, store=store, refresh_after=3600)
+        # load the models outside the timings
+        timed(plain, first.head(args.batch_size))
+
+        print(f"{len(first)} comments, {len(revisit) - len(first)} new on the revisit, batch size {args.batch_size}")
+        timings = {}
+        for name, analysis, comments in (("without store", plain, revisit),
+                                         ("store, first analysis", stored, first),
+                                         ("store, repeat", stored, revisit),
+                                         ("store, within refresh_after", fresh, revisit)):
+            analysis.cleaned = 0
+            timings[name], results = timed(analysis, comments)
+            if name == "without store":
+                reference = results
+            elif name == "store, repeat":
+                repeat = results
+                repeat_cleaned = analysis.cleaned
+            print(f"  {name:<28} {timings[name]:8.2f}s")
+        print(f"  repeat is {timings['without store'] / timings['store, repeat']:.0f}x faster than re-analysing, "
+              f"{timings['without store'] / timings['store, within refresh_after']:.0f}x within refresh_after")
+        print(f"  repeat stats match the full re-analysis: {repeat == reference}")
+        print(f"  repeat cleaned {repeat_cleaned} comments for {len(revisit) - len(first)} new ones")
+        size = os.path.getsize(os.path.join(workdir, "comments.sqlite"))
+        print(f"  store: {store.stats()['comments']} comments, {size / 2 ** 20:.1f} MB")
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,85 @@
+"""
+Accuracy parity and speed of the CPU backends (see cpu_inference) for each
+comment classifier.
+
+Every backend classifies the same fixed, seeded comment set through
+BatchInferenceEngine. For each model, the table shows:
+- load time, including any ONNX export or quantization
+- weight memory
+- throughput, and speedup over fp32
+- label agreement with fp32, and the largest absolute difference in the
+  top-label probability
+
+A model/backend pair is marked "ok" when agreement is at least
+--min-agreement.
+
+Run from the repository root:
+    python -m benchmarks.cpu_backend_bench --comments 2000 --backends fp32 int8 onnx onnx-int8
+Use --model-dir DIR to load DIR/<name> instead of the Hub models.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.comment_inference_bench import make_comments
+from cpu_inference import BACKENDS
+from model_registry import COMMENT_MODELS, ModelRegistry, model_bytes
+
+
+def run_backend(backend, models, names, comments, args):
+    registry = ModelRegistry(models=models, backends={name: backend for name in names},
+                             onnx_cache_dir=args.cache_dir)
+    load = {}
+    for name in names:
+        began = time.perf_counter()
+        registry.get(name)
+        load[name] = time.perf_counter() - began
+    engine = registry.engine(names, args.batch_size)
+    engine.run(comments[:args.batch_size * 2])  # warm up
+    seen = dict(engine.texts_seen)
+    timings = dict(engine.timings)
+    outputs = engine.run(comments)
+    return {
+        name: {
+            "load": load[name],
+            "mb": model_bytes(registry.get(name)) / (1024 * 1024),
+            "rate": (engine.texts_seen[name] - seen[name]) / (engine.timings[name] - timings[name]),
+            "labels": outputs[name].labels,
+            "scores": np.asarray(outputs[name].scores),
+        }
+        for name in names
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--models", nargs="+", default=list(COMMENT_MODELS), choices=list(COMMENT_MODELS))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--model-dir", help="load models from DIR/<name> instead of the Hub")
+    parser.add_argument("--cache-dir", help="where exported ONNX graphs are kept")
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    args = parser.parse_args()
+
+    models = dict(COMMENT_MODELS)
+    if args.model_dir:
+        models = {name: os.path.join(args.model_dir, name) for name in models}
+    comments = make_comments(args.comments)
+    backends = ["fp32"] + [backend for backend in args.backends if backend != "fp32"]
+    results = {backend: run_backend(backend, models, args.models, comments, args) for backend in backends}
+
+    print(f"{args.comments} comments, batch size {args.batch_size}")
+    print(f"{'model':>10} {'backend':>10} {'load s':>7} {'MB':>7} {'comments/s':>11} {'speedup':>8} "
+          f"{'agreement':>10} {'max dscore':>11}")
+    for name in args.models:
+        reference = results["fp32"][name]
+        for backend in backends:
+            result = results[backend][name]
+            agreement = np.mean([a == b for a, b in zip(result["labels"], reference["labels"])])
+            max_diff = float(np.max(np.abs(result["scores"] - reference["scores"])))
+            verdict = "" if backend == "fp32" else ("ok" if agreement >= args.min_agreement else "check")
+            print(f"{name:>10} {backend:>10} {result['load']:>7.1f} {result['mb']:>7.1f} {result['rate']:>11.1f} "
+                  f"{result['rate'] / reference['rate']:>7.2f}x {agreement * 100:>9.2f}% {max_diff:>11.4f} {verdict}")
@@ -0,0 +1,148 @@
+"""
+Checks AsyncFactChecker against the local stand-ins of benchmarks/fake_services.py.
+
+- retries: with --error-rate of the requests answered 503, every claim
+  still gets a parsed verdict
+- per-host limit: with per_host_limit=4, the claims take at least the
+  time of their completions run four at a time
+- cache: checking the same claims again makes no remote calls
+- event loop: with a shared store that takes 100 ms per call, the loop
+  keeps running; cache calls go to the executor
+- timeouts: against a stand-in slower than `timeout`, a check still
+  returns a verdict pair instead of raising
+
+Failures are printed and the script exits non-zero.
+
+Run from the repository root:
+    python -m benchmarks.fact_checker_check
+"""
+import argparse
+import asyncio
+import math
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.server_bench import get_json, stop, wait_for_port
+from fact_cache import FactCache
+from SearchVerification import AsyncFactChecker
+from state_store import InProcessStore
+
+CLAIMS = [f"The city council approved budget number {i} for the new bridge" for i in range(40)]
+
+
+class SlowStore(InProcessStore):
+    """A shared store with the round-trip time of a busy socket."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def get(self, key):
+        time.sleep(self.delay)
+        return super().get(key)
+
+    def set(self, key, value, ttl=None):
+        time.sleep(self.delay)
+        return super().set(key, value, ttl)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake(port, latency_ms, error_rate):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_services", "--port", str(port), "--jitter", "0",
+         "--chat-latency-ms", str(latency_ms), "--search-latency-ms", str(latency_ms),
+         "--error-rate", str(error_rate)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_port(port, process)
+    return process
+
+
+def checker(port, **kwargs):
+    return AsyncFactChecker("serp-test", "sk-test", serpapi_url=f"http://127.0.0.1:{port}/search",
+                            openai_base_url=f"http://127.0.0.1:{port}/v1", **kwargs)
+
+
+def remote_calls(port):
+    return sum(get_json(f"http://127.0.0.1:{port}/stats")["requests"].values())
+
+
+async def max_loop_lag(work, interval=0.01):
+    """Run `work` while a heartbeat measures how late the loop wakes it."""
+    lags = []
+
+    async def heartbeat():
+        while True:
+            began = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - began - interval)
+
+    beat = asyncio.ensure_future(heartbeat())
+    try:
+        result = await work
+    finally:
+        beat.cancel()
+    return result, max(lags, default=0.0)
+
+
+async def run_checks(args, flaky_port, slow_port):
+    failures = []
+
+    def check(name, ok, detail):
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    fact_checker = checker(flaky_port, cache=FactCache(), per_host_limit=4, max_retries=8, backoff=0.01)
+    start = time.perf_counter()
+    verdicts = await fact_checker.fact_check_many(CLAIMS)
+    elapsed = time.perf_counter() - start
+    errors = get_json(f"http://127.0.0.1:{flaky_port}/stats")["errors"]
+    failed = [verdict for verdict in verdicts if verdict[1] == "Error"]
+    check("retries", not failed, f"{len(CLAIMS) - len(failed)}/{len(CLAIMS)} verdicts parsed, "
+          f"{sum(errors.values())} requests answered 503")
+    # search and completion per claim, each at least one latency, four at a time per host
+    bound = 2 * math.ceil(len(CLAIMS) / 4) * args.latency_ms / 1000
+    check("per-host limit", elapsed >= bound * 0.9, f"{elapsed:.2f}s for a lower bound of {bound:.2f}s")
+
+    calls = remote_calls(flaky_port)
+    again = await fact_checker.fact_check_many(CLAIMS)
+    check("cache", remote_calls(flaky_port) == calls and again == verdicts,
+          f"{remote_calls(flaky_port) - calls} remote calls on the second pass")
+    await fact_checker.aclose()
+
+    fact_checker = checker(flaky_port, cache=FactCache(store=SlowStore(0.1)), max_retries=8, backoff=0.01)
+    _, lag = await max_loop_lag(fact_checker.fact_check_many(CLAIMS[:8]))
+    check("event loop", lag < 0.05, f"longest stall {lag * 1000:.0f} ms with 100 ms store calls")
+    await fact_checker.aclose()
+
+    fact_checker = checker(slow_port, timeout=0.1, max_retries=1, backoff=0.01)
+    try:
+        verdict = await asyncio.wait_for(fact_checker.fact_check(CLAIMS[0]), 5)
+        check("timeouts", len(verdict) == 2, f"slow stand-in answered with {verdict}")
+    except Exception as e:
+        check("timeouts", False, f"raised {e!r}")
+    await fact_checker.aclose()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=50, help="stand-in latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    flaky_port, slow_port = free_port(), free_port()
+    processes = [start_fake(flaky_port, args.latency_ms, args.error_rate), start_fake(slow_port, 1000, 0.0)]
+    try:
+        failures = asyncio.run(run_checks(args, flaky_port, slow_port))
+    finally:
+        stop(processes)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,129 @@
+"""
+Local stand-ins for the remote services the server calls, for offline benchmarks.
+
+    POST /v1/audio/transcriptions  Whisper: text derived from the uploaded audio
+    POST /v1/chat/completions      fact-check completions in the JSON format the prompts ask for
+    GET  /search                   SerpAPI: one organic result with a snippet
+    GET  /stats                    request counts and errors per endpoint
+
+Point the server at it with OPENAI_BASE_URL=http://HOST:PORT/v1 and
+SERPAPI_URL=http://HOST:PORT/search. Every response is delayed by the
+endpoint's latency plus up to `--jitter` of it. `--error-rate` answers that
+share of requests with a 503, so the clients' retry paths get exercised too.
+
+    python -m benchmarks.fake_services --port 9100 --whisper-latency-ms 400 --chat-latency-ms 800
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+WORDS = [
+    "the", "government", "announced", "new", "policy", "today", "prices", "rose", "by", "ten", "percent",
+    "in", "india", "scientists", "found", "water", "on", "mars", "election", "results", "show", "growth",
+]
+SENTIMENTS = ["Ultra Negative", "Negative", "Neutral", "Positive", "Ultra Positive"]
+VERDICTS = ["True", "False", "Neutral"]
+
+# 16-bit mono 16 kHz audio, as the server uploads it
+AUDIO_BYTES_PER_SECOND = 32000
+
+
+def fake_text(data, words_per_second=2.5):
+    """Deterministic words for an audio upload, about as many as speech of that length has."""
+    seed = zlib.crc32(data)
+    words = []
+    for _ in range(max(1, int(len(data) / AUDIO_BYTES_PER_SECOND * words_per_second))):
+        words.append(WORDS[seed % len(WORDS)])
+        seed = (seed * 1103515245 + 12345) & 0x7FFFFFFF
+    return ' '.join(words)
+
+
+def fake_verdict(prompt):
+    """The JSON the fact-check prompts ask for: one object, or an array for a numbered batch."""
+    seed = zlib.crc32(prompt.encode("utf-8"))
+    claims = prompt.count("Current Info ")
+    if "Respond with a JSON array" in prompt:
+        return json.dumps([
+            {"id": i, "sentiment": SENTIMENTS[(seed + i) % 5], "claim_verification": VERDICTS[(seed + i) % 3]}
+            for i in range(1, claims + 1)
+        ])
+    return json.dumps({"sentiment": SENTIMENTS[seed % 5], "claim_verification": VERDICTS[seed % 3]})
+
+
+def create_app(whisper_latency=0.3, chat_latency=0.6, search_latency=0.2, jitter=0.2, error_rate=0.0, seed=0):
+    app = FastAPI()
+    rng = random.Random(seed)
+    requests, errors = Counter(), Counter()
+
+    async def delay(endpoint, latency):
+        """Wait out the endpoint's latency; a JSONResponse if this request is to fail."""
+        requests[endpoint] += 1
+        await asyncio.sleep(latency * (1 + jitter * rng.random()))
+        if rng.random() < error_rate:
+            errors[endpoint] += 1
+            return JSONResponse({"error": {"message": "overloaded (fake)"}}, status_code=503)
+        return None
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        # the multipart body is hashed as is; parsing it would only add a dependency
+        body = await request.body()
+        return await delay("whisper", whisper_latency) or {"text": fake_text(body)}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        prompt = payload["messages"][-1]["content"]
+        failed = await delay("chat", chat_latency)
+        if failed is not None:
+            return failed
+        content = fake_verdict(prompt)
+        return {
+            "id": f"chatcmpl-fake-{requests['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+
+    @app.get("/search")
+    async def search(q: str = ""):
+        return await delay("search", search_latency) or {
+            "organic_results": [{"position": 1, "title": q[:60], "snippet": f"Reports about {q[:200]}."}]
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": dict(requests), "errors": dict(errors)}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--whisper-latency-ms", type=float, default=300)
+    parser.add_argument("--chat-latency-ms", type=float, default=600)
+    parser.add_argument("--search-latency-ms", type=float, default=200)
+    parser.add_argument("--jitter", type=float, default=0.2, help="extra random latency, as a share of the base")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(args.whisper_latency_ms / 1000, args.chat_latency_ms / 1000, args.search_latency_ms / 1000,
+                   args.jitter, args.error_rate),
+        host=args.host, port=args.port, log_level="warning"
+    )
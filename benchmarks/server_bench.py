@@ -0,0 +1,463 @@
+"""
+End-to-end load test of the whole server, offline.
+
+Starts the server (app.py) with every remote dependency replaced by a
+local stand-in:
+- OpenAI (Whisper and completions) and SerpAPI, served by
+  benchmarks/fake_services.py with configurable latency
+- a fake `yt-dlp` on the server's PATH that resolves every link to a local
+  media file, so /live plays that file in real time through ffmpeg
+
+It then opens --sessions concurrent /ws sessions. Each streams recorded
+PCM (--pcm, or synthetic speech) in browser-sized frames at real-time pace,
+rotated per session so that every session says something different.
+
+The client replays the same frames through AudioProcessor to know which
+frame completes each speech chunk. End-to-end latency is measured from
+sending that frame to receiving:
+- the chunk's transcript
+- the verdict of the fact check that transcript triggered
+
+Also reported:
+- p50/p95/p99 of both latencies
+- sessions per core: real-time audio streamed per CPU second of the
+  server's process tree
+- memory per session: the peak RSS of the process tree over the idle
+  baseline, divided by the number of sessions
+- remote calls made
+
+With --live-clients, /live is loaded the same way (this needs ffmpeg).
+
+Run from the repository root:
+    python -m benchmarks.server_bench --sessions 20 --seconds 30
+    python -m benchmarks.server_bench --sessions 50 --pcm speech.wav --env WORKERS=2 --env CLAIM_FILTER=heuristic
+    python -m benchmarks.server_bench --sessions 0 --live-clients 50 --live-streams 5
+"""
+import argparse
+import asyncio
+import base64
+import importlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import wave
+
+import numpy as np
+import websockets
+
+from audio_processor import AudioProcessor
+from audio_protocol import BINARY_PROTOCOL, TEXT_PROTOCOL, encode_frame
+from benchmarks.ws_load import FRAME_SAMPLES, SAMPLE_RATE, load_pcm, process_cpu_seconds
+
+# SessionPipeline's fact_check_words: transcribed words per fact check
+FACT_CHECK_WORDS = 20
+
+
+def synthetic_speech(seconds, seed=0):
+    """Voiced bursts of 2-6 s between short pauses, as 16 kHz PCM; webrtcvad classifies it as speech."""
+    rng = np.random.default_rng(seed)
+    parts, total, n = [], 0, int(seconds * SAMPLE_RATE)
+    while total < n:
+        t = np.arange(int(rng.uniform(2, 6) * SAMPLE_RATE)) / SAMPLE_RATE
+        # a wavering pitch with harmonics, at a syllable-like 4 Hz loudness
+        pitch = rng.uniform(100, 220) * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 15)) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2) * 0.3
+        pause = rng.normal(0, 0.003, int(rng.uniform(0.4, 1.2) * SAMPLE_RATE))
+        parts += [voiced, pause]
+        total += len(voiced) + len(pause)
+    return (np.clip(np.concatenate(parts)[:n], -1, 1) * 32767).astype('<i2').tobytes()
+
+
+def write_wav(path, pcm):
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(pcm)
+
+
+def rotate(pcm, offset_seconds):
+    offset = int(offset_seconds * SAMPLE_RATE) % (len(pcm) // 2) * 2
+    return pcm[offset:] + pcm[:offset]
+
+
+def server_audio_options(env_items):
+    """The AudioProcessor options (settings.AUDIO_OPTIONS) the server reads from its environment."""
+    import settings
+    saved = dict(os.environ)
+    os.environ.update(item.split("=", 1) for item in env_items)
+    try:
+        return dict(importlib.reload(settings).AUDIO_OPTIONS)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+        importlib.reload(settings)
+
+
+def chunk_points(pcm, block_bytes, options=None):
+    """For each speech chunk AudioProcessor produces from `pcm` fed in blocks, the index of the completing block."""
+    processor = AudioProcessor(**dict(options or {}, partial_ms=None))
+    points = []
+    for index, offset in enumerate(range(0, len(pcm), block_bytes)):
+        processor.add_audio(pcm[offset:offset + block_bytes])
+        points += [index] * len(processor.get_speech_chunks())
+    return points
+
+
+def process_tree(pid):
+    """`pid` and all of its descendants (uvicorn workers, process pools)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except OSError:
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack += children.get(current, [])
+    return tree
+
+
+def tree_cpu_seconds(pid):
+    total = 0.0
+    for member in process_tree(pid):
+        try:
+            total += process_cpu_seconds(member)
+        except OSError:
+            pass
+    return total
+
+
+def tree_rss_bytes(pid):
+    total = 0
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+def wait_for_port(port, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"process exited with {process.returncode} before listening on {port}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"nothing listening on port {port} after {timeout}s")
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def percentiles(values):
+    if not values:
+        return "n/a"
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms (n={len(values)})"
+
+
+class MemorySampler:
+    """Peak RSS of the server's process tree, sampled in the background."""
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            self.peak = max(self.peak, await loop.run_in_executor(None, tree_rss_bytes, self.pid))
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+def fact_check_triggers(texts, words=FACT_CHECK_WORDS):
+    """Indices of the transcripts that complete a fact-check window, as SessionPipeline.aggregate buffers them."""
+    triggers, buffer = [], []
+    for index, text in enumerate(texts):
+        buffer.append(text)
+        if len(' '.join(buffer).split()) >= words:
+            triggers.append(index)
+            buffer.clear()
+    return triggers
+
+
+async def ws_session(url, protocol, pcm, points, stats, drain, quiet=2.0):
+    """Stream `pcm` at real-time pace and time every transcript and verdict against the frame that completed its chunk."""
+    frame_bytes = FRAME_SAMPLES * 2
+    interval = FRAME_SAMPLES / SAMPLE_RATE
+    sent_at, transcripts, texts, verdicts = [], [], [], []
+    last_message = [time.perf_counter()]
+    async with websockets.connect(url, subprotocols=[protocol], max_size=None) as ws:
+
+        async def receive():
+            async for message in ws:
+                now = last_message[0] = time.perf_counter()
+                if message.startswith("Partial: "):
+                    continue
+                if message.startswith("Verification: "):
+                    verdicts.append(now)
+                elif not message.startswith("Sentiment: "):
+                    transcripts.append(now)
+                    texts.append(message)
+
+        reader = asyncio.ensure_future(receive())
+        start = time.perf_counter()
+        for seq, offset in enumerate(range(0, len(pcm), frame_bytes)):
+            frame = pcm[offset:offset + frame_bytes]
+            if protocol == BINARY_PROTOCOL:
+                await ws.send(encode_frame(seq, frame, SAMPLE_RATE))
+            else:
+                await ws.send(base64.b64encode(frame).decode())
+            sent_at.append(time.perf_counter())
+            delay = start + (seq + 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        # wait for the outstanding transcripts, then for fact checks until the session goes quiet
+        deadline = time.perf_counter() + drain
+        while time.perf_counter() < deadline and (
+                len(transcripts) < len(points) or time.perf_counter() - last_message[0] < quiet):
+            await asyncio.sleep(0.1)
+        reader.cancel()
+
+    for k, received in enumerate(transcripts[:len(points)]):
+        stats["transcript"].append(received - sent_at[points[k]])
+    # verdicts arrive in the order their checks were started, whatever transcripts arrive in between
+    for received, k in zip(verdicts, fact_check_triggers(texts)):
+        if k < len(points):
+            stats["verdict"].append(received - sent_at[points[k]])
+    stats["missing"] += max(0, len(points) - len(transcripts))
+
+
+async def live_client(url, link, media_points, stats, seconds):
+    """Watch `link` on /live for `seconds`, timing transcripts against the media clock."""
+    received = []
+    connected = time.perf_counter()
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(link)
+
+        async def receive():
+            async for message in ws:
+                if not message.startswith(("Sentiment: ", "Verification: ")):
+                    received.append(time.perf_counter())
+
+        try:
+            await asyncio.wait_for(receive(), seconds)
+        except asyncio.TimeoutError:
+            pass
+    stats["messages"].append(len(received))
+    if received:
+        stats["first"].append(received[0] - connected)
+        # lag behind the media clock, counting from when this client connected, so
+        # ffmpeg start-up is included for the first viewer of a stream
+        joined = stats["started"].setdefault(link, connected)
+        for k, at in enumerate(received[:len(media_points)]):
+            stats["lag"].append(at - joined - media_points[k])
+
+
+async def measure(pid, n_sessions, audio_seconds, run):
+    """Run `run()` and return its server CPU seconds, sessions per core and memory per session."""
+    cpu_before = tree_cpu_seconds(pid)
+    baseline = tree_rss_bytes(pid)
+    start = time.perf_counter()
+    with MemorySampler(pid) as sampler:
+        await run()
+    wall = time.perf_counter() - start
+    cpu = tree_cpu_seconds(pid) - cpu_before
+    peak = max(sampler.peak, baseline)
+    return {
+        "wall": wall,
+        "cpu": cpu,
+        "sessions_per_core": audio_seconds / cpu if cpu else float("inf"),
+        "baseline_mb": baseline / 2 ** 20,
+        "peak_mb": peak / 2 ** 20,
+        "per_session_mb": (peak - baseline) / 2 ** 20 / max(n_sessions, 1),
+    }
+
+
+def report(name, usage):
+    print(f"  wall {usage['wall']:.1f}s, server CPU {usage['cpu']:.1f}s, "
+          f"{usage['sessions_per_core']:.1f} real-time sessions/core")
+    print(f"  RSS {usage['baseline_mb']:.0f} MB idle, {usage['peak_mb']:.0f} MB peak, "
+          f"{usage['per_session_mb']:.2f} MB per {name}")
+
+
+async def run_ws(args, base_pcm, pid):
+    url = f"ws://127.0.0.1:{args.port}/ws"
+    protocol = BINARY_PROTOCOL if args.protocol == "binary" else TEXT_PROTOCOL
+    pcms = [rotate(base_pcm, i * 0.37) for i in range(args.sessions)]
+    points = [chunk_points(pcm, FRAME_SAMPLES * 2, args.audio_options) for pcm in pcms]
+
+    # one short session first, so lazy start-up costs stay out of the numbers
+    warmup = {"transcript": [], "verdict": [], "missing": 0}
+    await ws_session(url, protocol, base_pcm[:SAMPLE_RATE * 2 * 5], chunk_points(base_pcm[:SAMPLE_RATE * 2 * 5],
+                     FRAME_SAMPLES * 2, args.audio_options), warmup, args.drain)
+
+    stats = {"transcript": [], "verdict": [], "missing": 0}
+
+    async def sessions():
+        async def staggered(i):
+            await asyncio.sleep(args.ramp * i / max(args.sessions, 1))
+            await ws_session(url, protocol, pcms[i], points[i], stats, args.drain)
+        await asyncio.gather(*(staggered(i) for i in range(args.sessions)))
+
+    usage = await measure(pid, args.sessions, args.sessions * len(base_pcm) / (2 * SAMPLE_RATE), sessions)
+    print(f"/ws: {args.sessions} sessions x {len(base_pcm) / (2 * SAMPLE_RATE):.0f}s of audio ({args.protocol})")
+    print(f"  transcript latency: {percentiles(stats['transcript'])}"
+          + (f", {stats['missing']} transcripts missing" if stats["missing"] else ""))
+    print(f"  verdict latency:    {percentiles(stats['verdict'])}")
+    report("session", usage)
+
+
+async def run_live(args, base_pcm, pid):
+    url = f"ws://127.0.0.1:{args.port}/live"
+    # the hub reads the stream in 0.5 s blocks
+    block_seconds = 0.5
+    media_points = [(index + 1) * block_seconds
+                    for index in chunk_points(base_pcm, int(block_seconds * SAMPLE_RATE) * 2, args.audio_options)]
+    stats = {"first": [], "lag": [], "messages": [], "started": {}}
+
+    async def clients():
+        async def staggered(i):
+            await asyncio.sleep(args.ramp * i / max(args.live_clients, 1))
+            link = f"https://www.youtube.com/watch?v=bench{i % args.live_streams}"
+            await live_client(url, link, media_points, stats, len(base_pcm) / (2 * SAMPLE_RATE) + args.drain)
+        await asyncio.gather(*(staggered(i) for i in range(args.live_clients)))
+
+    # one ingestion per stream, shared by its clients
+    usage = await measure(pid, args.live_clients, args.live_streams * len(base_pcm) / (2 * SAMPLE_RATE), clients)
+    print(f"/live: {args.live_clients} clients on {args.live_streams} stream(s)")
+    print(f"  first transcript:      {percentiles(stats['first'])}")
+    print(f"  lag behind the media:  {percentiles(stats['lag'])}")
+    print(f"  transcripts per client: {np.mean(stats['messages']) if stats['messages'] else 0:.1f} "
+          f"of {len(media_points)}")
+    report("client", usage)
+
+
+def start_services(args, workdir, base_pcm):
+    """Start the fake services and the server; returns (processes, server)."""
+    media = os.path.join(workdir, "media.wav")
+    write_wav(media, base_pcm)
+    # stands in for `yt-dlp -g <link>`: every link resolves to the local file
+    yt_dlp = os.path.join(workdir, "yt-dlp")
+    with open(yt_dlp, "w") as f:
+        f.write(f"#!/bin/sh\necho {media}\n")
+    os.chmod(yt_dlp, 0o755)
+
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_services", "--port", str(args.fake_port),
+         "--whisper-latency-ms", str(args.whisper_latency_ms), "--chat-latency-ms", str(args.chat_latency_ms),
+         "--search-latency-ms", str(args.search_latency_ms), "--error-rate", str(args.error_rate)],
+        stdout=subprocess.DEVNULL, stderr=open(os.path.join(workdir, "fake_services.log"), "w")
+    )
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(args.port),
+        "HOST": "127.0.0.1",
+        "TRANSCRIBER_BACKEND": "openai",
+        # the stand-ins accept any key; api.py ships empty ones, which the OpenAI client refuses
+        "OPENAI_API_KEY": "sk-bench",
+        "SERPAPI_KEY": "bench",
+        # the fake transcripts carry no checkable claims; check them all so FactChecker is exercised
+        "CLAIM_FILTER": "off",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "SERPAPI_URL": f"http://127.0.0.1:{args.fake_port}/search",
+        "PATH": workdir + os.pathsep + env.get("PATH", ""),
+    })
+    env.update(item.split("=", 1) for item in args.env)
+    log = open(os.path.join(workdir, "server.log"), "w")
+    server = subprocess.Popen([sys.executable, "app.py"], env=env, stdout=log, stderr=subprocess.STDOUT)
+    processes = [server, fake]
+    try:
+        wait_for_port(args.fake_port, fake)
+        wait_for_port(args.port, server)
+    except Exception:
+        stop(processes)
+        raise
+    return processes, server
+
+
+def stop(processes):
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent /ws sessions")
+    parser.add_argument("--seconds", type=float, default=20.0, help="audio streamed per session")
+    parser.add_argument("--pcm", help="WAV or raw s16le 16 kHz mono recording to stream (default: synthetic speech)")
+    parser.add_argument("--protocol", choices=["binary", "text"], default="binary")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions are started")
+    parser.add_argument("--drain", type=float, default=30.0, help="max seconds to wait for results after streaming")
+    parser.add_argument("--live-clients", type=int, default=0, help="concurrent /live clients (needs ffmpeg)")
+    parser.add_argument("--live-streams", type=int, default=1, help="distinct links the /live clients watch")
+    parser.add_argument("--whisper-latency-ms", type=float, default=300)
+    parser.add_argument("--chat-latency-ms", type=float, default=600)
+    parser.add_argument("--search-latency-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake remote calls answered with 503")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra server settings, e.g. WORKERS=2 or CLAIM_FILTER=off (repeatable)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--keep-logs", action="store_true", help="keep the server and fake service logs")
+    args = parser.parse_args()
+    args.audio_options = server_audio_options(args.env)
+
+    base_pcm = load_pcm(args.pcm, args.seconds) if args.pcm else synthetic_speech(args.seconds)
+    workdir = tempfile.mkdtemp(prefix="server_bench_")
+    processes, server = start_services(args, workdir, base_pcm)
+    try:
+        if args.sessions:
+            asyncio.run(run_ws(args, base_pcm, server.pid))
+        if args.live_clients:
+            if shutil.which("ffmpeg") is None:
+                print("/live: skipped, ffmpeg is not installed")
+            else:
+                asyncio.run(run_live(args, base_pcm, server.pid))
+        calls = get_json(f"http://127.0.0.1:{args.fake_port}/stats")
+        print(f"remote calls: {calls['requests']}" + (f", failed on purpose: {calls['errors']}" if calls["errors"] else ""))
+        print(f"server stage latency (one worker): {json.dumps(get_json(f'http://127.0.0.1:{args.port}/latency'))}")
+    finally:
+        stop(processes)
+        if args.keep_logs:
+            print(f"logs in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,52 @@
+"""
+Offline throughput benchmark for the batching transcription path.
+
+Simulates many concurrent sessions, each submitting 2-second PCM chunks to a
+StubTranscriber whose inference cost is a fixed per-call overhead plus a
+smaller per-chunk cost, and compares batch sizes.
+
+Run from the repository root:
+    python -m benchmarks.transcriber_bench
+"""
+import asyncio
+import os
+import time
+
+from transcriber import StubTranscriber
+
+CHUNK_BYTES = 16000 * 2 * 2
+
+
+async def session(transcriber, n_chunks, latencies):
+    for _ in range(n_chunks):
+        pcm = os.urandom(CHUNK_BYTES)
+        start = time.perf_counter()
+        await transcriber.transcribe(pcm)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(max_batch_size, sessions=32, n_chunks=5):
+    transcriber = StubTranscriber(
+        batch_latency_ms=40,
+        item_latency_ms=5,
+        max_batch_size=max_batch_size,
+        max_wait_ms=10
+    )
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(session(transcriber, n_chunks, latencies) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    await transcriber.close()
+    latencies.sort()
+    return {
+        "chunks_per_sec": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "mean_batch": transcriber.chunks / transcriber.batches,
+    }
+
+
+if __name__ == "__main__":
+    print(f"{'batch size':>10} {'chunks/s':>10} {'p50 (ms)':>10} {'mean batch':>11}")
+    for size in [1, 4, 8, 16, 32]:
+        result = asyncio.run(run(size))
+        print(f"{size:>10} {result['chunks_per_sec']:>10.1f} {result['p50_ms']:>10.1f} {result['mean_batch']:>11.1f}")
@@ -0,0 +1,128 @@
+"""
+Data preparation time for real-fake-training.ipynb: the notebook's path
+against truth_model.dataset.
+
+A synthetic CSV in the training data's format (text, labels) is prepared
+three ways:
+- notebook: its preprocess_text (a regex per contraction) through
+  DataFrame.apply on one core, then every fold tokenizes its train and
+  validation rows again
+- cold cache: truth_model.dataset.prepare with no cache yet (parallel
+  preprocessing, one tokenization, writing the cache)
+- warm cache: prepare again, plus the per-fold train/validation datasets
+  and one pass over their rows
+
+It also reports the share of padding tokens per training batch, with random
+batches and with length-grouped batches (group_by_length=True).
+
+Run from the repository root, with any saved tokenizer:
+    python -m benchmarks.truth_dataset_bench --tokenizer saved_tokenizer --rows 50000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.claim_filter_bench import SAMPLE
+from benchmarks.comment_inference_bench import make_comments
+from benchmarks.truth_model_bench import notebook_preprocess
+from truth_model import dataset
+
+# the kind of text the dataset holds: headlines, posts with mentions, links and contractions
+DECORATIONS = ["", " @user", " http://t.co/abc", " #breaking", " <b>update</b>", " it's", " don't", " 😀"]
+
+
+def make_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    claims = [text for text, _ in SAMPLE]
+    comments = make_comments(rows, seed)
+    texts = [
+        (rng.choice(claims) if rng.random() < 0.5 else comments[i]) + rng.choice(DECORATIONS) + rng.choice(DECORATIONS)
+        for i in range(rows)
+    ]
+    pd.DataFrame({"text": texts, "labels": [rng.random() < 0.5 for _ in range(rows)]}).to_csv(path, index=False)
+
+
+def folds(n, n_splits, seed=42):
+    """Index splits like StratifiedKFold(shuffle=True); stratification does not change the cost."""
+    order = np.random.default_rng(seed).permutation(n)
+    parts = np.array_split(order, n_splits)
+    return [(np.concatenate(parts[:k] + parts[k + 1:]), parts[k]) for k in range(n_splits)]
+
+
+def notebook_path(csv_path, tokenizer, max_len, n_splits):
+    data = dataset.load_frame(csv_path)
+    data["text"] = data["text"].apply(notebook_preprocess)
+    for train_idx, val_idx in folds(len(data), n_splits):
+        for part in (data.iloc[train_idx], data.iloc[val_idx]):
+            tokenizer(part["text"].tolist(), truncation=True, max_length=max_len)
+
+
+def cached_path(csv_path, tokenizer, max_len, n_splits, cache_dir, workers):
+    cache = dataset.prepare(csv_path, tokenizer.name_or_path, max_len, cache_dir=cache_dir, tokenizer=tokenizer,
+                            workers=workers)
+    for train_idx, val_idx in folds(len(cache), n_splits):
+        for part in (cache.dataset(train_idx), cache.dataset(val_idx)):
+            for i in range(len(part)):
+                part[i]
+    return cache
+
+
+def padding_share(lengths, batch_size, grouped):
+    if grouped:
+        from transformers.trainer_pt_utils import LengthGroupedSampler
+        order = np.fromiter(LengthGroupedSampler(batch_size, lengths=lengths.tolist()), dtype=np.int64)
+    else:
+        order = np.random.default_rng(0).permutation(len(lengths))
+    padded = real = 0
+    for start in range(0, len(order), batch_size):
+        batch = lengths[order[start:start + batch_size]]
+        padded += batch.max() * len(batch)
+        real += batch.sum()
+    return 1 - real / padded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokenizer", default="saved_tokenizer", help="tokenizer name or path")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--max-len", type=int, default=64)
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, help="preprocessing processes (default: all cores)")
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    workdir = tempfile.mkdtemp(prefix="truth_dataset_bench_")
+    try:
+        csv_path = os.path.join(workdir, "combined_data.csv")
+        make_csv(csv_path, args.rows)
+        cache_dir = os.path.join(workdir, "cache")
+        print(f"{args.rows} rows, {args.folds} folds, max_len {args.max_len}, {os.cpu_count()} core(s)")
+
+        timings = {}
+        for name, run in (
+                ("notebook", lambda: notebook_path(csv_path, tokenizer, args.max_len, args.folds)),
+                ("cold cache", lambda: cached_path(csv_path, tokenizer, args.max_len, args.folds, cache_dir,
+                                                   args.workers)),
+                ("warm cache", lambda: cached_path(csv_path, tokenizer, args.max_len, args.folds, cache_dir,
+                                                   args.workers))):
+            start = time.perf_counter()
+            result = run()
+            timings[name] = time.perf_counter() - start
+            print(f"  {name:<11} {timings[name]:7.2f}s")
+        print(f"  warm cache is {timings['notebook'] / timings['warm cache']:.0f}x faster than the notebook, "
+              f"cold cache {timings['notebook'] / timings['cold cache']:.1f}x")
+
+        lengths = np.asarray(result.lengths)
+        print(f"padding per batch of {args.batch_size}: random {padding_share(lengths, args.batch_size, False):.1%}, "
+              f"length-grouped {padding_share(lengths, args.batch_size, True):.1%}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
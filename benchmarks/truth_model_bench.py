@@ -0,0 +1,161 @@
+"""
+CPU latency and throughput of truth_model, and parity with the notebook's
+preprocessing.
+
+The speed run classifies a fixed, seeded mix of short transcript windows
+and longer comments. It reports:
+- p50/p95 latency of single-text predict()
+- batch throughput of the length-bucketed ensemble
+- batch throughput of the same folds run in input order, each batch padded
+  to its longest text (as the notebook's Trainer.predict does)
+- padding tokens in both cases, and the largest probability difference
+  between them
+
+--parity checks expand_contractions and preprocess_text against the
+notebook's one-regex-per-contraction loop. It uses every contraction alone
+and in pairs, plus a fuzzed corpus. Any difference is printed, and the
+script exits non-zero.
+
+Run from the repository root:
+    python -m benchmarks.truth_model_bench --parity
+    python -m benchmarks.truth_model_bench --model saved_model --tokenizer saved_tokenizer --texts 2000
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.claim_filter_bench import SAMPLE
+from benchmarks.comment_inference_bench import make_comments
+from truth_model import preprocess
+
+
+def notebook_preprocess(text):
+    """preprocess_text with the notebook's sequential expand_contractions."""
+    expand = preprocess.expand_contractions
+    preprocess.expand_contractions = preprocess._expand_sequentially
+    try:
+        return preprocess.preprocess_text(text)
+    finally:
+        preprocess.expand_contractions = expand
+
+
+def parity_corpus(n, seed=1):
+    contractions = list(preprocess.ENGLISH_CONTRACTIONS)
+    words = contractions + ["I", "b", "O", "trump's", "o'neil", "rock'n'roll", "'", "''", "cause", "ve", "Can't",
+                            "DON'T", "it’s", "café", "😀", "@user", "#tag", "http://a.b/c", "<b>", "x_y", "٣"]
+    texts = [a + sep + b for a in contractions for b in contractions for sep in ("", "'", " ", "-")]
+    rng = random.Random(seed)
+    for _ in range(n):
+        texts.append(rng.choice(["", " "]).join(rng.choice(words) for _ in range(rng.randint(1, 12))))
+    return texts
+
+
+def check_parity(n):
+    failures = 0
+    corpus = parity_corpus(n)
+    for text in corpus:
+        if preprocess.expand_contractions(text) != preprocess._expand_sequentially(text):
+            failures += 1
+            if failures <= 10:
+                print("expand_contractions differs:", repr(text))
+    # preprocess_text is slower (emoji), so a sample is enough
+    for text in corpus[::20]:
+        if preprocess.preprocess_text(text) != notebook_preprocess(text):
+            failures += 1
+            if failures <= 10:
+                print("preprocess_text differs:", repr(text))
+
+    print(f"{len(corpus)} texts checked, {failures} differences")
+    samples = {"transcript windows": [text for text, _ in SAMPLE] * 20, "contraction-heavy": corpus[-2000:]}
+    for sample, texts in samples.items():
+        timings = {}
+        for name, expand in (("loop", preprocess._expand_sequentially), ("trie", preprocess.expand_contractions)):
+            start = time.perf_counter()
+            for text in texts:
+                expand(text)
+            timings[name] = (time.perf_counter() - start) / len(texts) * 1e6
+        print(f"expand_contractions on {sample}: loop {timings['loop']:.1f} us/text, "
+              f"trie {timings['trie']:.1f} us/text ({timings['loop'] / timings['trie']:.0f}x)")
+    return failures
+
+
+def make_texts(n, seed=0):
+    """Two thirds short transcript windows, one third comments of 3-60 words."""
+    rng = random.Random(seed)
+    windows = [text for text, _ in SAMPLE]
+    comments = make_comments(n, seed)
+    return [rng.choice(windows) if rng.random() < 2 / 3 else comments[i] for i in range(n)]
+
+
+def input_order_proba(model, texts):
+    """The ensemble without bucketing: batches in input order, each padded to its longest text."""
+    probs, padding = [], 0
+    for start in range(0, len(texts), model.batch_size):
+        batch = [preprocess.preprocess_text(text) for text in texts[start:start + model.batch_size]]
+        inputs = model.tokenizer(batch, truncation=True, max_length=model.max_len, padding=True, return_tensors="pt")
+        padding += int((inputs["attention_mask"] == 0).sum())
+        with torch.inference_mode():
+            fold_probs = [torch.softmax(fold(**inputs).logits, dim=-1) for fold in model.folds]
+        probs.append(torch.stack(fold_probs).mean(dim=0).numpy())
+    return np.concatenate(probs), padding
+
+
+def bucketed_padding(model, texts):
+    encoded = model.tokenizer([preprocess.preprocess_text(text) for text in texts], truncation=True,
+                              max_length=model.max_len)
+    lengths = np.array([len(ids) for ids in encoded["input_ids"]])
+    return sum(int(lengths[batch].max() * len(batch) - lengths[batch].sum()) for batch in model.buckets(lengths))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parity", action="store_true", help="check preprocessing parity instead of timing the model")
+    parser.add_argument("--fuzz", type=int, default=20000, help="fuzzed texts for the parity check")
+    parser.add_argument("--model", default="saved_model", help="model directory (fold_* checkpoints or one checkpoint)")
+    parser.add_argument("--tokenizer", help="tokenizer directory, if saved separately from the model")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--latency-sample", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--backend", default="fp32", help="one of cpu_inference.BACKENDS")
+    args = parser.parse_args()
+
+    if args.parity:
+        sys.exit(1 if check_parity(args.fuzz) else 0)
+
+    import torch
+    from truth_model.model import TruthModel
+
+    start = time.perf_counter()
+    model = TruthModel(args.model, args.tokenizer, batch_size=args.batch_size, backend=args.backend)
+    print(f"{len(model.folds)} fold(s) loaded in {time.perf_counter() - start:.1f}s, labels {model.id2label}, "
+          f"torch threads {torch.get_num_threads()}")
+
+    texts = make_texts(args.texts)
+    model.predict(texts[:args.batch_size])  # warm-up
+    # a claim filter can score an empty batch
+    assert model.predict_proba([]).shape == (0, len(model.id2label)), "empty input"
+
+    latencies = []
+    for text in texts[:args.latency_sample]:
+        start = time.perf_counter()
+        model.predict([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"single text: p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms")
+
+    start = time.perf_counter()
+    bucketed = model.predict_proba(texts)
+    bucketed_rate = len(texts) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    in_order, in_order_padding = input_order_proba(model, texts)
+    in_order_rate = len(texts) / (time.perf_counter() - start)
+
+    print(f"{len(texts)} texts, batch size {args.batch_size}:")
+    print(f"  bucketed     {bucketed_rate:8.1f} texts/s, {bucketed_padding(model, texts):8d} padding tokens")
+    print(f"  input order  {in_order_rate:8.1f} texts/s, {in_order_padding:8d} padding tokens")
+    print(f"  speedup {bucketed_rate / in_order_rate:.2f}x, max probability difference "
+          f"{np.abs(bucketed - in_order).max():.2e}, label agreement "
+          f"{(bucketed.argmax(axis=1) == in_order.argmax(axis=1)).mean() * 100:.2f}%")
@@ -0,0 +1,113 @@
+"""
+Load generator for the /ws audio protocols.
+
+Opens N concurrent sessions against a running server, streams PCM in
+browser-sized frames (1024 samples) at real-time pace, and compares the
+base64 text protocol with binary frames. If the server's pid is given, its
+CPU time is read from /proc and turned into sessions-per-core: how many
+real-time sessions one core can sustain.
+
+Start the server first (e.g. TRANSCRIBER_BACKEND=stub uvicorn app:app), then:
+    python -m benchmarks.ws_load --sessions 50 --seconds 20 --server-pid <pid>
+"""
+import argparse
+import asyncio
+import base64
+import os
+import time
+import wave
+
+import websockets
+
+from audio_protocol import BINARY_PROTOCOL, TEXT_PROTOCOL, encode_frame
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 1024
+
+
+def load_pcm(path, seconds):
+    """16 kHz mono 16-bit PCM from a WAV or raw file, or noise if no file is given."""
+    n_bytes = int(seconds * SAMPLE_RATE) * 2
+    if path is None:
+        return os.urandom(n_bytes)
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as wav_file:
+            pcm = wav_file.readframes(wav_file.getnframes())
+    else:
+        with open(path, "rb") as f:
+            pcm = f.read()
+    # loop the recording to the requested length
+    return (pcm * (n_bytes // len(pcm) + 1))[:n_bytes]
+
+
+def process_cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime, in clock ticks
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def session(url, protocol, pcm, realtime, stats):
+    frame_bytes = FRAME_SAMPLES * 2
+    interval = FRAME_SAMPLES / SAMPLE_RATE
+    async with websockets.connect(url, subprotocols=[protocol], max_size=None) as ws:
+        if ws.subprotocol != protocol:
+            raise RuntimeError(f"server did not accept {protocol}")
+
+        async def drain():
+            async for _ in ws:
+                stats["messages"] += 1
+
+        reader = asyncio.ensure_future(drain())
+        start = time.perf_counter()
+        for seq, offset in enumerate(range(0, len(pcm), frame_bytes)):
+            frame = pcm[offset:offset + frame_bytes]
+            if protocol == BINARY_PROTOCOL:
+                message = encode_frame(seq, frame, SAMPLE_RATE)
+            else:
+                message = base64.b64encode(frame).decode()
+            await ws.send(message)
+            stats["bytes"] += len(message)
+            if realtime:
+                delay = start + (seq + 1) * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        reader.cancel()
+
+
+async def run(args, protocol, pcm):
+    stats = {"bytes": 0, "messages": 0}
+    cpu_before = process_cpu_seconds(args.server_pid) if args.server_pid else None
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        session(args.url, protocol, pcm, not args.no_realtime, stats) for _ in range(args.sessions)
+    ))
+    stats["wall"] = time.perf_counter() - start
+    if cpu_before is not None:
+        stats["server_cpu"] = process_cpu_seconds(args.server_pid) - cpu_before
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio streamed per session")
+    parser.add_argument("--pcm", help="WAV or raw s16le 16 kHz mono file to stream (default: noise)")
+    parser.add_argument("--protocol", choices=["binary", "text", "both"], default="both")
+    parser.add_argument("--server-pid", type=int, help="server process to measure CPU time of")
+    parser.add_argument("--no-realtime", action="store_true", help="send as fast as possible")
+    args = parser.parse_args()
+
+    pcm = load_pcm(args.pcm, args.seconds)
+    protocols = {"binary": [BINARY_PROTOCOL], "text": [TEXT_PROTOCOL]}.get(args.protocol, [TEXT_PROTOCOL, BINARY_PROTOCOL])
+    audio_seconds = args.sessions * len(pcm) / (2 * SAMPLE_RATE)
+
+    for protocol in protocols:
+        stats = asyncio.run(run(args, protocol, pcm))
+        line = (f"{protocol:>14}: {args.sessions} sessions, {stats['bytes'] / 1e6:.1f} MB sent, "
+                f"{stats['messages']} messages back, wall {stats['wall']:.1f}s")
+        if "server_cpu" in stats:
+            per_core = audio_seconds / stats["server_cpu"] if stats["server_cpu"] else float("inf")
+            line += f", server CPU {stats['server_cpu']:.2f}s, {per_core:.0f} sessions/core"
+        print(line)
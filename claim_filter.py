@@ -0,0 +1,150 @@
+"""
+Claim-worthiness scoring, so that text with nothing checkable in it (greetings,
+filler, calls to subscribe) never reaches SerpAPI and GPT.
+
+Two scorers share one interface, `score_batch(texts)`, which returns a
+probability-like score in [0, 1] per text:
+
+- HeuristicClaimScorer: a few cheap lexical features (numbers, named
+  entities, factual cue words and filler words). It needs no model.
+- TextClassifierClaimScorer: a sequence classifier saved by
+  real-fake-training.ipynb (or any claim/no-claim classifier). The score is
+  the probability of `positive_label`.
+
+ClaimFilter puts a threshold on a scorer; FactChecker and AsyncFactChecker
+consult it before any remote call.
+"""
+import math
+import re
+import threading
+
+# (sentiment, claim_verification) of text without a checkable claim, from the values the prompts allow
+NO_CLAIM_VERDICT = ("Neutral", "Neutral")
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z'’]*|\d[\d,.]*%?")
+_NUMBER = re.compile(r"\d")
+
+CLAIM_CUES = frozenset("""
+    percent percentage million billion trillion thousand hundred according study studies research
+    researchers scientists data report reported survey statistics evidence proof proves proven
+    government president minister law laws court election vote votes economy inflation tax taxes
+    cause causes caused cure cures vaccine vaccines deaths died killed increase increased decrease
+    decreased doubled tripled more less than most least largest biggest smallest highest lowest
+    first last only always never every all none record fact facts true false actually officially
+    announced confirmed banned illegal legal discovered invented founded population
+""".split())
+
+FILLER = frozenset("""
+    hi hello hey guys welcome back subscribe like likes share channel bell notification comment
+    comments thanks thank um uh umm uhh hmm okay ok yeah yes no lol haha wow bye see you next
+    video videos today gonna wanna let lets me my i so well oh please
+""".split())
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+class HeuristicClaimScorer:
+    """
+    Scores text by the signals a checkable claim tends to carry:
+    - numbers
+    - capitalised names after the first word
+    - factual cue words
+    Filler words count against it, and so do very short texts.
+
+    The weights are set by hand on the built-in sample of
+    benchmarks/claim_filter_bench.py, so its figures on that sample are
+    in-sample. Check them on held-out labeled text (--csv) before turning
+    the filter on.
+    """
+
+    def __init__(self, bias=-1.5, number_weight=1.5, entity_weight=0.6, cue_weight=0.9, filler_weight=1.2,
+                 min_words=4):
+        self.bias = bias
+        self.number_weight = number_weight
+        self.entity_weight = entity_weight
+        self.cue_weight = cue_weight
+        self.filler_weight = filler_weight
+        self.min_words = min_words
+
+    def score(self, text):
+        words = _WORD.findall(text)
+        if len(words) < self.min_words:
+            return 0.0
+        lower = [word.lower().strip("'’") for word in words]
+        numbers = sum(1 for word in words if _NUMBER.match(word))
+        # capitalised words that do not start a sentence; "I" is not a name
+        entities = sum(
+            1 for i, word in enumerate(words)
+            if i > 0 and word[0].isupper() and word != "I" and not words[i - 1].endswith(('.', '!', '?'))
+        )
+        cues = sum(1 for word in lower if word in CLAIM_CUES)
+        filler = sum(1 for word in lower if word in FILLER) / len(words)
+        x = (self.bias
+             + self.number_weight * min(numbers, 2)
+             + self.entity_weight * min(entities, 3)
+             + self.cue_weight * min(cues, 3)
+             - self.filler_weight * filler * 4)
+        return _sigmoid(x)
+
+    def score_batch(self, texts):
+        return [self.score(text) for text in texts]
+
+
+class TextClassifierClaimScorer:
+    """
+    Scores text with a saved sequence classifier (or a directory of k-fold
+    checkpoints) through truth_model on CPU. The score is the probability of
+    `positive_label`: a 'claim' label for a claim/no-claim model, or 'Fake'
+    to use the notebook's real/fake model as a prior, so text it is
+    confident is real is not checked.
+    """
+
+    def __init__(self, model_path, tokenizer_path=None, positive_label="Fake", max_len=64, batch_size=32):
+        import truth_model
+
+        self.model = truth_model.load(model_path, tokenizer_path, max_len=max_len, batch_size=batch_size)
+        self.positive_index = self.model.label2id[positive_label]
+
+    def score_batch(self, texts):
+        return self.model.predict_proba(texts)[:, self.positive_index].tolist()
+
+    def score(self, text):
+        return self.score_batch([text])[0]
+
+
+class ClaimFilter:
+    """Decides which texts are worth a fact check: those scoring at least `threshold`."""
+
+    def __init__(self, scorer, threshold=0.3):
+        self.scorer = scorer
+        self.threshold = threshold
+        self.checked = 0
+        self.skipped = 0
+        # fact checkers call in from executor threads
+        self._lock = threading.Lock()
+
+    def worth_checking_batch(self, texts):
+        keep = [score >= self.threshold for score in self.scorer.score_batch(texts)]
+        kept = sum(keep)
+        with self._lock:
+            self.checked += kept
+            self.skipped += len(keep) - kept
+        return keep
+
+    def worth_checking(self, text):
+        return self.worth_checking_batch([text])[0]
+
+
+def create_claim_filter(spec, threshold=0.3):
+    """
+    Build a filter from a CLAIM_FILTER value: 'off', 'heuristic' or the path
+    to a saved classifier. Off is the default, as neither scorer is validated
+    on held-out data.
+    """
+    if not spec or spec == "off":
+        return None
+    if spec == "heuristic":
+        return ClaimFilter(HeuristicClaimScorer(), threshold)
+    return ClaimFilter(TextClassifierClaimScorer(spec), threshold)
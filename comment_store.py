@@ -0,0 +1,173 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+# stored besides the classifier outputs, as the analysis DataFrame has them
+COMMENT_FIELDS = ("text", "votes", "reply_count", "heart", "word_count")
+# what the downloader reports afresh on every visit
+LIVE_FIELDS = ("votes", "reply_count", "heart")
+
+
+def video_id(url):
+    """The video ID of a watch or youtu.be URL; anything else is used as given."""
+    parts = urlsplit(url)
+    if parts.netloc.endswith("youtu.be"):
+        return parts.path.lstrip("/")
+    ids = parse_qs(parts.query).get("v")
+    return ids[0] if ids else url
+
+
+def text_hashes(texts):
+    """A 64-bit hash of each comment text as downloaded, the comment's key in the store."""
+    return np.array([
+        int.from_bytes(hashlib.blake2b(str(text).encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+        for text in texts
+    ], dtype=np.int64)
+
+
+class CommentStore:
+    """
+    Classified comments per video in a SQLite file, keyed by (video ID,
+    text hash), so a repeat analysis only classifies comments it has not
+    seen.
+
+    Each row holds the cleaned text, the downloader's fields and the four
+    classifier outputs (`output_columns`, label and probability column
+    pairs). The hashes of comments the word-count filter dropped are kept
+    too, so they are not cleaned again on the next visit. Videos not
+    analysed for `max_age` seconds are evicted, and so
+    are the least recently analysed videos while the store holds more than
+    `max_comments` comments. Safe to share across threads.
+    """
+
+    def __init__(self, db_path="comment_store.sqlite", output_columns=None, max_age=7 * 24 * 3600,
+                 max_comments=1000000):
+        if output_columns is None:
+            from youtube_analyse import OUTPUT_COLUMNS
+            output_columns = OUTPUT_COLUMNS
+        self.label_columns = [label for label, _ in output_columns.values()]
+        self.columns = list(COMMENT_FIELDS) + [column for pair in output_columns.values() for column in pair]
+        self.max_age = max_age
+        self.max_comments = max_comments
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        # votes, reply_count and heart are declared without a type, so values keep the type the downloader gave
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS comments (video_id TEXT, text_hash INTEGER, text TEXT, votes, reply_count, "
+            "heart, word_count INTEGER, "
+            + ", ".join(f"{column} {'TEXT' if column in self.label_columns else 'REAL'}"
+                        for column in self.columns[len(COMMENT_FIELDS):])
+            + ", PRIMARY KEY (video_id, text_hash)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS filtered (video_id TEXT, text_hash INTEGER, PRIMARY KEY (video_id, text_hash)) "
+            "WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS videos (video_id TEXT PRIMARY KEY, analyzed_at REAL, comments INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS videos_analyzed ON videos (analyzed_at)")
+        self._db.commit()
+
+    def analyzed_at(self, video):
+        """When `video` was last analysed (time.time()), or None."""
+        with self._lock:
+            row = self._db.execute("SELECT analyzed_at FROM videos WHERE video_id = ?", (video,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, video):
+        """The stored comments of `video`, with a text_hash column; labels are categorical."""
+        with self._lock:
+            df = pd.read_sql_query(
+                f"SELECT text_hash, {', '.join(self.columns)} FROM comments WHERE video_id = ?",
+                self._db, params=(video,)
+            )
+        for column in self.label_columns:
+            df[column] = df[column].astype("category")
+        return df
+
+    def filtered_hashes(self, video):
+        """The text hashes of `video`'s comments that were filtered out before classification."""
+        with self._lock:
+            rows = self._db.execute("SELECT text_hash FROM filtered WHERE video_id = ?", (video,)).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def save(self, video, new, seen=None, filtered=None):
+        """
+        Add the classified comments in `new` (with a text_hash column), update
+        the LIVE_FIELDS of the stored comments in `seen`, and remember the
+        `filtered` text hashes as dropped before classification.
+        """
+        now = time.time()
+        rows = new[["text_hash"] + self.columns].itertuples(index=False, name=None)
+        with self._lock:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO comments (video_id, text_hash, {', '.join(self.columns)}) "
+                f"VALUES (?, {', '.join('?' * (len(self.columns) + 1))})",
+                ((video, int(row[0])) + tuple(_plain(value) for value in row[1:]) for row in rows)
+            )
+            if seen is not None and len(seen):
+                self._db.executemany(
+                    f"UPDATE comments SET {', '.join(f'{field} = ?' for field in LIVE_FIELDS)} "
+                    "WHERE video_id = ? AND text_hash = ?",
+                    (tuple(_plain(value) for value in row[1:]) + (video, int(row[0]))
+                     for row in seen[["text_hash", *LIVE_FIELDS]].itertuples(index=False, name=None))
+                )
+            if filtered is not None and len(filtered):
+                self._db.executemany("INSERT OR IGNORE INTO filtered (video_id, text_hash) VALUES (?, ?)",
+                                     ((video, int(text_hash)) for text_hash in filtered))
+            count = self._db.execute("SELECT COUNT(*) FROM comments WHERE video_id = ?", (video,)).fetchone()[0]
+            self._db.execute("INSERT OR REPLACE INTO videos (video_id, analyzed_at, comments) VALUES (?, ?, ?)",
+                             (video, now, count))
+            self._evict(now, keep=video)
+            self._db.commit()
+
+    def _evict(self, now, keep):
+        stale = [row[0] for row in self._db.execute(
+            "SELECT video_id FROM videos WHERE analyzed_at < ? AND video_id != ?", (now - self.max_age, keep)
+        )]
+        total = self._db.execute("SELECT COALESCE(SUM(comments), 0) FROM videos").fetchone()[0]
+        total -= sum(self._db.execute("SELECT comments FROM videos WHERE video_id = ?", (video,)).fetchone()[0]
+                     for video in stale)
+        if total > self.max_comments:
+            for video, comments in self._db.execute(
+                    "SELECT video_id, comments FROM videos WHERE video_id != ? ORDER BY analyzed_at", (keep,)):
+                if total <= self.max_comments:
+                    break
+                if video not in stale:
+                    stale.append(video)
+                    total -= comments
+        for video in stale:
+            self._db.execute("DELETE FROM comments WHERE video_id = ?", (video,))
+            self._db.execute("DELETE FROM filtered WHERE video_id = ?", (video,))
+            self._db.execute("DELETE FROM videos WHERE video_id = ?", (video,))
+        self.evictions += len(stale)
+
+    def delete(self, video):
+        with self._lock:
+            self._db.execute("DELETE FROM comments WHERE video_id = ?", (video,))
+            self._db.execute("DELETE FROM filtered WHERE video_id = ?", (video,))
+            self._db.execute("DELETE FROM videos WHERE video_id = ?", (video,))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            videos, comments = self._db.execute("SELECT COUNT(*), COALESCE(SUM(comments), 0) FROM videos").fetchone()
+        return {"videos": videos, "comments": comments, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _plain(value):
+    """numpy scalars as the Python values sqlite3 accepts."""
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,156 @@
+"""
+Optimized CPU backends for the text-classification pipelines.
+
+    fp32       the Hugging Face model as loaded (default)
+    int8       PyTorch dynamic int8 quantization of the Linear layers
+    onnx       the model exported to ONNX and run with onnxruntime
+    onnx-int8  the ONNX graph with int8 dynamic quantization
+
+A backend replaces `classifier.model` in place, so the pipeline and
+BatchInferenceEngine keep working unchanged. The ONNX backends need the
+optional `onnx` and `onnxruntime` packages; exported graphs are cached under
+`cache_dir`, keyed by a hash of the model's config and weights, and reused on
+the next start.
+
+torch is imported on first use, so parse_backends costs nothing at startup.
+"""
+import hashlib
+import inspect
+import os
+import re
+
+BACKENDS = ("fp32", "int8", "onnx", "onnx-int8")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "zero_trust", "onnx")
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization: weights stored as int8, activations quantized on the fly."""
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    return quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_onnx(model, tokenizer, path):
+    """Export a sequence-classification model to ONNX with dynamic batch and sequence axes."""
+    import torch
+
+    sample = tokenizer(["an example comment", "a second, somewhat longer example comment"],
+                       padding=True, return_tensors="pt")
+    # the exporter names graph inputs in the order of forward()'s parameters
+    input_names = [name for name in inspect.signature(model.forward).parameters if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    model = model.eval()
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (),
+            path,
+            kwargs={name: sample[name] for name in input_names},
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False
+        )
+
+
+class OnnxSequenceClassifier:
+    """
+    Stands in for a transformers sequence-classification model: same
+    `config`, `device` and `forward(...).logits`, run by onnxruntime.
+    """
+
+    def __init__(self, path, config, threads=None):
+        import onnxruntime
+        import torch
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.nbytes = os.path.getsize(path)
+        self.input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+        self.config = config
+        self.device = torch.device("cpu")
+        self.dtype = torch.float32
+
+    def forward(self, input_ids, attention_mask=None, token_type_ids=None):
+        import torch
+        from transformers.modeling_outputs import SequenceClassifierOutput
+
+        given = {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": token_type_ids}
+        feed = {name: given[name].cpu().numpy() for name in self.input_names if given.get(name) is not None}
+        logits, = self.session.run(["logits"], feed)
+        return SequenceClassifierOutput(logits=torch.from_numpy(logits))
+
+    __call__ = forward
+
+    def eval(self):
+        return self
+
+    def to(self, *args, **kwargs):
+        return self
+
+
+def model_digest(model):
+    """A short hash of a model's config and weights, so a changed checkpoint is never served a stale graph."""
+    import torch
+
+    digest = hashlib.blake2b(model.config.to_json_string().encode("utf-8"), digest_size=8)
+    with torch.no_grad():
+        for name, tensor in model.state_dict().items():
+            digest.update(name.encode("utf-8"))
+            digest.update(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy())
+    return digest.hexdigest()
+
+
+def onnx_path(model_id, backend, cache_dir, digest):
+    name = re.sub(r'[^\w.-]', '_', model_id.strip("/"))
+    return os.path.join(cache_dir, f"{name}.{digest}.{backend}.onnx")
+
+
+def apply_backend(classifier, backend, model_id, cache_dir=None):
+    """Switch `classifier` (a text-classification pipeline) to `backend` and return it."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown CPU backend: {backend}")
+    if backend == "fp32":
+        return classifier
+    if backend == "int8":
+        classifier.model = quantize_int8(classifier.model)
+        return classifier
+
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = model_digest(classifier.model)
+    path = onnx_path(model_id, "onnx", cache_dir, digest)
+    if not os.path.exists(path):
+        # written under a temporary name so other workers never load half a file
+        partial = f"{path}.{os.getpid()}.partial"
+        export_onnx(classifier.model, classifier.tokenizer, partial)
+        os.replace(partial, path)
+    if backend == "onnx-int8":
+        quantized_path = onnx_path(model_id, backend, cache_dir, digest)
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            partial = f"{quantized_path}.{os.getpid()}.partial"
+            quantize_dynamic(path, partial, weight_type=QuantType.QInt8)
+            os.replace(partial, quantized_path)
+        path = quantized_path
+    classifier.model = OnnxSequenceClassifier(path, classifier.model.config)
+    return classifier
+
+
+def parse_backends(spec):
+    """Parse a MODEL_BACKENDS value like 'sentiment=int8,emotion=onnx' into a dict."""
+    backends = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, backend = item.partition("=")
+        backend = backend.strip()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown CPU backend for {name.strip()}: {backend}")
+        backends[name.strip()] = backend
+    return backends
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def count_lookup(namespace, result):
+    REGISTRY.counter("zero_trust_cache_lookups_total", "FactCache lookups by the tier that answered them",
+                     namespace=namespace, result=result).inc()
+
+
+def normalize_query(text):
+    """Lowercase, drop punctuation and collapse whitespace so near-identical claims share a key."""
+    text = _PUNCTUATION.sub('', text.lower())
+    return ' '.join(text.split())
+
+
+class FactCache:
+    """
+    Two-tier TTL cache for fact-check work, keyed by normalized query text.
+
+    The first tier is an in-memory LRU of at most `max_entries` items. If
+    `db_path` is given, entries are also written to a SQLite file that
+    survives restarts. Every `prune_every` writes, expired rows are deleted
+    and the least recently used rows over `max_disk_entries` are evicted, so
+    the file can run up to `prune_every` rows over between prunes. If `store` is given (see state_store), entries are
+    also shared through it with the other worker processes. Values must be
+    JSON serializable. Safe to share across executor threads; store round
+    trips are made outside the lock, so one slow call does not hold up the
+    other threads' memory hits. The calls block, so call them from an
+    executor when running inside an event loop.
+    """
+
+    def __init__(self, max_entries=4096, ttl=24 * 3600, db_path=None, max_disk_entries=100000, store=None,
+                 prune_every=256):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.prune_every = prune_every
+        self._disk_writes = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS fact_cache ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS fact_cache_accessed ON fact_cache (accessed_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS fact_cache_expires ON fact_cache (expires_at)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(namespace, query):
+        normalized = normalize_query(query)
+        return hashlib.sha256(f"{namespace}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, namespace, query):
+        """Return the cached value or None."""
+        key = self.make_key(namespace, query)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    count_lookup(namespace, "memory")
+                    return value
+                del self._memory[key]
+
+        if self.store is not None:
+            entry = self.store.get(f"fact:{key}")
+            if entry is not None and entry[0] > now:
+                with self._lock:
+                    self._remember(key, entry[0], entry[1])
+                    self.hits += 1
+                    self.shared_hits += 1
+                count_lookup(namespace, "shared")
+                return entry[1]
+
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM fact_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._db.execute("UPDATE fact_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    count_lookup(namespace, "disk")
+                    return value
+
+            self.misses += 1
+            count_lookup(namespace, "miss")
+            return None
+
+    def set(self, namespace, query, value, ttl=None):
+        key = self.make_key(namespace, query)
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self.store is not None:
+            self.store.set(f"fact:{key}", [expires_at, value], ttl=expires_at - now)
+        with self._lock:
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO fact_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, now)
+                )
+                self._disk_writes += 1
+                if self._disk_writes % self.prune_every == 0:
+                    self._prune(now)
+                self._db.commit()
+
+    def _prune(self, now):
+        # both deletes walk an index, and only as far as the rows they remove
+        self._db.execute("DELETE FROM fact_cache WHERE expires_at <= ?", (now,))
+        excess = self._db.execute("SELECT COUNT(*) FROM fact_cache").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM fact_cache WHERE key IN (SELECT key FROM fact_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM fact_cache")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,240 @@
+"""
+Whole-video fact-check jobs.
+
+A transcript is split into segments by YouTubeTranscriptProcessor. The
+segments are fact-checked by a pool of worker threads sharing one
+FactChecker. Completed segments are appended to a checkpoint file per
+video, so an interrupted job picks up where it stopped. Results come back
+in timestamp order while later segments are still being checked.
+
+    python fact_check_jobs.py VIDEO_ID [VIDEO_ID ...] --workers 8 --max-rps 5
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import RateLimitError
+
+from SearchVerification import SearchRateLimited
+from Trans import YouTubeTranscriptProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Shared request pacing for all workers: at most `max_rps` requests per
+    second (unlimited if None), and a pause for everyone after a rate-limit
+    response.
+    """
+
+    def __init__(self, max_rps=None):
+        self.interval = 1.0 / max_rps if max_rps else 0.0
+        self._next = time.monotonic()
+        self._resume = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next, self._resume)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._resume = max(self._resume, time.monotonic() + seconds)
+
+
+class Checkpoint:
+    """
+    Completed segments of one job, one JSON object per line. The first line
+    records the segmentation settings; a file written with other settings is
+    set aside instead of reused.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self):
+        """Records already completed, by segment index."""
+        done = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                lines = f.read().splitlines()
+            header = json.loads(lines[0]) if lines else None
+            if header != self.settings:
+                os.replace(self.path, self.path + ".stale")
+            else:
+                for line in lines[1:]:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a line cut short by the interruption
+                        continue
+                    done[record["index"]] = record
+        new_file = not os.path.exists(self.path)
+        self._file = open(self.path, "a")
+        if new_file:
+            self._write(self.settings)
+        return done
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def add(self, record):
+        with self._lock:
+            self._write(record)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FactCheckJobRunner:
+    """
+    Fact-checks every segment of a video's transcript with `workers`
+    concurrent FactChecker calls.
+
+    Requests are paced by a shared RateLimiter. A call rate-limited by OpenAI
+    or SerpAPI pauses all workers for `rate_limit_pause` seconds (or SerpAPI's
+    Retry-After) and is retried. Other
+    failures are retried with jittered backoff up to `max_attempts` times;
+    a segment that still fails is reported with an "Error" verdict and is
+    not checkpointed, so the next run tries it again. A segment the search
+    finds nothing for gets the "No data" verdict (NO_DATA_VERDICT), which is
+    a result and is checkpointed like any other.
+    """
+
+    def __init__(self, fact_checker, checkpoint_dir="fact_check_jobs", workers=8, max_rps=None,
+                 max_attempts=5, backoff=1.0, rate_limit_pause=10.0, text_size=20, overlap=0,
+                 sentence_boundaries=True):
+        self.fact_checker = fact_checker
+        self.checkpoint_dir = checkpoint_dir
+        self.workers = workers
+        self.limiter = RateLimiter(max_rps)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.rate_limit_pause = rate_limit_pause
+        self.text_size = text_size
+        self.overlap = overlap
+        self.sentence_boundaries = sentence_boundaries
+
+    def _check(self, index, segment, checkpoint):
+        record = {"index": index, "start": segment.start, "duration": segment.duration, "text": segment.text}
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire()
+            try:
+                record["sentiment"], record["claim_verification"] = self.fact_checker.fact_check(segment.text)
+                break
+            except RateLimitError:
+                self.limiter.pause(self.rate_limit_pause)
+            except SearchRateLimited as e:
+                self.limiter.pause(e.retry_after or self.rate_limit_pause)
+            except Exception as e:
+                logger.warning("segment %d failed (attempt %d): %s", index, attempt + 1, e)
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        else:
+            record["sentiment"], record["claim_verification"] = "Fact check failed", "Error"
+            return record
+        if record["claim_verification"] != "Error":
+            checkpoint.add(record)
+        return record
+
+    def run(self, video):
+        """Yield one result dict per transcript segment of `video` (an ID or URL), in timestamp order."""
+        url = video if video.startswith("http") else f"https://www.youtube.com/watch?v={video}"
+        processor = YouTubeTranscriptProcessor(url, text_size=self.text_size)
+        processor.fetch_transcript()
+
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        checkpoint = Checkpoint(
+            os.path.join(self.checkpoint_dir, f"{processor.video_id}.jsonl"),
+            {"video_id": processor.video_id, "text_size": self.text_size, "overlap": self.overlap,
+             "sentence_boundaries": self.sentence_boundaries}
+        )
+        done = checkpoint.load()
+        if done:
+            logger.info("resuming %s: %d segments already checked", processor.video_id, len(done))
+
+        # futures (or finished records) in segment order; bounded so a long
+        # transcript is never fully queued up ahead of the results
+        pending = deque()
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            segments = processor.iter_segments(overlap=self.overlap, sentence_boundaries=self.sentence_boundaries)
+            for index, segment in enumerate(segments):
+                if index in done:
+                    pending.append(done.pop(index))
+                else:
+                    pending.append(pool.submit(self._check, index, segment, checkpoint))
+                while len(pending) > self.workers * 4 or (pending and isinstance(pending[0], dict)):
+                    yield self._result(pending.popleft())
+            while pending:
+                yield self._result(pending.popleft())
+        finally:
+            # an interrupted job waits for the segments being checked, not for the queued ones
+            pool.shutdown(cancel_futures=True)
+            checkpoint.close()
+
+    @staticmethod
+    def _result(item):
+        return item if isinstance(item, dict) else item.result()
+
+
+if __name__ == "__main__":
+    from api import serpapi, api
+    from fact_cache import FactCache
+    from SearchVerification import FactChecker
+    from claim_filter import create_claim_filter
+    from structured_logging import configure_logging
+
+    parser = argparse.ArgumentParser(description="Fact-check whole YouTube videos from their transcripts.")
+    parser.add_argument("videos", nargs="+", help="video IDs or watch URLs")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-rps", type=float, help="cap on fact-check requests per second")
+    parser.add_argument("--text-size", type=int, default=20, help="words per segment")
+    parser.add_argument("--checkpoint-dir", default="fact_check_jobs")
+    parser.add_argument("--cache-db", help="SQLite file for the fact-check cache")
+    parser.add_argument("--claim-filter", default="off",
+                        help='"off", "heuristic" or a saved classifier path (see claim_filter)')
+    parser.add_argument("--claim-threshold", type=float, default=0.3)
+    parser.add_argument("--output", help="also write results as JSON lines to this file")
+    args = parser.parse_args()
+    configure_logging(format="text")
+
+    runner = FactCheckJobRunner(
+        FactChecker(serpapi, api, cache=FactCache(db_path=args.cache_db),
+                    claim_filter=create_claim_filter(args.claim_filter, args.claim_threshold)),
+        checkpoint_dir=args.checkpoint_dir,
+        workers=args.workers,
+        max_rps=args.max_rps,
+        text_size=args.text_size
+    )
+    output = open(args.output, "a") if args.output else None
+    try:
+        for video in args.videos:
+            count = 0
+            for result in runner.run(video):
+                count += 1
+                print(f"[{result['start']:.1f}s] {result['text']}")
+                print("Sentiment:", result["sentiment"])
+                print("Claim Verification:", result["claim_verification"], "\n")
+                if output is not None:
+                    output.write(json.dumps({"video": video, **result}) + "\n")
+            print(f"{video}: {count} segments")
+    finally:
+        if output is not None:
+            output.close()
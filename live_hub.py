@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import os
+import time
+
+from audio_processor import AudioProcessor
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DROPPED_MESSAGES = REGISTRY.counter("zero_trust_live_dropped_messages_total",
+                                    "Messages dropped because a /live client fell behind")
+
+
+def _log_io_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("background call failed: %s", future.exception())
+
+
+class Subscriber:
+    """
+    A bounded message queue for one client of a live stream.
+
+    When the client falls behind and the queue is full, the oldest message
+    is dropped to make room, so a slow client never stalls the stream.
+    """
+
+    def __init__(self, stream, max_queue=64):
+        self.stream = stream
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            DROPPED_MESSAGES.inc()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        """Next message, or None once the stream has ended."""
+        return await self.queue.get()
+
+
+class LiveStream:
+    """
+    One ffmpeg/VAD/transcription/fact-check pipeline for a stream, broadcast to all subscribers.
+
+    With a shared store, only the worker process holding the stream's lease
+    runs the pipeline; it publishes every message on the stream's channel
+    and the other workers relay them to their own subscribers. If the owner
+    goes away its lease expires and a relaying worker takes over.
+
+    Relaying workers with subscribers keep renewing a second lease,
+    `wanted_key`, and the owner stops once it has no subscribers of its own
+    and that lease has lapsed. A crashed worker's interest therefore
+    expires with its lease, instead of leaving a count that never returns
+    to zero.
+    """
+
+    def __init__(self, hub, link):
+        self.hub = hub
+        self.link = link
+        self.subscribers = set()
+        self.task = None
+        self.owner = False
+        self.owner_id = f"{os.getpid()}:{id(self)}"
+        self.owner_key = f"live:owner:{link}"
+        self.wanted_key = f"live:wanted:{link}"
+        self.channel = f"live:{link}"
+        self._ended = asyncio.Event()
+
+    def broadcast(self, message):
+        for subscriber in list(self.subscribers):
+            subscriber.offer(message)
+
+    async def emit(self, message):
+        """Send a message to local subscribers and, as owner, to the other workers."""
+        self.broadcast(message)
+        if self.hub.store is not None:
+            await self.hub.call_store("publish", self.channel, message)
+
+    async def _fact_check(self, text):
+        try:
+            sentiment, verification = await self.hub.fact_checker.fact_check(text)
+        except Exception as e:
+            logger.warning("fact check error: %s", e, extra={"link": self.link})
+            return
+        await self.emit(f"Sentiment: {sentiment}")
+        await self.emit(f"Verification: {verification}")
+
+    async def _still_wanted(self):
+        if self.subscribers:
+            return True
+        # no local clients left; keep going while other workers renew their interest
+        return await self.hub.call_store("get", self.wanted_key) is not None
+
+    async def renew_interest(self):
+        if self.subscribers:
+            await self.hub.call_store("set", self.wanted_key, self.owner_id, self.hub.lease_ttl)
+
+    async def ingest(self):
+        loop = asyncio.get_event_loop()
+        store = self.hub.store
+        reader = None
+        pending_checks = set()
+        try:
+            stream_url = await self.hub.resolve(self.link)
+            opening = loop.run_in_executor(self.hub.io_executor, self.hub.live_extraction.open_stream, stream_url)
+            try:
+                # shielded: cancelling cannot stop the open, so it must not lose the reader it returns
+                reader = await asyncio.shield(opening)
+            except asyncio.CancelledError:
+                opening.add_done_callback(self._close_opened)
+                raise
+            processor = AudioProcessor(**self.hub.audio_options)
+            text_buffer = []
+            while True:
+                if store is not None:
+                    if not await self._still_wanted():
+                        return
+                    await self.hub.call_store("set", self.owner_key, self.owner_id, self.hub.lease_ttl)
+                pcm = await loop.run_in_executor(self.hub.io_executor, reader.read_pcm, self.hub.read_seconds)
+                if not pcm:
+                    break
+                processor.add_audio(pcm)
+                for chunk in processor.get_speech_chunks():
+                    try:
+                        text = await self.hub.transcriber.transcribe(chunk)
+                    except Exception as e:
+                        logger.warning("transcription error: %s", e, extra={"link": self.link})
+                        continue
+                    if not text:
+                        continue
+                    await self.emit(text)
+                    text_buffer.append(text)
+                    if len(' '.join(text_buffer).split()) >= 20:
+                        # fact checks run alongside ingestion instead of holding it up
+                        check = asyncio.ensure_future(self._fact_check(' '.join(text_buffer)))
+                        pending_checks.add(check)
+                        check.add_done_callback(pending_checks.discard)
+                        text_buffer.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("live stream error: %s", e, extra={"link": self.link})
+        finally:
+            for check in pending_checks:
+                check.cancel()
+            if reader is not None:
+                # kill and wait for ffmpeg off the loop, even if cancelled again meanwhile
+                await asyncio.shield(loop.run_in_executor(self.hub.io_executor, reader.close))
+        # the stream ended: tell the relaying workers too
+        if store is not None:
+            await self.hub.call_store("publish", self.channel, None)
+
+    def _close_opened(self, opening):
+        if not opening.cancelled() and opening.exception() is None:
+            self.hub.io_call_soon(opening.result().close)
+
+    def _relayed(self, message):
+        if message is None:
+            self._ended.set()
+        else:
+            self.broadcast(message)
+
+    async def relay(self):
+        """
+        Forward the owner's messages until the stream ends (returns False) or
+        the owner's lease lapses (returns True).
+        """
+        loop = asyncio.get_event_loop()
+        unsubscribe = await self.hub.call_store(
+            "subscribe", self.channel, lambda message: loop.call_soon_threadsafe(self._relayed, message)
+        )
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._ended.wait(), self.hub.lease_ttl / 2)
+                    return False
+                except asyncio.TimeoutError:
+                    pass
+                await self.renew_interest()
+                if await self.hub.call_store("get", self.owner_key) is None:
+                    return True
+        finally:
+            unsubscribe()
+
+    async def run(self):
+        store = self.hub.store
+        try:
+            if store is None:
+                await self.ingest()
+                return
+            while True:
+                if await self.hub.call_store("set_if_absent", self.owner_key, self.owner_id, self.hub.lease_ttl):
+                    self.owner = True
+                    await self.ingest()
+                    break
+                if not await self.relay():
+                    break
+        finally:
+            if self.owner:
+                # let another worker take over at once if we were cancelled
+                await self.hub.call_store("delete", self.owner_key)
+            if self.hub.streams.get(self.link) is self:
+                del self.hub.streams[self.link]
+            self.broadcast(None)
+
+
+class LiveStreamHub:
+    """
+    Shares one LiveStream per YouTube link between all WebSocket clients.
+
+    The stream starts with its first subscriber and is cancelled when the
+    last one leaves. Resolved `yt-dlp` URLs are cached for `url_ttl`
+    seconds. Blocking work (yt-dlp, ffmpeg reads, store calls) runs in
+    `io_executor`, the loop's default executor if None.
+
+    With several worker processes, pass a shared `store` (see state_store):
+    each stream is then ingested once across all workers, and kept running
+    while any worker still has subscribers to it.
+
+    `audio_options` configure each stream's AudioProcessor. Partial chunks
+    are not used: a stream only broadcasts final transcripts.
+    """
+
+    def __init__(self, live_extraction, transcriber, fact_checker, io_executor=None,
+                 url_ttl=1800, max_queue=64, read_seconds=0.5, store=None, lease_ttl=10, audio_options=None):
+        self.live_extraction = live_extraction
+        self.transcriber = transcriber
+        self.fact_checker = fact_checker
+        self.io_executor = io_executor
+        self.url_ttl = url_ttl
+        self.max_queue = max_queue
+        self.read_seconds = read_seconds
+        self.store = store
+        self.lease_ttl = lease_ttl
+        self.audio_options = dict(audio_options or {}, partial_ms=None)
+        self.streams = {}
+        self._urls = {}
+        self._resolving = {}
+        REGISTRY.gauge("zero_trust_live_streams", "Live streams this worker ingests or relays",
+                       lambda: len(self.streams))
+        REGISTRY.gauge("zero_trust_live_subscribers", "/live clients connected to this worker",
+                       lambda: sum(len(stream.subscribers) for stream in list(self.streams.values())))
+
+    def call_store(self, method, *args):
+        return asyncio.get_event_loop().run_in_executor(self.io_executor, getattr(self.store, method), *args)
+
+    def call_store_soon(self, method, *args):
+        """call_store from synchronous code: nothing waits for the result, so failures are logged."""
+        return self.io_call_soon(getattr(self.store, method), *args)
+
+    def io_call_soon(self, function, *args):
+        """Run `function` in io_executor without waiting for it; failures are logged."""
+        future = asyncio.get_event_loop().run_in_executor(self.io_executor, function, *args)
+        future.add_done_callback(_log_io_failure)
+        return future
+
+    async def resolve(self, link):
+        """Resolve a YouTube link to its stream URL, reusing cached and in-flight lookups."""
+        cached = self._urls.get(link)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        if link not in self._resolving:
+            loop = asyncio.get_event_loop()
+            self._resolving[link] = loop.run_in_executor(
+                self.io_executor, self.live_extraction.get_live_stream_url, link
+            )
+        try:
+            stream_url = await asyncio.shield(self._resolving[link])
+        finally:
+            self._resolving.pop(link, None)
+        if not stream_url:
+            raise RuntimeError(f"Could not resolve stream URL for {link}")
+        self._urls[link] = (stream_url, time.monotonic() + self.url_ttl)
+        return stream_url
+
+    def subscribe(self, link):
+        stream = self.streams.get(link)
+        if stream is None:
+            stream = LiveStream(self, link)
+            self.streams[link] = stream
+            stream.task = asyncio.ensure_future(stream.run())
+        subscriber = Subscriber(stream, self.max_queue)
+        stream.subscribers.add(subscriber)
+        if self.store is not None:
+            # renewed by the relay loop (or, as owner, not needed) while subscribers remain
+            self.call_store_soon("set", stream.wanted_key, stream.owner_id, self.lease_ttl)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        stream = subscriber.stream
+        stream.subscribers.discard(subscriber)
+        if self.store is not None:
+            if stream.owner:
+                # the owner stops by itself once no worker has subscribers left
+                return
+        if not stream.subscribers:
+            # forget it now so a new subscriber starts a fresh stream
+            if self.streams.get(stream.link) is stream:
+                del self.streams[stream.link]
+            stream.task.cancel()
+
+    async def close(self):
+        tasks = [stream.task for stream in self.streams.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
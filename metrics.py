@@ -0,0 +1,258 @@
+"""
+In-process metrics, rendered in the Prometheus text format by the /metrics route.
+
+Metrics live in REGISTRY, one family per name with a child per label set:
+
+    CHUNKS = REGISTRY.counter("zero_trust_speech_chunks_total", "Speech chunks produced by the VAD")
+    SEARCH = REGISTRY.histogram("zero_trust_fact_check_seconds", "...", step="search", client="async")
+
+Updates are a lock and an addition, cheap enough for the hot path. Gauges
+can be given a function instead, read at scrape time (queue depths,
+executor saturation). The numbers are per process: with several uvicorn
+workers, each scrape reaches one worker.
+"""
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram (seconds), cheap enough for the hot path.
+
+    Bucket bounds follow the Prometheus convention: `counts[i]` is the number
+    of observations <= `buckets[i]`, with a final +Inf bucket.
+    """
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (inf if it is past the last bound)."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+        return float("inf")
+
+    def cumulative(self):
+        """(bucket bounds with +Inf, cumulative counts, sum, count), read consistently."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        running, cumulative = 0, []
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        return self.buckets + (float("inf"),), cumulative, total, count
+
+    def snapshot(self):
+        """Count, mean and bucketed percentiles; percentiles past the last bound are None."""
+        quantiles = {name: self.quantile(q) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            **{name: None if value == float("inf") else value for name, value in quantiles.items()},
+        }
+
+
+# for per-frame hot-path work measured in microseconds
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+class Counter:
+    """A monotonically increasing count."""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """A value that goes up and down, or, with `function`, whatever it returns at scrape time."""
+
+    def __init__(self, function=None):
+        self.function = function
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    @contextmanager
+    def track(self):
+        """Count the body as in progress while it runs."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class MetricsRegistry:
+    """Metric families by name; asking for an existing name and label set returns the same metric."""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help, labels, create):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (kind, help, {})
+            elif family[0] != kind:
+                raise ValueError(f"{name} is already registered as a {family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = create()
+            return metric
+
+    def counter(self, name, help, **labels):
+        return self._get("counter", name, help, labels, Counter)
+
+    def gauge(self, name, help, function=None, **labels):
+        gauge = self._get("gauge", name, help, labels, lambda: Gauge(function))
+        if function is not None:
+            # the latest owner of a callback gauge wins (e.g. a re-created transcriber)
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help, buckets=Histogram.DEFAULT_BUCKETS, **labels):
+        return self._get("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            families = [(name, kind, help, list(children.items()))
+                        for name, (kind, help, children) in sorted(self._families.items())]
+        lines = []
+        for name, kind, help, children in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in children:
+                if kind == "histogram":
+                    bounds, cumulative, total, count = metric.cumulative()
+                    for bound, bucket_count in zip(bounds, cumulative):
+                        bucket_labels = _format_labels(labels + (("le", _format_value(bound)),))
+                        lines.append(f"{name}_bucket{bucket_labels} {bucket_count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+                    continue
+                if kind == "gauge":
+                    try:
+                        value = metric.get()
+                    except Exception:
+                        # the object behind a callback gauge may be gone or mid-shutdown
+                        continue
+                else:
+                    value = metric.value
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(histogram):
+    """Decorator: observe the run time of each call (or await, for coroutine functions) in `histogram`."""
+    def decorate(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def timed_coroutine(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return timed_coroutine
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return timed_function
+    return decorate
+
+
+def watch_executor(name, executor):
+    """
+    Saturation gauges for a concurrent.futures executor: configured workers,
+    busy workers and queued tasks. These read executor internals, which
+    have been stable across CPython 3.8-3.13.
+    """
+    labels = {"executor": name}
+    REGISTRY.gauge("zero_trust_executor_max_workers", "Workers an executor may run", lambda: executor._max_workers,
+                   **labels)
+    if hasattr(executor, "_work_queue"):
+        # ThreadPoolExecutor: idle threads hold a permit of _idle_semaphore
+        REGISTRY.gauge("zero_trust_executor_queued_tasks", "Tasks waiting for a free worker",
+                       lambda: executor._work_queue.qsize(), **labels)
+        REGISTRY.gauge("zero_trust_executor_busy_workers", "Workers running a task",
+                       lambda: len(executor._threads) - executor._idle_semaphore._value, **labels)
+    else:
+        # ProcessPoolExecutor: submitted and not yet finished, running or queued
+        REGISTRY.gauge("zero_trust_executor_pending_tasks", "Tasks submitted and not finished",
+                       lambda: len(executor._pending_work_items), **labels)
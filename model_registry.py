@@ -0,0 +1,212 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# classifier name -> Hugging Face model used by YoutubeAnalysis
+COMMENT_MODELS = {
+    "sentiment": "Remicm/sentiment-analysis-model-for-socialmedia",
+    "spam": "MathewManoj/tinybert-spam-detector",
+    "sarcasm": "helinivan/english-sarcasm-detector",
+    "emotion": "bhadresh-savani/bert-base-uncased-emotion",
+}
+
+
+def model_bytes(classifier):
+    """Approximate memory held by a pipeline's model: its weights, however they are stored."""
+    model = classifier.model
+    if hasattr(model, "nbytes"):
+        # an ONNX graph: the weights live in onnxruntime
+        return model.nbytes
+    total = 0
+    for value in model.state_dict().values():
+        # int8 quantized layers keep (weight, bias) as packed params
+        for t in value if isinstance(value, tuple) else (value,):
+            if hasattr(t, "element_size"):
+                total += t.numel() * t.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    Loads text-classification pipelines on first use and shares them.
+
+    One registry serves every YoutubeAnalysis and worker thread of a process,
+    so each model is loaded at most once; concurrent first uses of the same
+    model wait for a single load. `warm` loads models ahead of time in a
+    background thread.
+
+    If `memory_budget_mb` is set, least recently used models are evicted
+    once the loaded models go over it (the model just requested is always
+    kept). Models unused for `idle_seconds` are evicted as well. An evicted
+    model is loaded again on its next use; callers still holding it keep a
+    working reference.
+
+    `backends` picks an optimized CPU backend per model name ("int8",
+    "onnx" or "onnx-int8", see cpu_inference); unlisted models run fp32.
+    """
+
+    def __init__(self, models=COMMENT_MODELS, device=None, memory_budget_mb=None, idle_seconds=None,
+                 backends=None, onnx_cache_dir=None):
+        self.models = dict(models)
+        self.device = device
+        self.backends = dict(backends or {})
+        self.onnx_cache_dir = onnx_cache_dir
+        self.memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        self.idle_seconds = idle_seconds
+        # name -> [pipeline, size in bytes, last used]; least recently used first
+        self._loaded = OrderedDict()
+        self._engines = {}
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.models}
+
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def _device(self):
+        if self.device is None:
+            import torch
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        return self.device
+
+    def _touch(self, name):
+        entry = self._loaded.get(name)
+        if entry is None:
+            return None
+        entry[2] = time.monotonic()
+        self._loaded.move_to_end(name)
+        return entry[0]
+
+    def get(self, name):
+        """The pipeline for `name`, loading it if needed."""
+        with self._lock:
+            classifier = self._touch(name)
+        if classifier is not None:
+            return classifier
+
+        with self._load_locks[name]:
+            with self._lock:
+                classifier = self._touch(name)
+            if classifier is not None:
+                return classifier
+
+            # imported here: both pull in torch, which a process that never loads a model should not pay for
+            import cpu_inference
+            from transformers import pipeline
+            began = time.perf_counter()
+            backend = self.backends.get(name, "fp32")
+            # the optimized backends are CPU only
+            device = 'cpu' if backend != "fp32" else self._device()
+            classifier = pipeline("text-classification", model=self.models[name], device=device)
+            cpu_inference.apply_backend(classifier, backend, self.models[name], self.onnx_cache_dir)
+            elapsed = time.perf_counter() - began
+            size = model_bytes(classifier)
+
+            with self._lock:
+                self._loaded[name] = [classifier, size, time.monotonic()]
+                self.loads += 1
+                self.load_seconds += elapsed
+                self._evict(keep=name)
+        logger.info("loaded model %s (%s) in %.1fs (%.0f MB)", name, backend, elapsed, size / (1024 * 1024))
+        return classifier
+
+    def engine(self, names, batch_size=32):
+        """A BatchInferenceEngine over `names`, cached until one of its models is evicted."""
+        from batch_inference import BatchInferenceEngine
+
+        key = (tuple(names), batch_size)
+        with self._lock:
+            engine = self._engines.get(key)
+        if engine is not None:
+            for name in names:
+                with self._lock:
+                    self._touch(name)
+            return engine
+        engine = BatchInferenceEngine({name: self.get(name) for name in names}, batch_size=batch_size)
+        with self._lock:
+            # only cache it if none of its models was evicted meanwhile
+            if all(name in self._loaded for name in names):
+                self._engines[key] = engine
+        return engine
+
+    def warm(self, names=None, background=True):
+        """Load `names` (all models by default), in a daemon thread unless `background` is False."""
+        names = list(self.models if names is None else names)
+
+        def load():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.warning("could not load model %s: %s", name, e)
+
+        if not background:
+            load()
+            return None
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def _drop(self, name):
+        del self._loaded[name]
+        self.evictions += 1
+        for key in [key for key in self._engines if name in key[0]]:
+            del self._engines[key]
+
+    def _evict(self, keep=None):
+        if self.idle_seconds is not None:
+            cutoff = time.monotonic() - self.idle_seconds
+            for name in [name for name, entry in self._loaded.items() if entry[2] < cutoff and name != keep]:
+                self._drop(name)
+        if self.memory_budget is not None:
+            for name in list(self._loaded):
+                if self.memory_bytes() <= self.memory_budget:
+                    break
+                if name != keep:
+                    self._drop(name)
+
+    def evict_idle(self):
+        """Drop models idle for longer than `idle_seconds`; call periodically on long-lived servers."""
+        with self._lock:
+            self._evict()
+
+    def memory_bytes(self):
+        return sum(entry[1] for entry in self._loaded.values())
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": list(self._loaded),
+                "memory_mb": self.memory_bytes() / (1024 * 1024),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds": self.load_seconds,
+            }
+
+
+_registry = None
+_registry_kwargs = None
+_registry_lock = threading.Lock()
+
+
+def default_registry(**kwargs):
+    """
+    The process-wide registry, created with `kwargs` on first call. Later
+    calls with no kwargs return it as it is; later calls with different
+    kwargs raise ValueError rather than silently ignoring them.
+    """
+    global _registry, _registry_kwargs
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(**kwargs)
+            _registry_kwargs = kwargs
+        elif kwargs and kwargs != _registry_kwargs:
+            raise ValueError(f"default_registry() already created with {_registry_kwargs}, not {kwargs}")
+        return _registry
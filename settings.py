@@ -0,0 +1,87 @@
+"""
+Server settings, read from environment variables.
+
+    WORKERS              uvicorn worker processes (python app.py)
+    HOST, PORT           address to listen on (python app.py)
+    TRANSCRIBE_THREADS   threads for transcription requests / local inference
+    IO_THREADS           threads for blocking I/O: yt-dlp, ffmpeg reads, state store calls
+    INFERENCE_PROCESSES  if > 0, run the "local" transcriber in a pool of this many processes
+    TRANSCRIBER_BACKEND  "openai", "local" or "stub" (see transcriber.create_transcriber)
+    STATE_STORE          "memory" or "unix:<socket path>" (see state_store)
+    FACT_CACHE_DB        SQLite file to keep fact-check results in across restarts
+    OPENAI_BASE_URL      OpenAI API endpoint (Whisper and completions), e.g. a local stand-in
+                         for benchmarks (see benchmarks/fake_services.py)
+    SERPAPI_URL          SerpAPI search endpoint
+    OPENAI_API_KEY,      override the keys in api.py, e.g. dummy keys for local stand-ins
+    SERPAPI_KEY
+    WARM_MODELS          comma-separated comment classifiers to load in the background at startup
+                         (e.g. "sentiment,spam"; see model_registry.COMMENT_MODELS)
+    MODEL_MEMORY_MB      evict least recently used comment classifiers above this much memory
+    MODEL_IDLE_SECONDS   evict comment classifiers unused for this long
+    MODEL_BACKENDS       CPU backend per comment classifier, e.g. "sentiment=int8,emotion=onnx"
+                         (see cpu_inference; unlisted models run fp32)
+    ONNX_CACHE_DIR       where exported ONNX graphs are kept
+    CLAIM_FILTER         skip fact checks of text without a checkable claim: "off" (the default),
+                         "heuristic" or the path to a saved classifier (see claim_filter)
+    CLAIM_THRESHOLD      minimum claim score for a text to be fact-checked
+    CHUNKING             how speech is cut for transcription: "fixed" (2 s chunks) or "adaptive"
+                         (one chunk per utterance; see audio_processor.AudioProcessor)
+    HANGOVER_MS          adaptive: non-speech that ends an utterance
+    MIN_SPEECH_MS        adaptive: utterances with less speech than this are dropped
+    MAX_UTTERANCE_MS     adaptive: longer utterances are cut
+    PRE_ROLL_MS          adaptive: audio kept before the first speech frame
+    PARTIAL_MS           adaptive: if > 0, /ws also sends "Partial: <text>" interim transcripts of the
+                         open utterance at about this interval
+    MAX_PARTIALS         adaptive: at most this many interim transcripts per utterance
+    LOG_LEVEL            root log level, e.g. "DEBUG" to log every transcript
+    LOG_FORMAT           "json" (one object per line) or "text"
+    PROFILER             "on" to expose the sampling profiler under /profiler (see profiler)
+"""
+import os
+
+WORKERS = int(os.environ.get("WORKERS", "1"))
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8000"))
+
+TRANSCRIBE_THREADS = int(os.environ.get("TRANSCRIBE_THREADS", "4"))
+IO_THREADS = int(os.environ.get("IO_THREADS", "16"))
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", "0"))
+
+TRANSCRIBER_BACKEND = os.environ.get("TRANSCRIBER_BACKEND", "openai")
+STATE_STORE = os.environ.get("STATE_STORE", "memory")
+FACT_CACHE_DB = os.environ.get("FACT_CACHE_DB")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")
+SERPAPI_URL = os.environ.get("SERPAPI_URL", "https://serpapi.com/search")
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+SERPAPI_KEY = os.environ.get("SERPAPI_KEY")
+
+WARM_MODELS = [name for name in os.environ.get("WARM_MODELS", "").split(",") if name]
+MODEL_MEMORY_MB = int(os.environ["MODEL_MEMORY_MB"]) if os.environ.get("MODEL_MEMORY_MB") else None
+MODEL_IDLE_SECONDS = int(os.environ["MODEL_IDLE_SECONDS"]) if os.environ.get("MODEL_IDLE_SECONDS") else None
+MODEL_BACKENDS = os.environ.get("MODEL_BACKENDS", "")
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR")
+
+CLAIM_FILTER = os.environ.get("CLAIM_FILTER", "off")
+CLAIM_THRESHOLD = float(os.environ.get("CLAIM_THRESHOLD", "0.3"))
+
+CHUNKING = os.environ.get("CHUNKING", "fixed")
+HANGOVER_MS = int(os.environ.get("HANGOVER_MS", "300"))
+MIN_SPEECH_MS = int(os.environ.get("MIN_SPEECH_MS", "250"))
+MAX_UTTERANCE_MS = int(os.environ.get("MAX_UTTERANCE_MS", "10000"))
+PRE_ROLL_MS = int(os.environ.get("PRE_ROLL_MS", "150"))
+PARTIAL_MS = int(os.environ.get("PARTIAL_MS", "0"))
+MAX_PARTIALS = int(os.environ.get("MAX_PARTIALS", "1"))
+# AudioProcessor options for /ws and /live
+AUDIO_OPTIONS = {
+    "chunking": CHUNKING,
+    "hangover_ms": HANGOVER_MS,
+    "min_speech_ms": MIN_SPEECH_MS,
+    "max_utterance_ms": MAX_UTTERANCE_MS,
+    "pre_roll_ms": PRE_ROLL_MS,
+    "partial_ms": PARTIAL_MS or None,
+    "max_partials": MAX_PARTIALS,
+}
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+PROFILER = os.environ.get("PROFILER", "off")
@@ -0,0 +1,234 @@
+"""
+Shared state for running the server as several worker processes.
+
+Two implementations of the same small key/value + pub/sub interface:
+
+- InProcessStore: a dict, for a single process.
+- SocketStore: a client for `serve_store`, a stand-in store server on a local
+  Unix socket that all workers of one host connect to. Start it with
+      python state_store.py /tmp/zero_trust.sock
+  and point the workers at it with STATE_STORE=unix:/tmp/zero_trust.sock.
+
+Values must be JSON serializable. Subscriber callbacks may be called from
+another thread.
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+
+class InProcessStore:
+    def __init__(self):
+        self._data = {}
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            return None if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def set_if_absent(self, key, value, ttl=None):
+        """Set `key` only if it has no live value. Returns True if it was set."""
+        with self._lock:
+            now = time.time()
+            if self._live(key, now) is not None:
+                return False
+            self._data[key] = (value, now + ttl if ttl else None)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            entry = self._live(key, time.time())
+            value = (entry[0] if entry else 0) + amount
+            self._data[key] = (value, entry[1] if entry else None)
+            return value
+
+    def publish(self, channel, message):
+        with self._lock:
+            callbacks = list(self._channels.get(channel, ()))
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        """Call `callback(message)` for every message on `channel`. Returns an unsubscribe function."""
+        with self._lock:
+            self._channels.setdefault(channel, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._channels.get(channel, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+        return unsubscribe
+
+    def close(self):
+        pass
+
+
+class _StoreHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line, one JSON response per line; 'subscribe' turns the connection into a feed."""
+
+    def handle(self):
+        store = self.server.store
+        for line in self.rfile:
+            request = json.loads(line)
+            op = request.pop("op")
+            if op == "subscribe":
+                self._feed(store, request["channel"])
+                return
+            try:
+                result = {"ok": getattr(store, op)(**request)}
+            except Exception as e:
+                result = {"error": str(e)}
+            self.wfile.write(json.dumps(result).encode("utf-8") + b"\n")
+
+    def _feed(self, store, channel):
+        lock = threading.Lock()
+
+        def forward(message):
+            with lock:
+                self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+
+        unsubscribe = store.subscribe(channel, forward)
+        try:
+            forward({"subscribed": channel})
+            # the client closes the connection to unsubscribe
+            while self.rfile.readline():
+                pass
+        except OSError:
+            pass
+        finally:
+            unsubscribe()
+
+
+class _StoreServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_store(path):
+    """Serve an InProcessStore on a Unix socket until interrupted."""
+    if os.path.exists(path):
+        os.unlink(path)
+    server = _StoreServer(path, _StoreHandler)
+    server.store = InProcessStore()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+class SocketStore:
+    """Client for `serve_store`, with the same interface as InProcessStore. Thread safe."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        return sock, sock.makefile("rb")
+
+    def _call(self, op, **kwargs):
+        # one connection per thread, so requests never interleave
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        sock, reader = connection
+        try:
+            sock.sendall(json.dumps({"op": op, **kwargs}).encode("utf-8") + b"\n")
+            response = reader.readline()
+        except OSError:
+            self._local.connection = None
+            raise
+        if not response:
+            self._local.connection = None
+            raise ConnectionError("state store closed the connection")
+        response = json.loads(response)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["ok"]
+
+    def get(self, key):
+        return self._call("get", key=key)
+
+    def set(self, key, value, ttl=None):
+        return self._call("set", key=key, value=value, ttl=ttl)
+
+    def set_if_absent(self, key, value, ttl=None):
+        return self._call("set_if_absent", key=key, value=value, ttl=ttl)
+
+    def delete(self, key):
+        return self._call("delete", key=key)
+
+    def incr(self, key, amount=1):
+        return self._call("incr", key=key, amount=amount)
+
+    def publish(self, channel, message):
+        return self._call("publish", channel=channel, message=message)
+
+    def subscribe(self, channel, callback):
+        sock, reader = self._connect()
+        sock.sendall(json.dumps({"op": "subscribe", "channel": channel}).encode("utf-8") + b"\n")
+        reader.readline()  # wait until the subscription is registered
+
+        def listen():
+            try:
+                for line in reader:
+                    callback(json.loads(line))
+            except (OSError, ValueError):
+                pass
+
+        threading.Thread(target=listen, daemon=True).start()
+
+        def unsubscribe():
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        return unsubscribe
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection[0].close()
+            self._local.connection = None
+
+
+def create_store(spec):
+    """Build a store from a STATE_STORE value: 'memory' or 'unix:<socket path>'."""
+    if not spec or spec == "memory":
+        return InProcessStore()
+    if spec.startswith("unix:"):
+        return SocketStore(spec[len("unix:"):])
+    raise ValueError(f"Unknown state store: {spec}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    serve_store(sys.argv[1] if len(sys.argv) > 1 else "/tmp/zero_trust.sock")
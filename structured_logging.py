@@ -0,0 +1,107 @@
+"""
+Structured logging that stays off the event loop.
+
+configure_logging() sends every record through a bounded queue. The calling
+thread (often the event loop) only merges the message and enqueues the
+record. A listener thread formats it and writes it out. If the queue is
+full the record is dropped and counted in zero_trust_log_dropped_total,
+rather than blocking the caller.
+
+Records are JSON lines (format="json") or plain text. Fields passed as
+`extra` become keys of the JSON object:
+
+    logger.info("live subscribe", extra={"link": link})
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+from metrics import REGISTRY
+
+LOG_DROPPED = REGISTRY.counter("zero_trust_log_dropped_total", "Log records dropped because the log queue was full")
+
+# attributes every LogRecord has; anything else came in through `extra`
+_STANDARD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **extra_fields(record),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value!r}" for key, value in fields.items())
+        return line
+
+
+class BufferedQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without blocking; the listener thread does the formatting and I/O."""
+
+    def prepare(self, record):
+        # only what must happen on the caller's thread: merge the args and
+        # render any traceback while it is still available
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+_listener = None
+
+# HTTP clients that log every request at INFO
+QUIET_LOGGERS = ("httpx", "httpcore", "openai")
+
+
+def configure_logging(level="INFO", format="json", stream=None, max_queue=10000):
+    """
+    Route the root logger through the queue. The QUIET_LOGGERS only pass
+    warnings unless `level` is DEBUG. Calling it again has no effect.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if format == "json" else TextFormatter())
+    records = queue.Queue(max_queue)
+    root = logging.getLogger()
+    root.handlers[:] = [BufferedQueueHandler(records)]
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(min(logging.WARNING, root.level))
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    # flush what is still queued on exit
+    atexit.register(_listener.stop)
@@ -0,0 +1,78 @@
+"""
+Vectorized comment cleaning, equivalent to youtube_analyse.clean_text.
+
+Most comments have no markup at all. Simple tags and comments are removed
+by one compiled regex over the whole column. The few rows the regex cannot
+decide on go through BeautifulSoup as before:
+- character references
+- quoted attributes
+- script/style-like elements
+- stray markup
+Punctuation, case and whitespace are handled with pandas `.str` operations.
+"""
+import re
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+# start/end tags without quotes or nested brackets, and well-formed HTML comments
+TAG = re.compile(r'<(?:/?[a-zA-Z][^<>"\']*|!--.*?--)>', re.S)
+
+# anything left that html.parser could still treat as markup or a character reference
+LEFTOVER_MARKUP = r'<[a-zA-Z!/?]|&[#a-zA-Z]'
+
+# elements whose text BeautifulSoup leaves out of get_text() or parses as raw text
+SPECIAL_ELEMENTS = re.compile(
+    r'<\s*/?\s*(?:script|style|template|rt|rp|textarea|title|noscript|plaintext|xmp|iframe|noembed|noframes)\b',
+    re.I
+)
+
+
+def soup_text(text):
+    return BeautifulSoup(text, "html.parser").get_text()
+
+
+def strip_markup(texts):
+    """Same as BeautifulSoup(text, "html.parser").get_text() for every text in a Series of str."""
+    # plain substring scans first; the regexes only run on rows that may hold markup
+    markup = texts.str.contains('<', regex=False) | texts.str.contains('&', regex=False)
+    if not markup.any():
+        return texts
+    candidates = texts[markup]
+    stripped = candidates.str.replace(TAG, '', regex=True)
+    needs_soup = stripped.str.contains(LEFTOVER_MARKUP, regex=True) | candidates.str.contains(SPECIAL_ELEMENTS, regex=True)
+    if needs_soup.any():
+        stripped[needs_soup] = candidates[needs_soup].map(soup_text)
+    texts = texts.copy()
+    texts[markup] = stripped
+    return texts
+
+
+def _clean(texts):
+    texts = strip_markup(texts)
+    # Remove punctuation, convert to lowercase, collapse whitespace (as in clean_text)
+    texts = texts.str.replace(r'[^\w\s]', '', regex=True).str.lower()
+    # str.split() is faster than a \s+ regex replace when most gaps are single spaces
+    return texts.str.split().str.join(' ')
+
+
+def clean_texts(texts, processes=None, chunk_size=50000):
+    """
+    Vectorized clean_text over a Series of str, keeping its index.
+
+    With `processes` > 1, Series longer than `chunk_size` are cleaned in
+    chunks by a multiprocessing pool.
+    """
+    texts = texts.astype(str)
+    if not processes or processes < 2 or len(texts) <= chunk_size:
+        return _clean(texts)
+    chunks = [texts.iloc[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with Pool(processes) as pool:
+        return pd.concat(pool.map(_clean, chunks))
+
+
+def word_counts(cleaned):
+    """Words per cleaned text: single spaces separate words, so spaces + 1 (0 for empty text)."""
+    return cleaned.str.count(' ').add(cleaned.str.len().gt(0).astype(np.int64))
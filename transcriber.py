@@ -0,0 +1,275 @@
+import abc
+import asyncio
+import io
+import time
+import wave
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metrics import REGISTRY
+
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+
+
+def transcribe_seconds(backend):
+    return REGISTRY.histogram("zero_trust_transcribe_seconds", "Time to transcribe one request or batch",
+                              backend=backend)
+
+
+class Transcriber(abc.ABC):
+    """
+    Turns chunks of 16-bit mono PCM (as produced by AudioProcessor) into text.
+
+    Subclasses implement `transcribe`. Chunks may be bytes or memoryviews.
+    """
+    sample_rate = 16000
+
+    @abc.abstractmethod
+    async def transcribe(self, pcm):
+        """The text of one chunk."""
+
+    async def close(self):
+        pass
+
+
+def pcm_to_wav(pcm, sample_rate=16000):
+    """Wrap raw 16-bit mono PCM in a WAV container."""
+    with io.BytesIO() as wav_buffer:
+        with wave.open(wav_buffer, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(pcm)
+        return wav_buffer.getvalue()
+
+
+def pcm_to_float(pcm):
+    """View 16-bit PCM as int16 samples and scale to float32 in [-1, 1)."""
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / (2 ** 15)
+
+
+class WhisperAPITranscriber(Transcriber):
+    """Remote Whisper through the OpenAI API, one request per chunk."""
+
+    def __init__(self, client, executor, model="whisper-1"):
+        self.client = client
+        self.executor = executor
+        self.model = model
+        self.latency = transcribe_seconds("openai")
+
+    def _transcribe_sync(self, pcm):
+        with self.latency.time(), io.BytesIO(pcm_to_wav(pcm, self.sample_rate)) as wav_buffer:
+            wav_buffer.name = "audio.wav"
+            response = self.client.audio.transcriptions.create(
+                model=self.model,
+                file=wav_buffer
+            )
+        return response.text
+
+    async def transcribe(self, pcm):
+        return await asyncio.get_event_loop().run_in_executor(
+            self.executor,
+            lambda: self._transcribe_sync(pcm)
+        )
+
+
+class BatchingTranscriber(Transcriber):
+    """
+    Collects chunks submitted by any number of sessions and runs them through
+    `transcribe_batch`, which subclasses implement, together.
+
+    A batch is dispatched as soon as `max_batch_size` chunks are waiting or
+    `max_wait_ms` has passed since the first one arrived. Batches run in
+    `executor` (the default loop executor if None), at most
+    `max_concurrent_batches` at a time; raise it to match the size of a
+    process pool.
+    """
+
+    def __init__(self, max_batch_size=8, max_wait_ms=50, executor=None, max_concurrent_batches=1):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.max_concurrent_batches = max_concurrent_batches
+        self.batches = 0
+        self.chunks = 0
+        self._queue = None
+        self._worker = None
+        self._slots = None
+        backend = type(self).__name__
+        self.latency = transcribe_seconds(backend)
+        self.batch_sizes = REGISTRY.histogram("zero_trust_transcribe_batch_size", "Chunks per transcription batch",
+                                              buckets=BATCH_SIZES, backend=backend)
+        REGISTRY.gauge("zero_trust_transcribe_queued_chunks", "Chunks waiting to be batched",
+                       lambda: self._queue.qsize() if self._queue is not None else 0, backend=backend)
+
+    @abc.abstractmethod
+    def transcribe_batch(self, chunks):
+        """Transcribe a list of PCM chunks, returning one string per chunk."""
+
+    def batch_call(self, chunks):
+        """The function and arguments to run in the executor for one batch."""
+        return self.transcribe_batch, chunks
+
+    async def transcribe(self, pcm):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.ensure_future(self._run())
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((pcm, future))
+        return await future
+
+    async def _collect(self, queue, batch):
+        """Fill `batch` in place, so the chunks taken so far are known if collecting is cancelled."""
+        batch.append(await queue.get())
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _dispatch(self, batch):
+        chunks = [pcm for pcm, _ in batch]
+        self.batch_sizes.observe(len(chunks))
+        start = time.perf_counter()
+        try:
+            texts = await asyncio.get_event_loop().run_in_executor(self.executor, *self.batch_call(chunks))
+        except Exception as e:
+            _fail(batch, e)
+            return
+        finally:
+            self._slots.release()
+            self.latency.observe(time.perf_counter() - start)
+        if len(texts) != len(batch):
+            _fail(batch, RuntimeError(f"{type(self).__name__} returned {len(texts)} texts for {len(batch)} chunks"))
+            return
+        self.batches += 1
+        self.chunks += len(batch)
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+    async def _run(self):
+        queue = self._queue
+        batch = []
+        try:
+            while True:
+                await self._collect(queue, batch)
+                await self._slots.acquire()
+                asyncio.ensure_future(self._dispatch(batch))
+                batch = []
+        except BaseException as e:
+            # the next transcribe() starts a new worker and queue; nothing left here would ever be answered
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            _fail(batch, e if isinstance(e, Exception) else RuntimeError("transcriber stopped"))
+            raise
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+
+def _fail(batch, error):
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
+
+
+# ASR pipelines loaded in this process, by (model, device)
+_asr_pipelines = {}
+
+
+def whisper_batch(model, device, sample_rate, chunks):
+    """
+    Transcribe PCM chunks with a transformers Whisper pipeline that is loaded
+    once per process. Module-level so that it can run in a process pool.
+    """
+    if (model, device) not in _asr_pipelines:
+        from transformers import pipeline
+        _asr_pipelines[(model, device)] = pipeline(
+            "automatic-speech-recognition",
+            model=model,
+            device=device
+        )
+    asr = _asr_pipelines[(model, device)]
+    inputs = [{"raw": pcm_to_float(pcm), "sampling_rate": sample_rate} for pcm in chunks]
+    results = asr(inputs, batch_size=len(inputs))
+    return [res["text"].strip() for res in results]
+
+
+class LocalWhisperTranscriber(BatchingTranscriber):
+    """
+    In-process Whisper on CPU through a transformers ASR pipeline.
+
+    PCM is converted straight to float samples, so no WAV encoding is done.
+    The model is loaded on the first batch, in each worker process when the
+    executor is a ProcessPoolExecutor.
+    """
+
+    def __init__(self, model="openai/whisper-base.en", device="cpu", **kwargs):
+        super().__init__(**kwargs)
+        self.model = model
+        self.device = device
+
+    def transcribe_batch(self, chunks):
+        return whisper_batch(self.model, self.device, self.sample_rate, chunks)
+
+    def batch_call(self, chunks):
+        if isinstance(self.executor, ProcessPoolExecutor):
+            # memoryviews cannot be pickled
+            chunks = [bytes(pcm) for pcm in chunks]
+        return whisper_batch, self.model, self.device, self.sample_rate, chunks
+
+
+class StubTranscriber(BatchingTranscriber):
+    """
+    Deterministic offline backend for benchmarks.
+
+    The text depends only on the PCM content (about two words per second of
+    audio). `batch_latency_ms` and `item_latency_ms` simulate the cost of one
+    inference call and of each chunk inside it.
+    """
+
+    WORDS = [
+        "the", "government", "announced", "new", "policy", "today", "prices",
+        "rose", "by", "ten", "percent", "in", "india", "scientists", "found",
+        "water", "on", "mars", "election", "results", "show", "growth",
+    ]
+
+    def __init__(self, batch_latency_ms=0, item_latency_ms=0, **kwargs):
+        super().__init__(**kwargs)
+        self.batch_latency = batch_latency_ms / 1000
+        self.item_latency = item_latency_ms / 1000
+
+    def _text(self, pcm):
+        seed = zlib.crc32(pcm)
+        n_words = max(1, int(len(pcm) / (2 * self.sample_rate) * 2))
+        words = []
+        for _ in range(n_words):
+            words.append(self.WORDS[seed % len(self.WORDS)])
+            seed = (seed * 1103515245 + 12345) & 0x7FFFFFFF
+        return ' '.join(words)
+
+    def transcribe_batch(self, chunks):
+        time.sleep(self.batch_latency + self.item_latency * len(chunks))
+        return [self._text(pcm) for pcm in chunks]
+
+
+def create_transcriber(backend, client=None, executor=None, **kwargs):
+    """Build a transcriber by name: 'openai', 'local' or 'stub'."""
+    if backend == "openai":
+        return WhisperAPITranscriber(client, executor, **kwargs)
+    if backend == "local":
+        return LocalWhisperTranscriber(executor=executor, **kwargs)
+    if backend == "stub":
+        return StubTranscriber(executor=executor, **kwargs)
+    raise ValueError(f"Unknown transcriber backend: {backend}")
@@ -0,0 +1,137 @@
+import re
+from array import array
+from collections import deque, namedtuple
+
+Segment = namedtuple("Segment", ["text", "start", "duration"])
+
+# a word that ends a sentence, allowing closing quotes/brackets after the mark
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]*$')
+
+
+def entry_field(entry, name):
+    """Transcript entries are dicts from older youtube_transcript_api versions and objects from newer ones."""
+    return entry[name] if isinstance(entry, dict) else getattr(entry, name)
+
+
+class SegmentStore:
+    """
+    Compact columnar storage for transcript segments.
+
+    Start and duration are kept in float arrays. All segment texts live in
+    one UTF-8 buffer, with an offsets array marking where each one ends. Items
+    read back as dicts with 'text', 'start' and 'duration', like the
+    segment lists this replaces.
+    """
+
+    def __init__(self):
+        self.starts = array('d')
+        self.durations = array('d')
+        self.offsets = array('q', [0])
+        self.buffer = bytearray()
+
+    def append(self, segment):
+        self.buffer += segment.text.encode("utf-8")
+        self.offsets.append(len(self.buffer))
+        self.starts.append(segment.start)
+        self.durations.append(segment.duration)
+
+    def text(self, i):
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("segment index out of range")
+        return {'text': self.text(i), 'start': self.starts[i], 'duration': self.durations[i]}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self):
+        return (len(self.buffer) + self.offsets.itemsize * len(self.offsets)
+                + self.starts.itemsize * (len(self.starts) + len(self.durations)))
+
+
+class TranscriptSegmenter:
+    """
+    Splits a stream of transcript entries into segments of about `text_size` words.
+
+    Entries are consumed one at a time and each segment is yielded as soon
+    as it is complete, so segmentation overlaps with fetching, and memory
+    stays bounded by one window of words however long the video is.
+
+    Each word gets its own timestamp: an entry's duration is spread evenly
+    over its words. A segment starts at its first word and lasts as long as
+    its words together.
+
+    - `overlap`: the last `overlap` words of a segment are repeated at the
+      start of the next one.
+    - `sentence_boundaries`: once a window reaches `text_size` words, it is
+      cut at the end of a sentence instead. The cut goes at the last
+      sentence end at or after `min_words`, or at the first sentence end to
+      arrive. If none arrives by `max_words` (default 2 * text_size), it is
+      cut at `text_size` words. `overlap` must be smaller than `min_words`,
+      or a segment could hold nothing but words already checked.
+    """
+
+    def __init__(self, text_size=20, overlap=0, sentence_boundaries=False, min_words=None, max_words=None):
+        if overlap >= text_size:
+            raise ValueError("overlap must be smaller than text_size")
+        self.text_size = text_size
+        self.overlap = overlap
+        self.sentence_boundaries = sentence_boundaries
+        self.min_words = min_words or max(1, text_size // 2)
+        self.max_words = max_words or 2 * text_size
+        if sentence_boundaries and overlap >= self.min_words:
+            raise ValueError("overlap must be smaller than min_words")
+
+    def _cut(self, window):
+        """Number of words to emit from `window` now, or 0 to wait for more."""
+        if len(window) < self.text_size:
+            return 0
+        if not self.sentence_boundaries:
+            return self.text_size
+        for i in range(len(window) - 1, self.min_words - 2, -1):
+            if _SENTENCE_END.search(window[i][0]):
+                return i + 1
+        return self.text_size if len(window) >= self.max_words else 0
+
+    def _emit(self, window, count):
+        words = [window[i] for i in range(count)]
+        # keep the overlap, but always move forward by at least one word
+        keep = min(self.overlap, count - 1)
+        for _ in range(count - keep):
+            window.popleft()
+        return Segment(' '.join(word for word, _, _ in words), words[0][1], sum(d for _, _, d in words))
+
+    def segments(self, entries):
+        """Yield a Segment for every window of words in `entries` (an iterable of transcript entries)."""
+        window = deque()
+        # words in the window that no segment has included yet
+        fresh = 0
+        for entry in entries:
+            words = entry_field(entry, 'text').split()
+            if not words:
+                continue
+            start = entry_field(entry, 'start')
+            word_duration = entry_field(entry, 'duration') / len(words)
+            for i, word in enumerate(words):
+                window.append((word, start + i * word_duration, word_duration))
+                fresh += 1
+                count = self._cut(window)
+                if count:
+                    fresh = len(window) - count
+                    yield self._emit(window, count)
+
+        # the remaining words, unless they are only the overlap of the last segment
+        while fresh > 0:
+            count = self._cut(window) or len(window)
+            fresh = len(window) - count
+            yield self._emit(window, count)
@@ -0,0 +1,22 @@
+"""
+Serving code for the real/fake text classifier trained in real-fake-training.ipynb.
+
+    import truth_model
+    truth_model.predict(["some text", ...])  # [{'label': 'Real', 'score': 0.97}, ...]
+
+The model code (and torch) is only imported when first used, so the
+preprocessing functions stay cheap to import.
+"""
+from truth_model.preprocess import expand_contractions, normalize_text, preprocess_text
+
+
+def load(*args, **kwargs):
+    """See truth_model.model.load."""
+    from truth_model.model import load as load_model
+    return load_model(*args, **kwargs)
+
+
+def predict(texts, *args, **kwargs):
+    """See truth_model.model.predict."""
+    from truth_model.model import predict as predict_texts
+    return predict_texts(texts, *args, **kwargs)
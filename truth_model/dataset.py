@@ -0,0 +1,230 @@
+"""
+Training data for real-fake-training.ipynb, prepared once and cached.
+
+prepare() reads the CSV as the notebook does, runs preprocess_text over it
+in parallel chunks and tokenizes every text once, without padding. The
+result is written to `cache_dir/<key>/`, where the key hashes everything
+the output depends on:
+- the CSV's contents
+- model_name and max_len
+- the debug sample size and seed
+- the source of truth_model.preprocess
+
+A later run with the same key opens the cache instead. The token ids are
+one flat int32 array, memory-mapped with np.load, so opening it costs the
+same for 10k rows as for 10M. The cleaned texts are kept too, for the
+notebook's plots.
+
+    cache = prepare("combined_data.csv", model_name, max_len=64)
+    train_data = cache.frame()               # cleaned text and 'Real'/'Fake' labels, for the plots
+    train_ds = cache.dataset(train_idx)      # a torch Dataset for Trainer
+
+Pass TrainingArguments(group_by_length=True): Trainer then batches texts of
+similar length, so little of each batch is padding.
+
+Build a cache ahead of time:
+    python -m truth_model.dataset combined_data.csv --model-name microsoft/deberta-base --max-len 64
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from truth_model import preprocess
+from truth_model.preprocess import preprocess_text
+
+CACHE_DIR = "data_cache"
+TEXT_COL = "text"
+TARGET_COL = "labels"
+
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(csv_path, model_name, max_len, sample=None, seed=42):
+    config = {
+        "csv": file_digest(csv_path),
+        "model_name": model_name,
+        "max_len": max_len,
+        "sample": sample,
+        "seed": seed,
+        "preprocess": hashlib.sha1(inspect.getsource(preprocess).encode("utf-8")).hexdigest(),
+    }
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def load_frame(csv_path, sample=None, seed=42):
+    """The notebook's loading: drop empty and duplicate rows, labels as 'Real'/'Fake', optionally a sample."""
+    data = pd.read_csv(csv_path)
+    data = data.dropna()
+    data = data.drop_duplicates()
+    data[TARGET_COL] = data[TARGET_COL].replace({True: 'Real', False: 'Fake'})
+    if sample:
+        data = data.sample(sample, ignore_index=True, random_state=seed)
+    return data.reset_index(drop=True)
+
+
+def _preprocess_chunk(texts):
+    return [preprocess_text(text) for text in texts]
+
+
+def preprocess_parallel(texts, workers=None, chunk_size=2000):
+    """preprocess_text over `texts` in chunks spread across `workers` processes (all cores by default)."""
+    texts = [str(text) for text in texts]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(texts) <= chunk_size:
+        return _preprocess_chunk(texts)
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(workers) as pool:
+        return [text for chunk in pool.map(_preprocess_chunk, chunks) for text in chunk]
+
+
+def tokenize(tokenizer, texts, max_len, batch_size=10000):
+    """Token ids of every text, unpadded, as one flat int32 array and the offset of each text in it."""
+    ids, lengths = [], []
+    for start in range(0, len(texts), batch_size):
+        encoded = tokenizer(texts[start:start + batch_size], truncation=True, max_length=max_len)
+        for row in encoded["input_ids"]:
+            ids.extend(row)
+            lengths.append(len(row))
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.asarray(ids, dtype=np.int32), offsets
+
+
+class TokenizedDataset:
+    """
+    Rows of a TokenizedCache as a torch-style Dataset: {'input_ids', 'labels'}
+    per row, to be padded per batch by DataCollatorWithPadding.
+    """
+
+    def __init__(self, cache, indices):
+        self.cache = cache
+        self.indices = np.asarray(indices, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        row = self.indices[i]
+        start, end = self.cache.offsets[row], self.cache.offsets[row + 1]
+        return {"input_ids": self.cache.ids[start:end].tolist(), "labels": int(self.cache.labels[row])}
+
+    @property
+    def lengths(self):
+        return self.cache.lengths[self.indices]
+
+
+class TokenizedCache:
+    """A prepared dataset directory, opened read-only with memory-mapped arrays."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.id2label = {int(i): label for i, label in self.meta["id2label"].items()}
+        self.label2id = {label: i for i, label in self.id2label.items()}
+        self.ids = np.load(os.path.join(path, "input_ids.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.labels = np.load(os.path.join(path, "labels.npy"), mmap_mode="r")
+        self.lengths = np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def texts(self):
+        with open(os.path.join(self.path, "texts.txt"), encoding="utf-8") as f:
+            return f.read().split("\n")[:len(self)]
+
+    def frame(self):
+        """The cleaned texts and their label names as a DataFrame, row i being row i of the cache."""
+        labels = pd.Series(np.asarray(self.labels)).map(self.id2label)
+        return pd.DataFrame({TEXT_COL: self.texts(), TARGET_COL: labels})
+
+    def dataset(self, indices=None):
+        return TokenizedDataset(self, np.arange(len(self)) if indices is None else indices)
+
+
+def build_cache(path, csv_path, tokenizer, max_len, sample=None, seed=42, workers=None):
+    data = load_frame(csv_path, sample, seed)
+    texts = preprocess_parallel(data[TEXT_COL].tolist(), workers)
+    ids, offsets = tokenize(tokenizer, texts, max_len)
+
+    # label ids in order of first appearance, as the notebook numbers them
+    unique_labels = data[TARGET_COL].unique()
+    id2label = {i: label for i, label in enumerate(unique_labels)}
+    label2id = {label: i for i, label in id2label.items()}
+    labels = data[TARGET_COL].map(label2id).to_numpy(dtype=np.int64)
+
+    # write next to the final directory and rename, so a crash never leaves half a cache
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".building-")
+    try:
+        np.save(os.path.join(staging, "input_ids.npy"), ids)
+        np.save(os.path.join(staging, "offsets.npy"), offsets)
+        np.save(os.path.join(staging, "labels.npy"), labels)
+        with open(os.path.join(staging, "texts.txt"), "w", encoding="utf-8") as f:
+            # preprocess_text collapses all whitespace, so a text never contains a newline
+            f.write("\n".join(texts))
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"csv": os.path.abspath(csv_path), "max_len": max_len, "sample": sample, "seed": seed,
+                       "rows": len(texts), "tokens": int(offsets[-1]),
+                       "id2label": {str(i): str(label) for i, label in id2label.items()},
+                       "created": time.time()}, f, indent=1)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            # another run finished the same cache first
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return TokenizedCache(path)
+
+
+def prepare(csv_path, model_name, max_len=64, sample=None, seed=42, cache_dir=CACHE_DIR, tokenizer=None,
+            workers=None):
+    """
+    The TokenizedCache for this CSV and config, built on the first call.
+    `tokenizer` defaults to AutoTokenizer.from_pretrained(model_name) and is
+    only loaded when the cache has to be built.
+    """
+    path = os.path.join(cache_dir, cache_key(csv_path, model_name, max_len, sample, seed))
+    if os.path.exists(os.path.join(path, "meta.json")):
+        return TokenizedCache(path)
+    if tokenizer is None:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return build_cache(path, csv_path, tokenizer, max_len, sample, seed, workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess and tokenize the real/fake training CSV once.")
+    parser.add_argument("csv")
+    parser.add_argument("--model-name", required=True, help="model (or tokenizer) name or path")
+    parser.add_argument("--max-len", type=int, default=64)
+    parser.add_argument("--sample", type=int, help="only a random sample of this many rows (the notebook's debug)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--workers", type=int, help="preprocessing processes (default: all cores)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cache = prepare(args.csv, args.model_name, args.max_len, args.sample, args.seed, args.cache_dir,
+                    workers=args.workers)
+    print(f"{cache.path}: {len(cache)} rows, {cache.meta['tokens']} tokens, labels {cache.id2label} "
+          f"({time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,116 @@
+"""
+CPU serving for the real/fake classifier trained in real-fake-training.ipynb.
+
+The notebook trains one deberta-base model per StratifiedKFold fold and saves
+fold i to saved_model/fold_<i> (older runs only saved the last fold, to
+saved_model itself). TruthModel loads every fold once and averages their
+softmax outputs.
+
+Each text is preprocessed as in training and tokenized once, without
+padding, truncated to `max_len` tokens. Texts are then sorted by token
+count and cut into batches of neighbours, each padded only to its own
+longest text. This way a batch of short transcript windows does not pay
+for one long comment.
+"""
+import os
+import threading
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, pipeline
+
+from cpu_inference import apply_backend
+from truth_model.preprocess import preprocess_text
+
+MODEL_DIR = "saved_model"
+TOKENIZER_DIR = "saved_tokenizer"
+MAX_LEN = 64
+
+
+def find_checkpoints(model_dir):
+    """The fold checkpoints under `model_dir`, or `model_dir` itself if it is a single checkpoint."""
+    folds = sorted(
+        os.path.join(model_dir, name) for name in os.listdir(model_dir)
+        if name.startswith("fold_") and os.path.exists(os.path.join(model_dir, name, "config.json"))
+    )
+    if folds:
+        return folds
+    if os.path.exists(os.path.join(model_dir, "config.json")):
+        return [model_dir]
+    raise FileNotFoundError(f"No model checkpoints in {model_dir}")
+
+
+class TruthModel:
+    """
+    The k-fold ensemble. `backend` is one of cpu_inference.BACKENDS and is
+    applied to every fold; `max_len` should match the training max_len.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, tokenizer_dir=None, max_len=MAX_LEN, batch_size=32,
+                 backend="fp32", onnx_cache_dir=None):
+        self.checkpoints = find_checkpoints(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir or self.checkpoints[0])
+        self.max_len = max_len
+        self.batch_size = batch_size
+        self.folds = []
+        for path in self.checkpoints:
+            classifier = pipeline("text-classification", model=path, tokenizer=self.tokenizer, device=-1)
+            classifier = apply_backend(classifier, backend, os.path.abspath(path), onnx_cache_dir)
+            self.folds.append(classifier.model.eval())
+        config = self.folds[0].config
+        if any(fold.config.id2label != config.id2label for fold in self.folds[1:]):
+            raise ValueError(f"Fold checkpoints in {model_dir} disagree on their labels")
+        self.id2label = {int(i): label for i, label in config.id2label.items()}
+        self.label2id = {label: i for i, label in self.id2label.items()}
+
+    def buckets(self, lengths):
+        """Indices of the texts in each batch: neighbours in token count, longest first."""
+        order = np.argsort(lengths, kind="stable")[::-1]
+        return [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+    def predict_proba(self, texts):
+        """Ensemble class probabilities, shape (len(texts), labels), columns in id2label order."""
+        if not len(texts):
+            # tokenizers reject an empty batch
+            return np.zeros((0, len(self.id2label)), dtype=np.float32)
+        encoded = self.tokenizer([preprocess_text(text) for text in texts], truncation=True,
+                                 max_length=self.max_len)
+        probs = np.zeros((len(texts), len(self.id2label)), dtype=np.float32)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        for batch in self.buckets(lengths):
+            features = [{name: values[i] for name, values in encoded.items()} for i in batch]
+            inputs = self.tokenizer.pad(features, return_tensors="pt")
+            with torch.inference_mode():
+                fold_probs = [torch.softmax(fold(**inputs).logits, dim=-1) for fold in self.folds]
+            probs[batch] = torch.stack(fold_probs).mean(dim=0).numpy()
+        return probs
+
+    def predict(self, texts):
+        """One {'label', 'score'} dict per text, like a text-classification pipeline."""
+        probs = self.predict_proba(texts)
+        best = probs.argmax(axis=1)
+        return [{"label": self.id2label[int(i)], "score": float(row[i])} for row, i in zip(probs, best)]
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load(model_dir=MODEL_DIR, tokenizer_dir=None, **kwargs):
+    """
+    The TruthModel for these arguments, loaded on first use and shared after
+    that. The notebook saves its tokenizer separately, so the default model
+    directory comes with TOKENIZER_DIR.
+    """
+    if tokenizer_dir is None and model_dir == MODEL_DIR and os.path.isdir(TOKENIZER_DIR):
+        tokenizer_dir = TOKENIZER_DIR
+    key = (model_dir, tokenizer_dir, tuple(sorted(kwargs.items())))
+    with _models_lock:
+        if key not in _models:
+            _models[key] = TruthModel(model_dir, tokenizer_dir, **kwargs)
+        return _models[key]
+
+
+def predict(texts, model_dir=MODEL_DIR, tokenizer_dir=None, **kwargs):
+    """Classify `texts` as real or fake with the shared model from load()."""
+    return load(model_dir, tokenizer_dir, **kwargs).predict(texts)
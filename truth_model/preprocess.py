@@ -0,0 +1,239 @@
+"""
+Text preprocessing from real-fake-training.ipynb, which the real/fake
+classifier was trained on. Keep it in step with the notebook: the model
+only sees text in this form.
+"""
+import re
+import unicodedata
+
+ENGLISH_CONTRACTIONS = {
+    "ain't": "am not",
+    "aren't": "are not",
+    "can't": "cannot",
+    "can't've": "cannot have",
+    "'cause": "because",
+    "could've": "could have",
+    "couldn't": "could not",
+    "couldn't've": "could not have",
+    "didn't": "did not",
+    "doesn't": "does not",
+    "don't": "do not",
+    "hadn't": "had not",
+    "hadn't've": "had not have",
+    "hasn't": "has not",
+    "haven't": "have not",
+    "he'd": "he would",
+    "he'd've": "he would have",
+    "he'll": "he will",
+    "he'll've": "he will have",
+    "he's": "he is",
+    "how'd": "how did",
+    "how'd'y": "how do you",
+    "how'll": "how will",
+    "how's": "how is",
+    "I'd": "I would",
+    "I'd've": "I would have",
+    "I'll": "I will",
+    "I'll've": "I will have",
+    "I'm": "I am",
+    "I've": "I have",
+    "isn't": "is not",
+    "it'd": "it would",
+    "it'd've": "it would have",
+    "it'll": "it will",
+    "it'll've": "it will have",
+    "it's": "it is",
+    "let's": "let us",
+    "ma'am": "madam",
+    "mayn't": "may not",
+    "might've": "might have",
+    "mightn't": "might not",
+    "mightn't've": "might not have",
+    "must've": "must have",
+    "mustn't": "must not",
+    "mustn't've": "must not have",
+    "needn't": "need not",
+    "needn't've": "need not have",
+    "o'clock": "of the clock",
+    "oughtn't": "ought not",
+    "oughtn't've": "ought not have",
+    "shan't": "shall not",
+    "sha'n't": "shall not",
+    "shan't've": "shall not have",
+    "she'd": "she would",
+    "she'd've": "she would have",
+    "she'll": "she will",
+    "she'll've": "she will have",
+    "she's": "she is",
+    "should've": "should have",
+    "shouldn't": "should not",
+    "shouldn't've": "should not have",
+    "so've": "so have",
+    "so's": "so is",
+    "that'd": "that would",
+    "that'd've": "that would have",
+    "that's": "that is",
+    "there'd": "there would",
+    "there'd've": "there would have",
+    "there's": "there is",
+    "they'd": "they would",
+    "they'd've": "they would have",
+    "they'll": "they will",
+    "they'll've": "they will have",
+    "they're": "they are",
+    "they've": "they have",
+    "to've": "to have",
+    "wasn't": "was not",
+    "we'd": "we would",
+    "we'd've": "we would have",
+    "we'll": "we will",
+    "we'll've": "we will have",
+    "we're": "we are",
+    "we've": "we have",
+    "weren't": "were not",
+    "what'll": "what will",
+    "what'll've": "what will have",
+    "what're": "what are",
+    "what's": "what is",
+    "what've": "what have",
+    "when's": "when is",
+    "when've": "when have",
+    "where'd": "where did",
+    "where's": "where is",
+    "where've": "where have",
+    "who'll": "who will",
+    "who'll've": "who will have",
+    "who's": "who is",
+    "who've": "who have",
+    "why's": "why is",
+    "why've": "why have",
+    "will've": "will have",
+    "won't": "will not",
+    "won't've": "will not have",
+    "would've": "would have",
+    "wouldn't": "would not",
+    "wouldn't've": "would not have",
+    "y'all": "you all",
+    "y'all'd": "you all would",
+    "y'all'd've": "you all would have",
+    "y'all're": "you all are",
+    "y'all've": "you all have",
+    "you'd": "you would",
+    "you'd've": "you would have",
+    "you'll": "you will",
+    "you'll've": "you will have",
+    "you're": "you are",
+    "you've": "you have"
+}
+
+# the notebook's expand_contractions: one regex substitution per contraction, in dict order
+_CONTRACTION_PATTERNS = [
+    (re.compile(r'\b' + re.escape(contraction) + r'\b'), full_form)
+    for contraction, full_form in ENGLISH_CONTRACTIONS.items()
+]
+
+
+def _expand_sequentially(text):
+    for pattern, full_form in _CONTRACTION_PATTERNS:
+        text = pattern.sub(full_form, text)
+    return text
+
+
+def _trie_pattern(node):
+    """Regex for the keys below `node` of a character trie; longer keys are tried first."""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # a key ends here but longer ones continue: optional, greedy, so the longest match wins
+        return ('(?:' + pattern + ')?') if len(branches) > 1 or len(pattern) > 1 else pattern + '?'
+    return pattern
+
+
+def _contraction_trie(contractions):
+    trie = {}
+    for contraction in contractions:
+        node = trie
+        for char in contraction:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return trie
+
+
+# All contractions in one regex built from their trie, so a word is scanned
+# once instead of once per contraction.
+_CONTRACTION = re.compile(r'\b' + _trie_pattern(_contraction_trie(ENGLISH_CONTRACTIONS)) + r'\b')
+
+# Contractions only ever match inside a run of word characters and
+# apostrophes, and the sequential substitutions treat each run on its own.
+# So each run is expanded separately. A run that is exactly a contraction
+# is looked up in _EXPANDED, which holds what the sequential substitutions
+# turn it into ("it'd've" becomes "it would've", then "it would have").
+# Anything else goes through the substitutions only if the trie finds a
+# contraction in it. The output is identical to the notebook's; see
+# benchmarks/truth_model_bench.py --parity.
+_APOSTROPHE_RUN = re.compile(r"(?<![\w'])[\w']*'[\w']*")
+_EXPANDED = {contraction: _expand_sequentially(contraction) for contraction in ENGLISH_CONTRACTIONS}
+
+
+def _expand_run(match):
+    run = match.group()
+    expanded = _EXPANDED.get(run)
+    if expanded is not None:
+        return expanded
+    if _CONTRACTION.search(run) is None:
+        return run
+    return _expand_sequentially(run)
+
+_MENTION = re.compile(r'@\w+')
+_URL = re.compile(r'http\S+|www\S+')
+_HTML_TAG = re.compile(r'<.*?>')
+_NOT = re.compile(r"n't")
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_HASHTAG = re.compile(r'#(\w+)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def expand_contractions(text):
+    if "'" not in text:
+        return text
+    return _APOSTROPHE_RUN.sub(_expand_run, text)
+
+
+def normalize_text(text):
+    text = text.lower()
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8')
+    text = _NOT.sub(' not', text)
+    return text
+
+
+def preprocess_text(text):
+    import emoji
+
+    # Remove emojis
+    text = emoji.demojize(text)
+
+    # Remove mentions
+    text = _MENTION.sub('', text)
+
+    # Remove URLs
+    text = _URL.sub('', text)
+
+    # Remove HTML tags
+    text = _HTML_TAG.sub('', text)
+
+    # Expand contractions
+    text = expand_contractions(text)
+
+    # Normalize text (e.g., café -> cafe)
+    text = normalize_text(text)
+
+    # Remove punctuation
+    text = _PUNCTUATION.sub('', text)
+
+    # Remove hashtags but keep the words
+    text = _HASHTAG.sub(r'\1', text)
+
+    # Remove extra whitespace
+    return _WHITESPACE.sub(' ', text).strip()
@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import logging
+import time
+import weakref
+
+from audio_processor import AudioProcessor
+from audio_protocol import BINARY_PROTOCOL, ProtocolError, check_format, decode_frame
+from metrics import FAST_BUCKETS, REGISTRY, Histogram
+
+logger = logging.getLogger(__name__)
+
+# latency of each stage across all /ws sessions; "deliver" is from the end of
+# a speech chunk to its transcript being sent
+STAGES = ("decode", "vad", "transcribe", "fact_check", "deliver")
+STAGE_LATENCY = {
+    stage: REGISTRY.histogram(
+        "zero_trust_ws_stage_seconds", "Latency of each /ws pipeline stage",
+        buckets=FAST_BUCKETS if stage in ("decode", "vad") else Histogram.DEFAULT_BUCKETS, stage=stage
+    )
+    for stage in STAGES
+}
+ACTIVE_SESSIONS = REGISTRY.gauge("zero_trust_ws_active_sessions", "Open /ws sessions")
+LOST_FRAMES = REGISTRY.counter("zero_trust_ws_lost_frames_total",
+                               "Binary audio frames missing from /ws sequence numbers")
+
+# live pipelines, for the queue depth gauges
+_pipelines = weakref.WeakSet()
+
+
+def _queued(name):
+    return lambda: sum(getattr(pipeline, name).qsize() for pipeline in list(_pipelines))
+
+
+for _queue_name in ("audio", "chunks", "transcripts", "outgoing"):
+    REGISTRY.gauge("zero_trust_ws_queued_items", "Items waiting between /ws pipeline stages, all sessions",
+                   _queued(_queue_name), queue=_queue_name)
+
+_DONE = object()
+
+
+class SessionPipeline:
+    """
+    One /ws session as a chain of asyncio stages joined by bounded queues:
+
+        receive/decode -> VAD -> transcribe -> aggregate/fact-check -> send
+
+    Up to `max_inflight` chunks are transcribed at once and fact checks run
+    as background tasks, so transcription of chunk N+1 overlaps with the
+    fact check of chunk N. Results are still sent in the order their audio
+    arrived. When the client disconnects, any remaining speech is
+    transcribed and sent, as before.
+
+    `protocol` is the negotiated subprotocol: with BINARY_PROTOCOL audio
+    arrives as binary frames (see audio_protocol), otherwise as base64 text.
+    A malformed or unsupported frame ends the audio: the client is sent
+    "Error: <reason>" at once, the speech already received is still
+    transcribed and sent, and the socket is then closed with the error's
+    close code (1007 or 1003).
+
+    `audio_options` configure the AudioProcessor. If they enable partial
+    chunks, interim transcripts of the open utterance are sent as
+    "Partial: <text>" ahead of its final transcript; a partial is skipped
+    while every transcription slot is busy.
+    """
+
+    def __init__(self, websocket, transcriber, fact_checker, protocol=None, queue_size=32, max_inflight=4,
+                 fact_check_words=20, audio_options=None):
+        self.websocket = websocket
+        self.binary = protocol == BINARY_PROTOCOL
+        self.next_seq = None
+        self.lost_frames = 0
+        self.protocol_error = None
+        self.transcriber = transcriber
+        self.fact_checker = fact_checker
+        self.processor = AudioProcessor(**(audio_options or {}))
+        self.fact_check_words = fact_check_words
+        self.inflight = asyncio.Semaphore(max_inflight)
+
+        self.audio = asyncio.Queue(maxsize=queue_size)
+        self.chunks = asyncio.Queue(maxsize=queue_size)
+        # transcription tasks in audio order
+        self.transcripts = asyncio.Queue(maxsize=queue_size)
+        # (kind, awaitable or value) in delivery order
+        self.outgoing = asyncio.Queue(maxsize=queue_size)
+        _pipelines.add(self)
+
+    def _decode_binary(self, message):
+        header, pcm_data = decode_frame(message)
+        check_format(header, self.processor.sample_rate)
+        if self.next_seq is not None and header.seq != self.next_seq:
+            lost = (header.seq - self.next_seq) & 0xFFFFFFFF
+            self.lost_frames += lost
+            LOST_FRAMES.inc(lost)
+        self.next_seq = (header.seq + 1) & 0xFFFFFFFF
+        return pcm_data
+
+    async def receive(self):
+        try:
+            while True:
+                if self.binary:
+                    message = await self.websocket.receive_bytes()
+                    with STAGE_LATENCY["decode"].time():
+                        # a view of the PCM after the header, no copy
+                        pcm_data = self._decode_binary(message)
+                else:
+                    data = await self.websocket.receive_text() # receive audio data in base64 format
+                    with STAGE_LATENCY["decode"].time():
+                        pcm_data = base64.b64decode(data) # decode the base64 data
+                await self.audio.put(pcm_data)
+        except ProtocolError as e:
+            logger.warning("bad audio frame: %s", e)
+            self.protocol_error = e
+            try:
+                await self.websocket.send_text(f"Error: {e}")
+            except Exception as send_error:
+                logger.warning("send error: %s", send_error)
+        except Exception as e:
+            logger.info("receive ended: %s", e)
+        finally:
+            await self.audio.put(_DONE)
+
+    async def vad(self):
+        while True:
+            pcm_data = await self.audio.get()
+            if pcm_data is _DONE:
+                break
+            with STAGE_LATENCY["vad"].time():
+                self.processor.add_audio(pcm_data)
+                chunks = self.processor.get_speech_chunks()
+            for chunk in chunks:
+                await self.chunks.put((chunk, time.perf_counter(), False))
+            partial = self.processor.take_partial()
+            if partial is not None and not chunks and not self.inflight.locked():
+                await self.chunks.put((partial, time.perf_counter(), True))
+
+        # Process remaining audio if it meets minimum length
+        remaining = self.processor.pending_speech()
+        if len(remaining) >= int(0.1 * self.processor.sample_rate * 2):
+            await self.chunks.put((bytes(remaining), time.perf_counter(), False))
+        await self.chunks.put(_DONE)
+
+    async def _transcribe(self, chunk):
+        try:
+            with STAGE_LATENCY["transcribe"].time():
+                return await self.transcriber.transcribe(chunk)
+        except Exception as e:
+            logger.warning("transcription error: %s", e)
+            return None
+        finally:
+            self.inflight.release()
+
+    async def transcribe(self):
+        while True:
+            item = await self.chunks.get()
+            if item is _DONE:
+                break
+            chunk, ready_at, partial = item
+            await self.inflight.acquire()
+            task = asyncio.ensure_future(self._transcribe(chunk))
+            await self.transcripts.put((task, ready_at, partial))
+        await self.transcripts.put(_DONE)
+
+    async def _fact_check(self, text):
+        with STAGE_LATENCY["fact_check"].time():
+            return await self.fact_checker.fact_check(text)
+
+    async def aggregate(self):
+        text_buffer = [] # buffer to store text data for one session of fact checking
+        while True:
+            item = await self.transcripts.get()
+            if item is _DONE:
+                break
+            task, ready_at, partial = item
+            text = await task
+            if not text:
+                continue
+            if partial:
+                await self.outgoing.put(("partial", text, None))
+                continue
+            await self.outgoing.put(("text", text, ready_at))
+            text_buffer.append(text)
+
+            if len(' '.join(text_buffer).split()) >= self.fact_check_words:
+                current_text = ' '.join(text_buffer)
+                text_buffer.clear()
+                # runs while the following chunks are transcribed; delivered in order
+                await self.outgoing.put(("fact_check", asyncio.ensure_future(self._fact_check(current_text)), None))
+        await self.outgoing.put(_DONE)
+
+    async def send(self):
+        while True:
+            item = await self.outgoing.get()
+            if item is _DONE:
+                break
+            kind, payload, ready_at = item
+            try:
+                if kind == "text":
+                    logger.debug("transcription", extra={"text": payload})
+                    await self.websocket.send_text(payload)
+                    STAGE_LATENCY["deliver"].observe(time.perf_counter() - ready_at)
+                elif kind == "partial":
+                    await self.websocket.send_text(f"Partial: {payload}")
+                else:
+                    sentiment, verification = await payload
+                    await self.websocket.send_text(f"Sentiment: {sentiment}")
+                    await self.websocket.send_text(f"Verification: {verification}")
+            except Exception as e:
+                logger.warning("send error: %s", e)
+
+    async def run(self):
+        stages = [
+            asyncio.ensure_future(stage())
+            for stage in (self.receive, self.vad, self.transcribe, self.aggregate, self.send)
+        ]
+        try:
+            with ACTIVE_SESSIONS.track():
+                await asyncio.gather(*stages)
+            if self.protocol_error is not None:
+                await self.websocket.close(code=self.protocol_error.close_code)
+        finally:
+            for stage in stages:
+                stage.cancel()
+            if self.lost_frames:
+                logger.warning("session lost %d audio frames", self.lost_frames)
+
+
+def latency_snapshot():
+    return {stage: histogram.snapshot() for stage, histogram in STAGE_LATENCY.items()}
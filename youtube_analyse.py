@@ -1,13 +1,20 @@
 import re
-from transformers import pipeline
 from youtube_comment_downloader import YoutubeCommentDownloader, SORT_BY_POPULAR
+import numpy as np
 import pandas as pd
 import gc
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
 from bs4 import BeautifulSoup
-import torch
+from comment_store import LIVE_FIELDS, text_hashes, video_id
+from model_registry import default_registry
+from text_cleaning import clean_texts, word_counts
 
 
 def clean_text(text):
+    # one comment at a time; clean_and_filter_comments uses the vectorized text_cleaning.clean_texts
     soup = BeautifulSoup(text, "html.parser")
     text = soup.get_text()
     # Remove punctuation
@@ -19,42 +26,143 @@ def clean_text(text):
     return text
 
 
-class YoutubeAnalysis:
+# classifier name -> (label column, probability column) in the comments DataFrame
+OUTPUT_COLUMNS = {
+    "sentiment": ("sentiment", "sentiment_probability"),
+    "spam": ("spam_label", "spam_probability"),
+    "sarcasm": ("sarcasm_label", "sarcasm_probability"),
+    "emotion": ("emotion", "emotion_probability"),
+}
+
+# stats group -> (label column, {stat name: label}), in the order stats() reports them
+STAT_LABELS = {
+    "spam_stats": ("spam_label", {"spam": "LABEL_1", "not_spam": "LABEL_0"}),
+    "sentiment_stats": ("sentiment", {"positive": "LABEL_1", "negative": "LABEL_0"}),
+    "sarcasm_stats": ("sarcasm_label", {"sarcasm": "LABEL_1", "not_sarcasm": "LABEL_0"}),
+    "emotion_stats": ("emotion", {e: e for e in ["sadness", "joy", "love", "anger", "fear", "surprise"]}),
+}
+
+
+def comment_record(comment):
+    """Keep the fields of a downloaded comment that the analysis uses."""
+    return {
+        'text': comment.get('text', ''),
+        'votes': comment.get('votes', ''),
+        'reply_count': comment.get('reply_count', ''),
+        'heart': comment.get('heart', '')
+    }
+
+
+def as_categorical(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column
+    return column.astype("category")
+
+
+def label_mask(column, labels):
+    """Rows of `column` whose label is in `labels`, compared on categorical codes rather than strings."""
+    column = as_categorical(column)
+    categories = column.cat.categories
+    wanted = [categories.get_loc(label) for label in labels if label in categories]
+    return np.isin(column.cat.codes.to_numpy(), wanted)
+
+
+class CommentStats:
+    """
+    Label counts over classified comments, reported like YoutubeAnalysis.stats.
+
+    Each update counts every label column in one pass. Counts can be updated
+    batch by batch, and partial results from parallel workers combined with
+    `merge`. Only the label columns the frames have are reported, so stats
+    of comments classified with some of the models work too.
+    """
+
     def __init__(self):
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.sentiment_classifier = pipeline(
-            "text-classification",
-            model="Remicm/sentiment-analysis-model-for-socialmedia",
-            device=device
-        )
-        self.spam_classifier = pipeline(
-            "text-classification",
-            model="MathewManoj/tinybert-spam-detector",
-            device=device
-        )
-        self.sarcasm_classifier = pipeline(
-            "text-classification",
-            model="helinivan/english-sarcasm-detector",
-            device=device
-        )
-        self.emotion_classifier = pipeline(
-            "text-classification",
-            model="bhadresh-savani/bert-base-uncased-emotion",
-            device=device
-        )
-        print("Models loaded successfully! (GPU used: {})".format(torch.cuda.is_available()))
+        self.total = 0
+        # label column -> Counter, for the label columns seen so far
+        self.counts = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        stats = cls()
+        stats.update(df)
+        return stats
+
+    def update(self, df):
+        self.total += len(df)
+        for column, _ in STAT_LABELS.values():
+            if column in df:
+                counter = self.counts.setdefault(column, Counter())
+                counter.update(as_categorical(df[column]).value_counts(sort=False).to_dict())
+        return self
+
+    def merge(self, other):
+        """Add the counts of another CommentStats (e.g. from another worker) to this one."""
+        self.total += other.total
+        for column, counter in other.counts.items():
+            self.counts.setdefault(column, Counter()).update(counter)
+        return self
+
+    def as_dict(self):
+        total = self.total or 1
+        return {
+            group: {name: (self.counts[column][label] / total) * 100 for name, label in labels.items()}
+            for group, (column, labels) in STAT_LABELS.items() if column in self.counts
+        }
+
+
+class YoutubeAnalysis:
+    """
+    Comment download, classification and stats for a YouTube video.
+
+    Classifiers come from a ModelRegistry (the process-wide one by default)
+    and are loaded on first use, so constructing this is cheap and several
+    instances share the same models.
+
+    With a CommentStore, analyze_comments keeps each video's classified
+    comments and only classifies the ones it has not seen before. Within
+    `refresh_after` seconds of the last analysis, the stored comments are
+    used as they are, without downloading.
+    """
+
+    def __init__(self, batch_size=32, registry=None, store=None, refresh_after=None):
+        self.batch_size = batch_size
+        self.registry = registry if registry is not None else default_registry()
+        self.store = store
+        self.refresh_after = refresh_after
+
+    @property
+    def sentiment_classifier(self):
+        return self.registry.get("sentiment")
+
+    @property
+    def spam_classifier(self):
+        return self.registry.get("spam")
+
+    @property
+    def sarcasm_classifier(self):
+        return self.registry.get("sarcasm")
+
+    @property
+    def emotion_classifier(self):
+        return self.registry.get("emotion")
+
+    @property
+    def engine(self):
+        """The batched engine over all four classifiers."""
+        return self.registry.engine(list(OUTPUT_COLUMNS), self.batch_size)
 
     def select_comments(self, df_feedback, top_k=20):
         if len(df_feedback) > 200:
-            df_feedback = df_feedback[df_feedback['sarcasm_label'] == 'LABEL_0']
+            df_feedback = df_feedback[label_mask(df_feedback['sarcasm_label'], ['LABEL_0'])]
         if len(df_feedback) > 100:
-            df_feedback = df_feedback[df_feedback['spam_label'] == 'LABEL_0']
+            df_feedback = df_feedback[label_mask(df_feedback['spam_label'], ['LABEL_0'])]
         if len(df_feedback) > 100:
             df_feedback = df_feedback[df_feedback['word_count'] > 5]
         if len(df_feedback) > 100:
             df_feedback = df_feedback[df_feedback['word_count'] < 50]
         if len(df_feedback) > 100:
-            df_feedback = df_feedback[df_feedback['emotion'].isin(['joy', 'surprise'])]
+            df_feedback = df_feedback[label_mask(df_feedback['emotion'], ['joy', 'surprise'])]
         if len(df_feedback) > 100:
             df_feedback = df_feedback.sort_values(by='votes', ascending=False)
         if len(df_feedback) > top_k:
@@ -66,98 +174,153 @@ class YoutubeAnalysis:
     def download_comments(self, url):
         downloader = YoutubeCommentDownloader()
         comments = downloader.get_comments_from_url(url, sort_by=SORT_BY_POPULAR)
-        comment_data = []
-        for comment in comments:
-            cleaned_comment = {
-                'text': comment.get('text', ''),
-                'votes': comment.get('votes', ''),
-                'reply_count': comment.get('reply_count', ''),
-                'heart': comment.get('heart', '')
-            }
-            comment_data.append(cleaned_comment)
+        comment_data = [comment_record(comment) for comment in comments]
 
         df_comments = pd.DataFrame(comment_data)
         return df_comments.drop_duplicates(subset='text')
-    
-    def clean_and_filter_comments(self, df):
-        df['text'] = df['text'].apply(clean_text)
-        df['word_count'] = df['text'].apply(lambda x: len(str(x).split()))
-        df = df[(df['word_count'] > 2) & (df['word_count'] < 500)]
-
-
-        # ✅ Use preloaded models
-        results = [self.sentiment_classifier(text)[0] for text in df['text']]
-        df['sentiment_probability'] = [res['score'] for res in results]
-        df['sentiment'] = [res['label'] for res in results]
-
-        spam_results = [self.spam_classifier(text)[0] for text in df['text']]
-        df['spam_probability'] = [res['score'] for res in spam_results]
-        df['spam_label'] = [res['label'] for res in spam_results]
-
-        sarcasm_results = [self.sarcasm_classifier(text)[0] for text in df['text']]
-        df['sarcasm_probability'] = [res['score'] for res in sarcasm_results]
-        df['sarcasm_label'] = [res['label'] for res in sarcasm_results]
-
-        emotion_results = [self.emotion_classifier(text)[0] for text in df['text']]
-        df['emotion_probability'] = [res['score'] for res in emotion_results]
-        df['emotion'] = [res['label'] for res in emotion_results]
-
-        return df  # <-- Add this line
-
-    def stats(self,df):
-        n_positive = df[df['sentiment'] == 'LABEL_1'].shape[0]
-        n_negative = df[df['sentiment'] == 'LABEL_0'].shape[0]
-
-        n_sarcasm = df[df['sarcasm_label'] == 'LABEL_1'].shape[0]
-        n_not_sarcasm = df[df['sarcasm_label'] == 'LABEL_0'].shape[0]
-
-        n_spam = df[df['spam_label'] == 'LABEL_1'].shape[0]
-        n_not_spam = df[df['spam_label'] == 'LABEL_0'].shape[0]
-
-        n_sadness = df[df['emotion'] == 'sadness'].shape[0]
-        n_joy = df[df['emotion'] == 'joy'].shape[0]
-        n_love = df[df['emotion'] == 'love'].shape[0]
-        n_anger = df[df['emotion'] == 'anger'].shape[0]
-        n_fear = df[df['emotion'] == 'fear'].shape[0]
-        n_surprise = df[df['emotion'] == 'surprise'].shape[0]
-
-    #get the percentage of each emotion out of 100
-        emotion_stats = {
-            "sadness": (n_sadness / df.shape[0]) * 100,
-            "joy": (n_joy / df.shape[0]) * 100,
-            "love": (n_love / df.shape[0]) * 100,
-            "anger": (n_anger / df.shape[0]) * 100,
-            "fear": (n_fear / df.shape[0]) * 100,
-            "surprise": (n_surprise / df.shape[0]) * 100
-        }
 
+    def clean_and_filter_comments(self, df, models=None):
+        df['text'] = clean_texts(df['text'])
+        df['word_count'] = word_counts(df['text'])
+        df = df[(df['word_count'] > 2) & (df['word_count'] < 500)].copy()
+        return self.classify_comments(df, models)
 
-    #get the percentage of spam and not spam out of 100
-        spam_stats = {
-            "spam": (n_spam / df.shape[0]) * 100,
-            "not_spam": (n_not_spam / df.shape[0]) * 100
-        }
+    def classify_comments(self, df, models=None):
+        """Add label and probability columns for `models` (all four by default); only those are loaded."""
+        names = list(OUTPUT_COLUMNS) if models is None else list(models)
+        # all models in one batched pass, tokenizing once per tokenizer family
+        results = self.registry.engine(names, self.batch_size).run(df['text'].tolist())
+        for name in names:
+            label_column, probability_column = OUTPUT_COLUMNS[name]
+            df[probability_column] = results[name].scores
+            # categorical, so stats and select_comments work on integer codes
+            df[label_column] = pd.Categorical(results[name].labels)
 
-        sentiment_stats = {
-            "positive": (n_positive / df.shape[0]) * 100,
-            "negative": (n_negative / df.shape[0]) * 100
-        }
+        return df
 
-        sarcasm_stats = {
-            "sarcasm": (n_sarcasm / df.shape[0]) * 100,
-            "not_sarcasm": (n_not_sarcasm / df.shape[0]) * 100
-        }
+    def stream_comments(self, url, window_size=256, max_buffered_windows=4, max_seen=100000):
+        """
+        Download, clean and classify comments in fixed-size windows while the
+        download is still running.
 
-    # return the stats
+        The downloader runs in a background thread and feeds a bounded queue,
+        so at most `max_buffered_windows` windows of raw comments are held in
+        memory. Duplicate texts are dropped as they arrive; the hashes of the
+        last `max_seen` distinct texts are remembered for that, so a repeat of
+        an older text can slip through on very long streams. After each window
+        is classified, yields (window DataFrame, running stats dict).
+        """
+        pending = queue.Queue(maxsize=window_size * max_buffered_windows)
+        stop = threading.Event()
+        finished = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def download():
+            try:
+                downloader = YoutubeCommentDownloader()
+                for comment in downloader.get_comments_from_url(url, sort_by=SORT_BY_POPULAR):
+                    if not put(comment_record(comment)):
+                        return
+                put(finished)
+            except Exception as e:
+                put(e)
+
+        threading.Thread(target=download, daemon=True).start()
+
+        stats = CommentStats()
+        # text hash -> None, least recently seen first
+        seen = OrderedDict()
+        window = []
+        try:
+            while True:
+                item = pending.get()
+                if item is finished or isinstance(item, Exception):
+                    break
+                key = hash(item['text'])
+                if key in seen:
+                    seen.move_to_end(key)
+                    continue
+                seen[key] = None
+                if len(seen) > max_seen:
+                    seen.popitem(last=False)
+                window.append(item)
+                if len(window) >= window_size:
+                    df = self.clean_and_filter_comments(pd.DataFrame(window))
+                    window = []
+                    if not df.empty:
+                        stats.update(df)
+                        yield df, stats.as_dict()
+
+            if window:
+                df = self.clean_and_filter_comments(pd.DataFrame(window))
+                if not df.empty:
+                    stats.update(df)
+                    yield df, stats.as_dict()
+            if isinstance(item, Exception):
+                raise item
+        finally:
+            stop.set()
+
+    def stored_comments(self, url):
+        """
+        The cleaned, classified comments of `url`, as clean_and_filter_comments
+        returns them, with only new comments going through the models. None
+        if no comments were downloaded.
+        """
+        video = video_id(url)
+        analyzed_at = self.store.analyzed_at(video)
+        if analyzed_at is not None and self.refresh_after and time.time() - analyzed_at < self.refresh_after:
+            return self.store.load(video).drop(columns="text_hash")
+
+        downloaded = self.download_comments(url)
+        if downloaded.empty:
+            return None
+        downloaded['text_hash'] = text_hashes(downloaded['text'])
+        stored = self.store.load(video)
+        known = downloaded['text_hash'].isin(stored['text_hash']).to_numpy()
+        # comments the word-count filter dropped on an earlier visit
+        skipped = downloaded['text_hash'].isin(self.store.filtered_hashes(video)).to_numpy()
+        candidates = downloaded[~known & ~skipped]
+        new = self.clean_and_filter_comments(candidates.copy())
+        filtered = candidates['text_hash'][~candidates['text_hash'].isin(new['text_hash'])]
+
+        # stored comments still on the video, with the downloader's current votes
+        current = downloaded[known].set_index('text_hash')[list(LIVE_FIELDS)]
+        stored = stored[stored['text_hash'].isin(current.index)].copy()
+        previous = stored.set_index('text_hash')[list(LIVE_FIELDS)].reindex(current.index)
+        changed = (current != previous).any(axis=1).to_numpy()
+        self.store.save(video, new, current[changed].reset_index(), filtered)
+        for field in LIVE_FIELDS:
+            stored[field] = stored['text_hash'].map(current[field])
+        df = pd.concat([stored, new], ignore_index=True).drop(columns="text_hash")
+        for name in OUTPUT_COLUMNS:
+            label_column = OUTPUT_COLUMNS[name][0]
+            df[label_column] = df[label_column].astype(str).astype("category")
+        return df
+
+    def stats(self, df):
+        # one value_counts per label column instead of a filtered copy per label
+        return CommentStats.from_frame(df).as_dict()
 
-        return { "spam_stats": spam_stats, "sentiment_stats": sentiment_stats, "sarcasm_stats": sarcasm_stats , "emotion_stats": emotion_stats}
-    
     def analyze_comments(self, url):
-        df = self.download_comments(url)
-        if df.empty:
-            return "No comments found or all comments were filtered out."
+        if self.store is not None:
+            df = self.stored_comments(url)
+            if df is None:
+                return "No comments found or all comments were filtered out."
+        else:
+            df = self.download_comments(url)
+            if df.empty:
+                return "No comments found or all comments were filtered out."
 
-        df = self.clean_and_filter_comments(df)  # <-- Assign the filtered df
+            df = self.clean_and_filter_comments(df)  # <-- Assign the filtered df
 
         if df.empty:
             return "No comments left after cleaning and filtering."
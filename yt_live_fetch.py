@@ -1,3 +1,4 @@
+import os
 import subprocess
 from io import BytesIO
 from pydub import AudioSegment
@@ -5,15 +6,120 @@ import numpy as np
 import soundfile as sf
 import time
 
+from metrics import REGISTRY, timed
+
+
+def live_seconds(step):
+    return REGISTRY.histogram("zero_trust_live_seconds", "Time to resolve a live stream or read a PCM window",
+                              step=step)
+
+
+class LiveAudioReader:
+    """
+    Keeps a single ffmpeg process open on a stream and reads its audio as raw
+    16 kHz mono s16le PCM from stdout.
+
+    The input can be an HLS URL from `yt-dlp -g` or any local media file.
+    With `realtime=True` ffmpeg reads the input at its native rate (`-re`),
+    which makes a local file behave like a live stream.
+    """
+
+    def __init__(self, stream_url, sample_rate=16000, realtime=False, ffmpeg="ffmpeg"):
+        self.stream_url = stream_url
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.ffmpeg = ffmpeg
+        self.process = None
+
+    def start(self):
+        if self.process is None:
+            command = [self.ffmpeg, "-hide_banner", "-loglevel", "error"]
+            if self.realtime:
+                command.append("-re")
+            command += [
+                "-i", self.stream_url,
+                "-vn",  # No video
+                "-acodec", "pcm_s16le",  # Raw 16-bit samples, no container
+                "-ar", str(self.sample_rate),  # Sample rate
+                "-ac", "1",  # Mono
+                "-f", "s16le",
+                "pipe:1"  # Output to pipe
+            ]
+            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        return self
+
+    @timed(live_seconds("read"))
+    def read_pcm(self, seconds):
+        """
+        Read the next `seconds` of PCM into a fresh buffer. Returns a shorter
+        bytearray when the stream ends and an empty one after that.
+        """
+        self.start()
+        buffer = bytearray(int(seconds * self.sample_rate) * 2)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < len(buffer):
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                del view
+                del buffer[filled:]
+                break
+            filled += n
+        return buffer
+
+    def pcm_windows(self, seconds):
+        """Yield contiguous `seconds`-long PCM blocks until the stream ends."""
+        while True:
+            pcm = self.read_pcm(seconds)
+            if not pcm:
+                return
+            yield pcm
+
+    def waveforms(self, seconds):
+        """Yield contiguous float32 waveform windows, the format extract_audio_clip_as_waveform returns."""
+        for pcm in self.pcm_windows(seconds):
+            yield np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / (2 ** 15)
+
+    def speech_chunks(self, processor, seconds=0.5):
+        """Feed the stream through an AudioProcessor and yield its speech chunks, as /ws does."""
+        for pcm in self.pcm_windows(seconds):
+            processor.add_audio(pcm)
+            yield from processor.get_speech_chunks()
+
+    def close(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 class LiveExtraction:
     def __init__(self):
         pass
 
+    @timed(live_seconds("resolve"))
     def get_live_stream_url(self,youtube_url):
         command = ["yt-dlp", "-g", youtube_url]
         process = subprocess.run(command, capture_output=True, text=True)
         stream_url = process.stdout.strip()
         return stream_url
+
+    def open_stream(self, stream_url, **kwargs):
+        """
+        Open a persistent reader on a stream instead of spawning ffmpeg per clip.
+        A local file is read in real time unless `realtime` is given, so it
+        plays like the live stream it stands in for.
+        """
+        kwargs.setdefault("realtime", os.path.isfile(stream_url))
+        return LiveAudioReader(stream_url, **kwargs).start()
+
     def extract_audio_clip_as_waveform(self, youtube_url, duration,start_time=0):
         """
         Extracts a specific audio clip from a YouTube video as a waveform using streaming.
@@ -74,13 +180,20 @@ class LiveExtraction:
 
 
 if __name__ == "__main__":
+    import sys
+
     le = LiveExtraction()
-    stream_url = le.get_live_stream_url("https://www.youtube.com/watch?v=gadjsB5BkK4")
-    while True:
+    # pass a local media file to try the reader without YouTube
+    if len(sys.argv) > 1:
+        stream_url = sys.argv[1]
+    else:
+        stream_url = le.get_live_stream_url("https://www.youtube.com/watch?v=gadjsB5BkK4")
+    with le.open_stream(stream_url) as reader:
         start_time = time.time()
-        waveform = le.extract_audio_clip_as_waveform(stream_url, duration=10)
-        print("wavefrom extarction time ",time.time()-start_time)
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        print(f"Time taken: {elapsed_time:.6f} seconds")
+        for waveform in reader.waveforms(10):
+            end_time = time.time()
+            elapsed_time = end_time - start_time
+            print("shape of waveform ", waveform.shape)
+            print(f"Time taken: {elapsed_time:.6f} seconds")
+            start_time = time.time()
         
\ No newline at end of file